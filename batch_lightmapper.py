@@ -0,0 +1,221 @@
+""" Command line batch baker for the lightmapper.
+
+Bakes the groups listed in a manifest with a pool of background Blender processes:
+
+    blender -b --python batch_lightmapper.py -- manifest.json [--report report.json] [--workers N]
+    python batch_lightmapper.py manifest.json --blender /path/to/blender
+
+The manifest is JSON, paths are relative to the manifest:
+
+    {
+        "memory_per_worker_mb": 4096,
+        "jobs": [
+            {"blend": "levels/level_01.blend", "groups": ["Room A", "Room B"], "export_path": "lightmaps/level_01",
+             "settings": {"num_samples": 128, "output_format": "EXR"}}
+        ]
+    }
+
+Every group is baked by its own worker. A job without "groups" bakes every collection tagged for batch baking in one worker.
+"settings" overrides the scene's lightmapper properties.
+"""
+import argparse
+import concurrent.futures
+import json
+import os
+import subprocess
+import sys
+import time
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_MEMORY_PER_WORKER_MB = 4096
+
+
+def get_total_memory_mb():
+    """ Physical memory of the machine, or None when it can't be found. """
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // (1024 * 1024)
+    except (AttributeError, ValueError, OSError):
+        pass
+    if sys.platform == "win32":
+        import ctypes
+
+        class MEMORYSTATUSEX(ctypes.Structure):
+            _fields_ = [
+                ("dwLength", ctypes.c_ulong),
+                ("dwMemoryLoad", ctypes.c_ulong),
+                ("ullTotalPhys", ctypes.c_ulonglong),
+                ("ullAvailPhys", ctypes.c_ulonglong),
+                ("ullTotalPageFile", ctypes.c_ulonglong),
+                ("ullAvailPageFile", ctypes.c_ulonglong),
+                ("ullTotalVirtual", ctypes.c_ulonglong),
+                ("ullAvailVirtual", ctypes.c_ulonglong),
+                ("ullAvailExtendedVirtual", ctypes.c_ulonglong),
+            ]
+
+        status = MEMORYSTATUSEX()
+        status.dwLength = ctypes.sizeof(MEMORYSTATUSEX)
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            return status.ullTotalPhys // (1024 * 1024)
+    return None
+
+
+def get_worker_count(task_count, memory_per_worker_mb, requested=None):
+    """ Number of Blender processes to run at once, bounded by the cores, the memory and the number of tasks. """
+    if requested:
+        return max(1, min(requested, task_count))
+    workers = os.cpu_count() or 1
+    total_memory = get_total_memory_mb()
+    if total_memory is not None:
+        workers = min(workers, max(1, total_memory // memory_per_worker_mb))
+    return max(1, min(workers, task_count))
+
+
+def load_tasks(manifest_path):
+    """ Read the manifest and split its jobs into one task per bake group. """
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+
+    tasks = []
+    for job in manifest["jobs"]:
+        blend = os.path.normpath(os.path.join(base_dir, job["blend"]))
+        export_path = os.path.normpath(os.path.join(base_dir, job.get("export_path", os.path.dirname(job["blend"]))))
+        settings = job.get("settings", {})
+        groups = job.get("groups")
+        for group_names in ([[group] for group in groups] if groups else [[]]):
+            tasks.append({"blend": blend, "groups": group_names, "export_path": export_path, "settings": settings})
+    return manifest, tasks
+
+
+def run_task(blender, task, threads, log_dir):
+    """ Bake one task in a background Blender process, returns its report entry. """
+    name = os.path.splitext(os.path.basename(task["blend"]))[0]
+    if task["groups"]:
+        name += "_" + task["groups"][0]
+    log_path = os.path.join(log_dir, "".join(c if c.isalnum() or c in "-_." else "_" for c in name) + ".log")
+    result_path = log_path[:-len(".log")] + ".json"
+
+    command = [
+        blender, "-b", "--factory-startup", task["blend"],
+        "-t", str(threads),
+        "--python-exit-code", "2",
+        "--python", os.path.abspath(__file__),
+        "--", "--worker", json.dumps(task), "--result", result_path,
+    ]
+    start_time = time.perf_counter()
+    with open(log_path, "w") as log:
+        exit_code = subprocess.call(command, stdout=log, stderr=subprocess.STDOUT)
+    seconds = time.perf_counter() - start_time
+
+    results = []
+    if os.path.exists(result_path):
+        with open(result_path) as f:
+            results = json.load(f)
+    print(f"{name:<48} exit {exit_code:<3} {seconds:8.2f}s")
+    return {
+        "blend": task["blend"],
+        "groups": task["groups"],
+        "exit_code": exit_code,
+        "seconds": seconds,
+        "log": log_path,
+        "results": results,
+    }
+
+
+def run_batch(manifest_path, report_path, blender, workers=None):
+    manifest, tasks = load_tasks(manifest_path)
+    memory_per_worker_mb = manifest.get("memory_per_worker_mb", DEFAULT_MEMORY_PER_WORKER_MB)
+    workers = get_worker_count(len(tasks), memory_per_worker_mb, workers)
+    # Split the cores between the workers, so they don't all fight over every core.
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    for task in tasks:
+        # Tiled bakes should stay within the worker's share of the memory.
+        task["settings"] = {"memory_budget_mb": memory_per_worker_mb, **task["settings"]}
+
+    log_dir = os.path.splitext(report_path)[0] + "_logs"
+    os.makedirs(log_dir, exist_ok=True)
+    print(f"Baking {len(tasks)} tasks with {workers} workers of {threads} threads")
+
+    start_time = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        entries = list(pool.map(lambda task: run_task(blender, task, threads, log_dir), tasks))
+
+    report = {
+        "manifest": os.path.abspath(manifest_path),
+        "workers": workers,
+        "threads_per_worker": threads,
+        "seconds": time.perf_counter() - start_time,
+        "tasks": entries,
+    }
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+
+    failed = [entry for entry in entries if entry["exit_code"] != 0]
+    print(f"{len(entries) - len(failed)} of {len(entries)} tasks succeeded in {report['seconds']:.2f}s, report: {report_path}")
+    return 1 if failed else 0
+
+
+############################## Worker ##############################
+
+
+def run_worker(task, result_path):
+    """ Runs inside a background Blender with the task's .blend loaded. """
+    import bpy
+
+    # Register the lightmapper from this checkout, same as entry_lightmapper.py.
+    sys.path.insert(0, script_dir)
+    import lightmapper
+    from lightmapper import lightmapper_operators
+    lightmapper.register()
+
+    if bpy.context.mode != 'OBJECT':
+        bpy.ops.object.mode_set(mode='OBJECT')
+
+    props = bpy.context.scene.lightmapper_properties
+    for key, value in task["settings"].items():
+        setattr(props, key, value)
+    os.makedirs(task["export_path"], exist_ok=True)
+    props.export_path = task["export_path"]
+
+    bpy.ops.lightmapper.bake_lightmap_batch(collection_names=",".join(task["groups"]))
+
+    results = [{"group": name, "status": status, "seconds": seconds, "output": output_file}
+               for name, status, seconds, output_file in lightmapper_operators.last_batch_results]
+    with open(result_path, "w") as f:
+        json.dump(results, f, indent=2)
+    if not results or any(result["status"] not in {'BAKED', 'CACHED'} for result in results):
+        sys.exit(1)
+
+
+def main():
+    # Blender passes the script's own arguments after "--".
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else sys.argv[1:]
+    parser = argparse.ArgumentParser(description="Bake the lightmaps listed in a manifest with background Blender processes.")
+    parser.add_argument("manifest", nargs="?", help="JSON manifest of .blend files and bake groups")
+    parser.add_argument("--report", help="Where to write the JSON report, defaults to next to the manifest")
+    parser.add_argument("--workers", type=int, help="Number of Blender processes, defaults to what the cores and memory allow")
+    parser.add_argument("--blender", help="Blender executable, defaults to the running Blender")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        run_worker(json.loads(args.worker), args.result)
+        return
+
+    if not args.manifest:
+        parser.error("a manifest is required")
+    blender = args.blender
+    if blender is None:
+        try:
+            import bpy
+            blender = bpy.app.binary_path
+        except ImportError:
+            parser.error("--blender is required when not running inside Blender")
+    report_path = args.report or os.path.splitext(args.manifest)[0] + "_report.json"
+    sys.exit(run_batch(args.manifest, report_path, blender, args.workers))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+""" Compare the lightmapper's denoisers on reference scenes.
+
+Every group of a batch manifest (see batch_lightmapper.py) is baked four times in a background Blender:
+a high sample reference, a low sample bake without denoising, the same denoised by the compositor, and the
+low sample bake run through the NumPy denoiser. Speed and PSNR against the reference end up in a JSON report.
+
+    python benchmark_denoise.py manifest.json --blender /path/to/blender [--samples 16] [--reference-samples 1024]
+    blender -b --python benchmark_denoise.py -- manifest.json
+
+PSNR is measured on tone mapped values, x / (1 + x), over the texels the Lightmap UVs cover.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, script_dir)
+from batch_lightmapper import load_tasks  # noqa: E402
+
+
+def psnr(result, reference, mask):
+    """ PSNR in dB of result against reference, both (height, width, 3+) linear floats, over the texels in mask. """
+    import numpy as np
+    a = np.maximum(result[mask][:, :3], 0.0)
+    b = np.maximum(reference[mask][:, :3], 0.0)
+    error = np.mean((a / (1.0 + a) - b / (1.0 + b)) ** 2)
+    return float("inf") if error == 0.0 else float(10.0 * np.log10(1.0 / error))
+
+
+############################## Worker ##############################
+
+
+def bake_variant(group, export_path, settings):
+    """ Bake group with settings into export_path. Returns the lightmap pixels, the bake seconds, the bake trace and
+    the number of samples the bake was set to, which RNA clamps to the range of the property. """
+    import bpy
+    from lightmapper import lightmapper_operators, lightmapper_trace
+    from lightmapper.lightmapper_image_io import read_image_pixels
+
+    props = bpy.context.scene.lightmapper_properties
+    for key, value in settings.items():
+        setattr(props, key, value)
+    os.makedirs(export_path, exist_ok=True)
+    props.export_path = export_path
+    num_samples = props.num_samples
+    bpy.ops.lightmapper.bake_lightmap_batch(collection_names=group)
+
+    name, status, seconds, output_file = lightmapper_operators.last_batch_results[0]
+    if status != 'BAKED':
+        raise RuntimeError(f"Baking {name} with {settings} failed: {status}")
+    image = bpy.data.images.load(output_file)
+    try:
+        pixels = read_image_pixels(image)
+    finally:
+        bpy.data.images.remove(image)
+    return pixels, seconds, lightmapper_trace.last_trace, num_samples
+
+
+def benchmark_group(group, export_path, base_settings, samples, reference_samples):
+    import bpy
+    from lightmapper.lightmapper_bake_mesh import read_mesh_arrays
+    from lightmapper.lightmapper_denoise import denoise_lightmap, guide_triangles, rasterize_guides
+
+    # EXR keeps the full range, without caching every variant really bakes.
+    settings = {**base_settings, "output_format": 'EXR', "use_bake_cache": False, "dilation_pixels": 0, "sampling_mode": 'FIXED'}
+    reference, reference_seconds, _, reference_samples = bake_variant(group, os.path.join(export_path, "reference"),
+                                                                      {**settings, "num_samples": reference_samples, "denoiser": 'NONE'})
+    noisy, noisy_seconds, _, samples = bake_variant(group, os.path.join(export_path, "noisy"),
+                                                    {**settings, "num_samples": samples, "denoiser": 'NONE'})
+    compositor, compositor_seconds, compositor_trace, _ = bake_variant(group, os.path.join(export_path, "compositor"),
+                                                                       {**settings, "num_samples": samples, "denoiser": 'COMPOSITOR'})
+
+    collection = bpy.data.collections[group]
+    mesh_objects = [obj for obj in collection.all_objects if obj.type == 'MESH']
+    height, width = noisy.shape[:2]
+    start_time = time.perf_counter()
+    guides = rasterize_guides(*guide_triangles(read_mesh_arrays(mesh_objects)), width, height)
+    guide_seconds = time.perf_counter() - start_time
+    props = bpy.context.scene.lightmapper_properties
+    start_time = time.perf_counter()
+    numpy_result = denoise_lightmap(noisy, guides, props.denoise_iterations, props.denoise_strength)
+    numpy_seconds = time.perf_counter() - start_time
+
+    mask = guides.mask
+    return {
+        "group": group,
+        "width": width,
+        "height": height,
+        "samples": samples,
+        "reference_samples": reference_samples,
+        "reference_bake_seconds": reference_seconds,
+        "noisy": {"bake_seconds": noisy_seconds, "psnr": psnr(noisy, reference, mask)},
+        "compositor": {"bake_seconds": compositor_seconds,
+                       "denoise_seconds": compositor_trace["phases"].get("denoise", {}).get("seconds"),
+                       "psnr": psnr(compositor, reference, mask)},
+        "numpy": {"guide_seconds": guide_seconds, "denoise_seconds": numpy_seconds,
+                  "iterations": props.denoise_iterations, "strength": props.denoise_strength,
+                  "psnr": psnr(numpy_result, reference, mask)},
+    }
+
+
+def run_worker(task, result_path, samples, reference_samples):
+    """ Runs inside a background Blender with the task's .blend loaded. """
+    import bpy
+    import lightmapper
+    lightmapper.register()
+
+    if bpy.context.mode != 'OBJECT':
+        bpy.ops.object.mode_set(mode='OBJECT')
+
+    groups = task["groups"] or [col.name for col in bpy.data.collections if col.lightmapper_batch_bake]
+    results = []
+    for group in groups:
+        export_path = os.path.join(task["export_path"], "denoise_benchmark", group)
+        results.append(benchmark_group(group, export_path, task["settings"], samples, reference_samples))
+    with open(result_path, "w") as f:
+        json.dump(results, f, indent=2)
+
+
+############################## Driver ##############################
+
+
+def run_benchmark(manifest_path, report_path, blender, samples, reference_samples):
+    """ Benchmark the tasks of the manifest one after the other, so timings aren't skewed by each other. """
+    _, tasks = load_tasks(manifest_path)
+    log_dir = os.path.splitext(report_path)[0] + "_logs"
+    os.makedirs(log_dir, exist_ok=True)
+
+    results = []
+    for index, task in enumerate(tasks):
+        log_path = os.path.join(log_dir, f"task_{index}.log")
+        result_path = os.path.join(log_dir, f"task_{index}.json")
+        command = [
+            blender, "-b", "--factory-startup", task["blend"],
+            "--python-exit-code", "2",
+            "--python", os.path.abspath(__file__),
+            "--", "--worker", json.dumps(task), "--result", result_path,
+            "--samples", str(samples), "--reference-samples", str(reference_samples),
+        ]
+        with open(log_path, "w") as log:
+            exit_code = subprocess.call(command, stdout=log, stderr=subprocess.STDOUT)
+        if exit_code != 0 or not os.path.exists(result_path):
+            print(f"{task['blend']} {task['groups']}: failed with exit code {exit_code}, see {log_path}")
+            continue
+        with open(result_path) as f:
+            for result in json.load(f):
+                result["blend"] = task["blend"]
+                results.append(result)
+                print(f"{result['group']:<32} noisy {result['noisy']['psnr']:6.2f} dB | "
+                      f"compositor {result['compositor']['psnr']:6.2f} dB in {result['compositor']['denoise_seconds'] or 0.0:6.2f}s | "
+                      f"numpy {result['numpy']['psnr']:6.2f} dB in {result['numpy']['denoise_seconds']:6.2f}s")
+
+    with open(report_path, "w") as f:
+        json.dump({"manifest": os.path.abspath(manifest_path), "results": results}, f, indent=2)
+    print(f"{len(results)} groups benchmarked, report: {report_path}")
+    return 0 if results and len(results) >= len(tasks) else 1
+
+
+def main():
+    # Blender passes the script's own arguments after "--".
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else sys.argv[1:]
+    parser = argparse.ArgumentParser(description="Compare the speed and quality of the lightmapper's denoisers.")
+    parser.add_argument("manifest", nargs="?", help="Batch manifest listing the reference scenes and groups")
+    parser.add_argument("--report", help="Where to write the JSON report, defaults to next to the manifest")
+    parser.add_argument("--samples", type=int, default=16, help="Samples of the bakes being denoised")
+    parser.add_argument("--reference-samples", type=int, default=1024, help="Samples of the reference bake, up to 16384")
+    parser.add_argument("--blender", help="Blender executable, defaults to the running Blender")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        run_worker(json.loads(args.worker), args.result, args.samples, args.reference_samples)
+        return
+
+    if not args.manifest:
+        parser.error("a manifest is required")
+    blender = args.blender
+    if blender is None:
+        try:
+            import bpy
+            blender = bpy.app.binary_path
+        except ImportError:
+            parser.error("--blender is required when not running inside Blender")
+    report_path = args.report or os.path.splitext(args.manifest)[0] + "_denoise_benchmark.json"
+    sys.exit(run_benchmark(args.manifest, report_path, blender, args.samples, args.reference_samples))
+
+
+if __name__ == "__main__":
+    main()
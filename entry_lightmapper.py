@@ -8,12 +8,42 @@ __package__ = os.path.basename(script_dir)
 
 import lightmapper.__init__
 import lightmapper.lightmapper_properties
+import lightmapper.lightmapper_bake_mesh
+import lightmapper.lightmapper_cache
+import lightmapper.lightmapper_image_io
+import lightmapper.lightmapper_tiles
+import lightmapper.lightmapper_memory
+import lightmapper.lightmapper_output_queue
+import lightmapper.lightmapper_progressive
+import lightmapper.lightmapper_scheduler
+import lightmapper.lightmapper_trace
+import lightmapper.lightmapper_uv_pack
+import lightmapper.lightmapper_raster
+import lightmapper.lightmapper_dilation
+import lightmapper.lightmapper_denoise
+import lightmapper.lightmapper_texel_density
+import lightmapper.lightmapper_uv_validation
 import lightmapper.lightmapper_operators
 import lightmapper.lightmapper_panel
 
 # TODO: Make this autoload everything.
 importlib.reload(lightmapper.__init__)
 importlib.reload(lightmapper.lightmapper_properties)
+importlib.reload(lightmapper.lightmapper_bake_mesh)
+importlib.reload(lightmapper.lightmapper_cache)
+importlib.reload(lightmapper.lightmapper_image_io)
+importlib.reload(lightmapper.lightmapper_tiles)
+importlib.reload(lightmapper.lightmapper_memory)
+importlib.reload(lightmapper.lightmapper_output_queue)
+importlib.reload(lightmapper.lightmapper_progressive)
+importlib.reload(lightmapper.lightmapper_scheduler)
+importlib.reload(lightmapper.lightmapper_trace)
+importlib.reload(lightmapper.lightmapper_uv_pack)
+importlib.reload(lightmapper.lightmapper_raster)
+importlib.reload(lightmapper.lightmapper_dilation)
+importlib.reload(lightmapper.lightmapper_denoise)
+importlib.reload(lightmapper.lightmapper_texel_density)
+importlib.reload(lightmapper.lightmapper_uv_validation)
 importlib.reload(lightmapper.lightmapper_operators)
 importlib.reload(lightmapper.lightmapper_panel)
 
@@ -7,12 +7,22 @@ sys.path.insert(0, script_dir)
 __package__ = os.path.basename(script_dir)
 
 import ripper.__init__
+import ripper.obj_reader
+import ripper.zip_extract
+import ripper.import_cache
+import ripper.batch_import
+import ripper.obj_import
 import ripper.import_panel
 import ripper.fix_panel
 import ripper.export_panel
 
 # TODO: Make this autoload everything.
 importlib.reload(ripper.__init__)
+importlib.reload(ripper.obj_reader)
+importlib.reload(ripper.zip_extract)
+importlib.reload(ripper.import_cache)
+importlib.reload(ripper.batch_import)
+importlib.reload(ripper.obj_import)
 importlib.reload(ripper.import_panel)
 importlib.reload(ripper.fix_panel)
 importlib.reload(ripper.export_panel)
@@ -0,0 +1,147 @@
+import bpy
+import numpy as np
+
+
+LIGHTMAP_UV_NAME = "Lightmap"
+
+
+class MeshArrays():
+    """ Bulk copy of the evaluated mesh data of one object, already in world space. """
+    def __init__(self, obj, depsgraph, material_lookup):
+        obj_eval = obj.evaluated_get(depsgraph)
+        mesh = obj_eval.to_mesh()
+        try:
+            self.name = obj.name
+            num_verts = len(mesh.vertices)
+            num_loops = len(mesh.loops)
+            num_polys = len(mesh.polygons)
+
+            co = np.empty(num_verts * 3, dtype=np.float32)
+            mesh.vertices.foreach_get("co", co)
+            vertex_index = np.empty(num_loops, dtype=np.int32)
+            mesh.loops.foreach_get("vertex_index", vertex_index)
+            loop_start = np.empty(num_polys, dtype=np.int32)
+            mesh.polygons.foreach_get("loop_start", loop_start)
+            loop_total = np.empty(num_polys, dtype=np.int32)
+            mesh.polygons.foreach_get("loop_total", loop_total)
+            material_index = np.empty(num_polys, dtype=np.int32)
+            mesh.polygons.foreach_get("material_index", material_index)
+            use_smooth = np.empty(num_polys, dtype=bool)
+            mesh.polygons.foreach_get("use_smooth", use_smooth)
+            normals = np.empty(num_loops * 3, dtype=np.float32)
+            mesh.corner_normals.foreach_get("vector", normals)
+
+            render_uv = np.empty(num_loops * 2, dtype=np.float32)
+            mesh.uv_layers[0].data.foreach_get("uv", render_uv)
+            lightmap_uv = np.empty(num_loops * 2, dtype=np.float32)
+            mesh.uv_layers[LIGHTMAP_UV_NAME].data.foreach_get("uv", lightmap_uv)
+        finally:
+            obj_eval.to_mesh_clear()
+
+        # Apply the world transform to positions and normals in one go.
+        matrix = np.array(obj.matrix_world, dtype=np.float64)
+        linear = matrix[:3, :3]
+        self.co = (co.reshape(-1, 3) @ linear.T + matrix[:3, 3]).astype(np.float32)
+        normal_matrix = np.linalg.inv(linear).T
+        normals = normals.reshape(-1, 3) @ normal_matrix.T
+        lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+        self.normals = (normals / np.maximum(lengths, 1e-12)).astype(np.float32)
+
+        self.vertex_index = vertex_index
+        self.loop_start = loop_start
+        self.loop_total = loop_total
+        self.use_smooth = use_smooth
+        self.render_uv = render_uv.reshape(-1, 2)
+        self.lightmap_uv = lightmap_uv.reshape(-1, 2)
+
+        # Remap the object's slot indices into the combined material list.
+        slot_materials = [slot.material for slot in obj.material_slots] or [None]
+        remap = np.array([material_lookup(material) for material in slot_materials], dtype=np.int32)
+        self.material_index = remap[np.clip(material_index, 0, len(remap) - 1)]
+
+        # A mirrored transform turns the faces inside out, flip the winding to keep them facing outwards.
+        if np.linalg.det(linear) < 0.0:
+            order = _reversed_loop_order(loop_start, loop_total)
+            self.vertex_index = self.vertex_index[order]
+            self.normals = self.normals[order]
+            self.render_uv = self.render_uv[order]
+            self.lightmap_uv = self.lightmap_uv[order]
+
+
+def _reversed_loop_order(loop_start, loop_total):
+    """ Loop indices that reverse the winding of every polygon. """
+    poly_of_loop = np.repeat(np.arange(len(loop_start)), loop_total)
+    offset_in_poly = np.arange(len(poly_of_loop)) - loop_start[poly_of_loop]
+    return loop_start[poly_of_loop] + loop_total[poly_of_loop] - 1 - offset_in_poly
+
+
+def read_mesh_arrays(mesh_objects):
+    """ Read the evaluated meshes of mesh_objects. Returns the per object arrays and the combined material list they index into. """
+    depsgraph = bpy.context.evaluated_depsgraph_get()
+
+    materials = []
+    material_indices = {}
+
+    def material_lookup(material):
+        if material not in material_indices:
+            material_indices[material] = len(materials)
+            materials.append(material)
+        return material_indices[material]
+
+    parts = [MeshArrays(obj, depsgraph, material_lookup) for obj in mesh_objects]
+    return parts, materials
+
+
+def create_bake_mesh_object(mesh_objects, name="BakeableObject", mesh_arrays=None):
+    """ Build a single world space mesh object from the evaluated meshes of mesh_objects, without touching the originals. """
+    if mesh_arrays is None:
+        mesh_arrays = read_mesh_arrays(mesh_objects)
+    parts, materials = mesh_arrays
+
+    vertex_offsets = np.cumsum([0] + [len(part.co) for part in parts])
+    loop_offsets = np.cumsum([0] + [len(part.vertex_index) for part in parts])
+
+    co = np.concatenate([part.co for part in parts])
+    vertex_index = np.concatenate([part.vertex_index + vertex_offsets[i] for i, part in enumerate(parts)])
+    loop_start = np.concatenate([part.loop_start + loop_offsets[i] for i, part in enumerate(parts)])
+    loop_total = np.concatenate([part.loop_total for part in parts])
+    material_index = np.concatenate([part.material_index for part in parts])
+    use_smooth = np.concatenate([part.use_smooth for part in parts])
+    normals = np.concatenate([part.normals for part in parts])
+    render_uv = np.concatenate([part.render_uv for part in parts])
+    lightmap_uv = np.concatenate([part.lightmap_uv for part in parts])
+
+    mesh = bpy.data.meshes.new(name)
+    mesh.vertices.add(len(co))
+    mesh.loops.add(len(vertex_index))
+    mesh.polygons.add(len(loop_start))
+
+    mesh.vertices.foreach_set("co", co.ravel())
+    mesh.loops.foreach_set("vertex_index", vertex_index.astype(np.int32))
+    mesh.polygons.foreach_set("loop_start", loop_start.astype(np.int32))
+    # Face sizes are derived from loop_start in newer Blender versions.
+    if not mesh.polygons.bl_rna.properties["loop_total"].is_readonly:
+        mesh.polygons.foreach_set("loop_total", loop_total)
+    mesh.polygons.foreach_set("material_index", material_index)
+    mesh.polygons.foreach_set("use_smooth", use_smooth)
+
+    # Keep the UV names of the first object, same as a join would.
+    render_uv_name = mesh_objects[0].data.uv_layers[0].name
+    if render_uv_name == LIGHTMAP_UV_NAME:
+        render_uv_name = "UVMap"
+    mesh.uv_layers.new(name=render_uv_name).data.foreach_set("uv", render_uv.ravel())
+    mesh.uv_layers.new(name=LIGHTMAP_UV_NAME).data.foreach_set("uv", lightmap_uv.ravel())
+
+    for material in materials:
+        mesh.materials.append(material)
+
+    mesh.update(calc_edges=True)
+    # Custom normals keep the shading of the originals, including modifiers and auto smooth.
+    mesh.normals_split_custom_set(normals)
+
+    new_object = bpy.data.objects.new(name, mesh)
+    bpy.context.scene.collection.objects.link(new_object)
+    bpy.context.view_layer.objects.active = new_object
+
+    print(f"Created {name} from {len(mesh_objects)} objects: {len(co)} vertices, {len(loop_start)} faces")
+    return new_object
@@ -0,0 +1,185 @@
+import bpy
+import hashlib
+import json
+import os
+
+import numpy as np
+
+# Bump when the bake pipeline changes in a way that makes old lightmaps stale.
+CACHE_VERSION = 1
+
+# Nodes and materials the bake itself adds, they must not change the fingerprint.
+TMP_NAME_PREFIXES = ("BAKELAB_TMP", "LIGHTMAPPER_TMP")
+
+
+def get_fingerprint_path(export_path, bake_name):
+    return os.path.join(export_path, f"{bake_name}.lightmap.json")
+
+
+def _plain_value(value):
+    """ value as nested tuples of numbers and strings. The repr of an RNA array or a mathutils vector is its RNA
+    path or a rounded string, not its numbers, so every sequence is flattened down to its items. """
+    if isinstance(value, (str, bytes, int, float, bool)) or value is None:
+        return value
+    if isinstance(value, bpy.types.ID):
+        return (type(value).__name__, value.name)
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted(_plain_value(item) for item in value))
+    if hasattr(value, "__len__"):
+        return tuple(_plain_value(item) for item in value)
+    return value
+
+
+def _hash_value(h, value):
+    """ Feed a plain RNA value into the hash. """
+    h.update(repr(_plain_value(value)).encode())
+
+
+def _hash_rna_properties(h, struct, skip=()):
+    """ Hash every readable plain property of an RNA struct. Pointers and collections are handled by the callers. """
+    for prop in struct.bl_rna.properties:
+        if prop.identifier in skip or prop.identifier == "rna_type":
+            continue
+        if prop.type in {'POINTER', 'COLLECTION'}:
+            continue
+        _hash_value(h, (prop.identifier, getattr(struct, prop.identifier, None)))
+
+
+def _hash_image(h, image):
+    if image is None:
+        h.update(b"no-image")
+        return
+    h.update(image.name.encode())
+    path = bpy.path.abspath(image.filepath)
+    if image.packed_file is not None:
+        _hash_value(h, image.packed_file.size)
+    elif path and os.path.exists(path):
+        stat = os.stat(path)
+        _hash_value(h, (stat.st_size, stat.st_mtime_ns))
+    _hash_value(h, (tuple(image.size), image.source, image.colorspace_settings.name))
+
+
+def _hash_node_tree(h, tree, seen):
+    if tree is None or tree.name in seen:
+        return
+    seen.add(tree.name)
+    for node in sorted(tree.nodes, key=lambda node: node.name):
+        if node.name.startswith(TMP_NAME_PREFIXES):
+            continue
+        h.update(node.bl_idname.encode())
+        h.update(node.name.encode())
+        _hash_rna_properties(h, node, skip={"location", "width", "height", "select", "dimensions", "show_options", "show_preview", "hide"})
+        for socket in node.inputs:
+            if not socket.is_linked and hasattr(socket, "default_value"):
+                _hash_value(h, (socket.identifier, socket.default_value))
+        if getattr(node, "image", None) is not None:
+            _hash_image(h, node.image)
+        if getattr(node, "node_tree", None) is not None:
+            _hash_node_tree(h, node.node_tree, seen)
+    for link in tree.links:
+        _hash_value(h, (link.from_node.name, link.from_socket.identifier, link.to_node.name, link.to_socket.identifier, link.is_muted))
+
+
+def _hash_geometry(h, mesh_arrays):
+    parts, materials = mesh_arrays
+    for part in sorted(parts, key=lambda part: part.name):
+        h.update(part.name.encode())
+        for array in (part.co, part.normals, part.vertex_index, part.loop_start, part.render_uv, part.lightmap_uv, part.material_index):
+            h.update(array.tobytes())
+    seen = set()
+    for material in materials:
+        _hash_material(h, material, seen)
+
+
+def _hash_material(h, material, seen):
+    if material is None:
+        h.update(b"no-material")
+        return
+    h.update(material.name.encode())
+    _hash_value(h, material.use_nodes)
+    if material.use_nodes:
+        _hash_node_tree(h, material.node_tree, seen)
+    else:
+        _hash_value(h, material.diffuse_color)
+
+
+def _hash_mesh_buffers(h, mesh):
+    """ Hash the vertex positions and face corners of a mesh from its foreach_get buffers. """
+    co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", co)
+    vertex_index = np.empty(len(mesh.loops), dtype=np.int32)
+    mesh.loops.foreach_get("vertex_index", vertex_index)
+    loop_start = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get("loop_start", loop_start)
+    for array in (co, vertex_index, loop_start):
+        h.update(array.tobytes())
+
+
+def _hash_scene_lighting(h, scene, mesh_objects):
+    """ Hash what lights the group from outside: lights, the world and the rest of the renderable scene. """
+    group = {obj.name for obj in mesh_objects}
+    seen = set()
+    depsgraph = bpy.context.evaluated_depsgraph_get()
+    hashed_meshes = set()
+    for obj in sorted(scene.objects, key=lambda obj: obj.name):
+        if obj.name in group or obj.hide_render:
+            continue
+        if obj.type == 'LIGHT':
+            h.update(obj.name.encode())
+            h.update(repr([tuple(row) for row in obj.matrix_world]).encode())
+            _hash_rna_properties(h, obj.data)
+            if obj.data.use_nodes:
+                _hash_node_tree(h, obj.data.node_tree, seen)
+        elif obj.type == 'MESH':
+            # Occluders and bounce surfaces: their evaluated geometry, read in bulk, and their materials.
+            h.update(obj.name.encode())
+            h.update(repr([tuple(row) for row in obj.matrix_world]).encode())
+            mesh = obj.evaluated_get(depsgraph).data
+            # Instances share a mesh, and its buffers are hashed once. Modifiers give each object its own evaluated mesh.
+            key = ("object", obj.name) if obj.modifiers else ("mesh", obj.data.name)
+            _hash_value(h, key)
+            if key not in hashed_meshes:
+                hashed_meshes.add(key)
+                _hash_mesh_buffers(h, mesh)
+            for slot in obj.material_slots:
+                _hash_material(h, slot.material, seen)
+
+    world = scene.world
+    if world is not None:
+        h.update(world.name.encode())
+        _hash_value(h, tuple(world.color))
+        if world.use_nodes:
+            _hash_node_tree(h, world.node_tree, seen)
+
+
+def compute_bake_fingerprint(scene, mesh_objects, mesh_arrays, settings):
+    """ Fingerprint of everything that ends up in the lightmap of a bake group. settings is a dict of bake settings. """
+    h = hashlib.sha256()
+    _hash_value(h, CACHE_VERSION)
+    h.update(json.dumps(settings, sort_keys=True).encode())
+    _hash_value(h, (scene.render.bake.margin, scene.render.bake.margin_type))
+    _hash_geometry(h, mesh_arrays)
+    _hash_scene_lighting(h, scene, mesh_objects)
+    return h.hexdigest()
+
+
+def is_cached(export_path, bake_name, output_file, fingerprint):
+    """ True when the output exists and was baked from the same fingerprint. """
+    fingerprint_path = get_fingerprint_path(export_path, bake_name)
+    if not os.path.exists(output_file) or not os.path.exists(fingerprint_path):
+        return False
+    try:
+        with open(fingerprint_path, "r") as file:
+            data = json.load(file)
+    except (OSError, ValueError):
+        return False
+    return data.get("fingerprint") == fingerprint
+
+
+def write_fingerprint(export_path, bake_name, output_file, fingerprint, settings):
+    with open(get_fingerprint_path(export_path, bake_name), "w") as file:
+        json.dump({
+            "fingerprint": fingerprint,
+            "file": os.path.basename(output_file),
+            "settings": settings,
+        }, file, indent=2)
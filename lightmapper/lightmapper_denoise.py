@@ -0,0 +1,162 @@
+import concurrent.futures
+import os
+
+import numpy as np
+
+from .lightmapper_raster import rasterize_triangles
+from .lightmapper_uv_pack import fan_triangles
+
+# B3 spline, the 5x5 à-trous kernel is its outer product.
+KERNEL = np.array([1.0 / 16.0, 1.0 / 4.0, 3.0 / 8.0, 1.0 / 4.0, 1.0 / 16.0], dtype=np.float32)
+DEFAULT_ITERATIONS = 5
+# Rows and columns denoised by one thread at a time, not counting the reach around them.
+DENOISE_TILE_SIZE = 512
+# Normal weight is max(0, dot(n, nq)) ** 64, squared this many times as pow is slow.
+NORMAL_SQUARINGS = 6
+# Neighbours further away in world space than this many texels times the step size are ignored.
+POSITION_SIGMA = 4.0
+# Color differences are relative to the texel's brightness plus this share of the average brightness.
+BRIGHTNESS_FLOOR = 0.05
+LUMINANCE = np.array([0.2126, 0.7152, 0.0722], dtype=np.float32)
+
+
+def get_reach(iterations):
+    """ Texels on each side that can influence a denoised texel. """
+    return 2 * (2 ** iterations - 1)
+
+
+class GuideBuffers():
+    """ World position and normal of every lightmap texel, rasterized from the Lightmap UVs, bottom row first. """
+    def __init__(self, position, normal, mask):
+        self.position = position
+        self.normal = normal
+        self.mask = mask
+        self.texel_size = _median_texel_size(position, mask)
+
+
+def _median_texel_size(position, mask):
+    """ Median world space distance between horizontally neighbouring covered texels. """
+    both = mask[:, 1:] & mask[:, :-1]
+    if not both.any():
+        return 1.0
+    distances = np.linalg.norm(position[:, 1:][both] - position[:, :-1][both], axis=1)
+    size = float(np.median(distances))
+    return size if size > 0.0 else 1.0
+
+
+def guide_triangles(mesh_arrays):
+    """ Lightmap UVs, world positions and normals of the corners of every triangle of mesh_arrays, as (n, 3, 2), (n, 3, 3), (n, 3, 3). """
+    parts, _ = mesh_arrays
+    uvs, positions, normals = [], [], []
+    for part in parts:
+        _, a, b, c = fan_triangles(part.loop_start.astype(np.int64), part.loop_total.astype(np.int64))
+        corners = np.stack([a, b, c], axis=1)
+        uvs.append(part.lightmap_uv[corners])
+        positions.append(part.co[part.vertex_index[corners]])
+        normals.append(part.normals[corners])
+    if not uvs:
+        return np.zeros((0, 3, 2)), np.zeros((0, 3, 3)), np.zeros((0, 3, 3))
+    return np.concatenate(uvs), np.concatenate(positions), np.concatenate(normals)
+
+
+def rasterize_guides(uv_triangles, positions, normals, width, height):
+    """ Interpolate positions and normals over the texels covered by uv_triangles, given in 0-1 UV space. """
+    position = np.zeros((height, width, 3), dtype=np.float32)
+    normal = np.zeros((height, width, 3), dtype=np.float32)
+    mask = np.zeros((height, width), dtype=bool)
+    triangles = uv_triangles * np.array([width, height], dtype=np.float64)
+    for tri, px, py, barycentric in rasterize_triangles(triangles, width, height):
+        weights = barycentric[:, :, None]
+        position[py, px] = np.sum(positions[tri] * weights, axis=1)
+        normal[py, px] = np.sum(normals[tri] * weights, axis=1)
+        mask[py, px] = True
+    lengths = np.linalg.norm(normal, axis=2, keepdims=True)
+    normal /= np.maximum(lengths, 1e-12)
+    return GuideBuffers(position, normal, mask)
+
+
+def _dot(a, b):
+    """ Dot product of planar (3, height, width) vectors. Far faster than einsum or sum over a trailing axis. """
+    return a[0] * b[0] + a[1] * b[1] + a[2] * b[2]
+
+
+def _atrous_step(color, position, normal, valid, step, color_sigma, position_sigma):
+    """ One edge avoiding à-trous pass over planar (3, height, width) buffers, taps 'step' texels apart. """
+    height, width = valid.shape
+    reach = 2 * step
+    pad = ((0, 0), (reach, reach), (reach, reach))
+    color_p = np.pad(color, pad)
+    position_p = np.pad(position, pad)
+    normal_p = np.pad(normal, pad)
+    valid_p = np.pad(valid, pad[1:]).astype(np.float32)
+
+    luminance = _dot(color, LUMINANCE[:, None, None])
+    mean = float(luminance[valid].mean()) if valid.any() else 1.0
+    scale = (luminance + BRIGHTNESS_FLOOR * max(mean, 1e-6)) * color_sigma
+    inv_color = 1.0 / np.maximum(scale * scale, 1e-12)
+    inv_position = np.float32(1.0 / (position_sigma * position_sigma))
+
+    total = np.zeros_like(color)
+    weight_sum = np.zeros_like(luminance)
+    for i, ky in enumerate(KERNEL):
+        for j, kx in enumerate(KERNEL):
+            y = reach + (i - 2) * step
+            x = reach + (j - 2) * step
+            tap_color = color_p[:, y:y + height, x:x + width]
+            d_color = tap_color - color
+            d_position = position_p[:, y:y + height, x:x + width] - position
+            weight = np.exp(-(_dot(d_color, d_color) * inv_color + _dot(d_position, d_position) * inv_position))
+            n_dot = np.maximum(_dot(normal_p[:, y:y + height, x:x + width], normal), 0.0)
+            for _ in range(NORMAL_SQUARINGS):
+                n_dot *= n_dot
+            weight *= n_dot
+            weight *= valid_p[y:y + height, x:x + width] * (ky * kx)
+            total += tap_color * weight
+            weight_sum += weight
+    # The centre tap always has weight, so covered texels never divide by zero.
+    return np.where(valid, total / np.maximum(weight_sum, 1e-12), color).astype(np.float32)
+
+
+def _denoise_region(pixels, guides, y0, y1, x0, x1, iterations, color_sigma):
+    """ Denoise rows y0:y1 and columns x0:x1, reading the reach around them. """
+    height, width = guides.mask.shape
+    reach = get_reach(iterations)
+    a0, a1 = max(0, y0 - reach), min(height, y1 + reach)
+    b0, b1 = max(0, x0 - reach), min(width, x1 + reach)
+    # Work on planar copies, per channel slices of interleaved pixels are slow to compute with.
+    region = np.ascontiguousarray(pixels[a0:a1, b0:b1, :3].transpose(2, 0, 1), dtype=np.float32)
+    position = np.ascontiguousarray(guides.position[a0:a1, b0:b1].transpose(2, 0, 1))
+    normal = np.ascontiguousarray(guides.normal[a0:a1, b0:b1].transpose(2, 0, 1))
+    valid = guides.mask[a0:a1, b0:b1]
+    for level in range(iterations):
+        step = 2 ** level
+        # Each level smooths out larger scale noise at a wider spacing, and color edges matter more as it gets smoother.
+        region = _atrous_step(region, position, normal, valid, step, color_sigma * 0.5 ** level,
+                              POSITION_SIGMA * step * guides.texel_size)
+    return region[:, y0 - a0:y1 - a0, x0 - b0:x1 - b0].transpose(1, 2, 0)
+
+
+def denoise_lightmap(pixels, guides, iterations=DEFAULT_ITERATIONS, color_sigma=1.0, tile_size=DENOISE_TILE_SIZE, max_threads=None):
+    """ Denoise (height, width, 4) float pixels with an edge avoiding à-trous wavelet filter, guided by the texel
+    positions and normals, so light doesn't blur across creases, into other islands or onto unrelated geometry.
+    Tiles are spread over a thread pool, NumPy releases the GIL for the heavy lifting. Returns a new buffer of the
+    same type, half float pixels stay half float and are only widened a tile at a time. """
+    height, width = pixels.shape[:2]
+    result = pixels.copy()
+    if iterations <= 0 or not guides.mask.any():
+        return result
+
+    def run(region):
+        y0, y1, x0, x1 = region
+        # Tiles write disjoint parts of the result.
+        result[y0:y1, x0:x1, :3] = _denoise_region(pixels, guides, y0, y1, x0, x1, iterations, color_sigma)
+
+    regions = [(y0, min(height, y0 + tile_size), x0, min(width, x0 + tile_size))
+               for y0 in range(0, height, tile_size) for x0 in range(0, width, tile_size)]
+    # Skip tiles without a single covered texel.
+    regions = [region for region in regions if guides.mask[region[0]:region[1], region[2]:region[3]].any()]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_threads or os.cpu_count() or 1,
+                                               thread_name_prefix="lightmapper_denoise") as executor:
+        for future in [executor.submit(run, region) for region in regions]:
+            future.result()
+    return result
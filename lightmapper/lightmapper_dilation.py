@@ -0,0 +1,61 @@
+import numpy as np
+
+from .lightmapper_raster import rasterize_triangles
+
+# Rows dilated at once. Each band is processed with enough rows around it to be exact.
+DILATION_BAND_ROWS = 512
+_NEIGHBOURS = [(dy, dx) for dy in (-1, 0, 1) for dx in (-1, 0, 1) if dy or dx]
+
+
+def coverage_mask(uv_triangles, width, height):
+    """ (height, width) mask of the texels covered by UV triangles, bottom row first like Blender's pixels. """
+    mask = np.zeros(width * height, dtype=bool)
+    triangles = uv_triangles * np.array([width, height], dtype=np.float64)
+    for _, px, py, _ in rasterize_triangles(triangles, width, height):
+        mask[py * width + px] = True
+    return mask.reshape(height, width)
+
+
+def _dilate_step(pixels, valid):
+    """ Fill the empty texels next to valid ones with the average of their valid neighbours. Returns False once nothing changed. """
+    height, width = valid.shape
+    padded = np.pad(valid, 1)
+    near = np.zeros_like(valid)
+    for dy, dx in _NEIGHBOURS:
+        near |= padded[1 + dy:1 + dy + height, 1 + dx:1 + dx + width]
+    ys, xs = np.nonzero(near & ~valid)
+    if len(ys) == 0:
+        return False
+
+    # Only the frontier texels are gathered, the work follows the island outlines rather than the atlas area.
+    total = np.zeros((len(ys), pixels.shape[2]), dtype=np.float32)
+    count = np.zeros(len(ys), dtype=np.float32)
+    for dy, dx in _NEIGHBOURS:
+        ny = np.clip(ys + dy, 0, height - 1)
+        nx = np.clip(xs + dx, 0, width - 1)
+        weight = valid[ny, nx] & (ys + dy == ny) & (xs + dx == nx)
+        total += pixels[ny, nx] * weight[:, None]
+        count += weight
+    pixels[ys, xs] = total / count[:, None]
+    valid[ys, xs] = True
+    return True
+
+
+def dilate(pixels, mask, distance, band_rows=DILATION_BAND_ROWS):
+    """ Push the texels inside mask outwards by distance texels, in place, so filtering and mipmapping don't pull in
+    the empty background. The (height, width, channels) buffer is processed in bands of band_rows to bound memory. """
+    height = pixels.shape[0]
+    if distance <= 0 or mask.all() or not mask.any():
+        return pixels
+    for y0 in range(0, height, band_rows):
+        y1 = min(height, y0 + band_rows)
+        # Texels up to distance rows away can reach into the band.
+        a0 = max(0, y0 - distance)
+        a1 = min(height, y1 + distance)
+        band = pixels[a0:a1].copy()
+        valid = mask[a0:a1].copy()
+        for _ in range(distance):
+            if not _dilate_step(band, valid):
+                break
+        pixels[y0:y1] = band[y0 - a0:y1 - a0]
+    return pixels
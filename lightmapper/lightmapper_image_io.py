@@ -0,0 +1,338 @@
+import numpy as np
+import os
+import struct
+import zlib
+
+
+def read_image_pixels(image):
+    """ Read the pixels of a Blender image into a (height, width, 4) float32 buffer, bottom row first. """
+    width, height = image.size
+    pixels = np.empty(width * height * 4, dtype=np.float32)
+    image.pixels.foreach_get(pixels)
+    return pixels.reshape(height, width, 4)
+
+
+############################## Radiance HDR ##############################
+
+
+def float_to_rgbe(rgb):
+    """ Convert (..., 3) linear floats to shared exponent (..., 4) uint8 RGBE. """
+    rgb = np.nan_to_num(np.maximum(rgb, 0.0), posinf=65504.0).astype(np.float32)
+    brightest = rgb.max(axis=-1)
+    mantissa, exponent = np.frexp(brightest)
+    visible = brightest > 1e-32
+    scale = np.where(visible, mantissa * 256.0 / np.where(visible, brightest, 1.0), 0.0)
+
+    rgbe = np.empty(rgb.shape[:-1] + (4,), dtype=np.uint8)
+    rgbe[..., :3] = np.clip(rgb * scale[..., None], 0, 255).astype(np.uint8)
+    rgbe[..., 3] = np.where(visible, exponent + 128, 0).astype(np.uint8)
+    return rgbe
+
+
+def _packet_chunks(starts, lengths, max_length):
+    """ Split (start, length) spans into packets of at most max_length. """
+    counts = (lengths + max_length - 1) // max_length
+    span = np.repeat(np.arange(len(starts)), counts)
+    index_in_span = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return starts[span] + max_length * index_in_span, np.minimum(max_length, lengths[span] - max_length * index_in_span)
+
+
+def encode_rle_scanlines(rgbe):
+    """ Encode (rows, width, 4) RGBE as new style run length encoded Radiance scanlines, for all rows at once. """
+    rows, width, _ = rgbe.shape
+    # Each scanline stores its four components one after the other.
+    planes = np.ascontiguousarray(rgbe.transpose(0, 2, 1)).ravel()
+    count = planes.size
+
+    segment_start = np.zeros(count, dtype=bool)
+    segment_start[::width] = True
+    run_start_mask = segment_start.copy()
+    run_start_mask[1:] |= planes[1:] != planes[:-1]
+    run_starts = np.flatnonzero(run_start_mask)
+    run_lengths = np.diff(np.append(run_starts, count))
+
+    # Runs of three or more are cheaper as run packets, everything else goes into literal packets.
+    is_run = run_lengths >= 3
+    run_packet_starts, run_packet_lengths = _packet_chunks(run_starts[is_run], run_lengths[is_run], 127)
+
+    literal = ~np.repeat(is_run, run_lengths)
+    literal_start_mask = literal & segment_start
+    literal_start_mask[1:] |= literal[1:] & ~literal[:-1]
+    literal_starts = np.flatnonzero(literal_start_mask)
+    literal_ids = np.cumsum(literal_start_mask)[literal] - 1
+    literal_lengths = np.bincount(literal_ids, minlength=len(literal_starts))
+    literal_packet_starts, literal_packet_lengths = _packet_chunks(literal_starts, literal_lengths, 128)
+
+    starts = np.concatenate([run_packet_starts, literal_packet_starts])
+    lengths = np.concatenate([run_packet_lengths, literal_packet_lengths])
+    is_run_packet = np.concatenate([np.ones(len(run_packet_starts), dtype=bool), np.zeros(len(literal_packet_starts), dtype=bool)])
+    order = np.argsort(starts, kind='stable')
+    starts, lengths, is_run_packet = starts[order], lengths[order], is_run_packet[order]
+
+    sizes = np.where(is_run_packet, 2, lengths + 1)
+    packet_rows = starts // (4 * width)
+    row_sizes = np.bincount(packet_rows, weights=sizes, minlength=rows).astype(np.int64) + 4
+    row_offsets = np.cumsum(row_sizes) - row_sizes
+    offsets = np.cumsum(sizes) - sizes + 4 * (packet_rows + 1)
+
+    out = np.empty(int(row_sizes.sum()), dtype=np.uint8)
+    out[row_offsets] = 2
+    out[row_offsets + 1] = 2
+    out[row_offsets + 2] = width >> 8
+    out[row_offsets + 3] = width & 255
+
+    run_offsets = offsets[is_run_packet]
+    out[run_offsets] = 128 + lengths[is_run_packet]
+    out[run_offsets + 1] = planes[starts[is_run_packet]]
+
+    literal_offsets = offsets[~is_run_packet]
+    literal_lengths = lengths[~is_run_packet]
+    literal_starts = starts[~is_run_packet]
+    out[literal_offsets] = literal_lengths
+    index_in_packet = np.arange(literal_lengths.sum()) - np.repeat(np.cumsum(literal_lengths) - literal_lengths, literal_lengths)
+    out[np.repeat(literal_offsets + 1, literal_lengths) + index_in_packet] = planes[np.repeat(literal_starts, literal_lengths) + index_in_packet]
+    return out.tobytes()
+
+
+class HDRWriter():
+    """ Streams Radiance HDR scanlines to disk, top row first. """
+    def __init__(self, filepath, width, height):
+        self.width = width
+        self.height = height
+        self.rows_written = 0
+        self.file = open(filepath, "wb")
+        self.file.write(b"#?RADIANCE\nFORMAT=32-bit_rle_rgbe\n\n")
+        self.file.write(f"-Y {height} +X {width}\n".encode())
+
+    def write_rows(self, rows):
+        """ Write (n, width, 3+) float rows, top to bottom. """
+        rgbe = float_to_rgbe(rows[..., :3])
+        # Run length encoding is only defined for these widths, use flat pixels otherwise.
+        if 8 <= self.width < 32768:
+            self.file.write(encode_rle_scanlines(rgbe))
+        else:
+            self.file.write(rgbe.tobytes())
+        self.rows_written += len(rows)
+
+    def close(self):
+        self.file.close()
+
+
+############################## OpenEXR ##############################
+
+
+EXR_NO_COMPRESSION = 0
+EXR_ZIP_COMPRESSION = 3
+EXR_HALF = 1
+EXR_FLOAT = 2
+_EXR_LINES_PER_BLOCK = {EXR_NO_COMPRESSION: 1, EXR_ZIP_COMPRESSION: 16}
+
+
+def _exr_attribute(name, type_name, data):
+    return name.encode() + b"\0" + type_name.encode() + b"\0" + struct.pack("<i", len(data)) + data
+
+
+def _exr_zip(raw):
+    """ OpenEXR ZIP block compression: interleave the bytes, delta encode, then deflate. """
+    data = np.frombuffer(raw, dtype=np.uint8)
+    reordered = np.concatenate([data[0::2], data[1::2]])
+    predicted = reordered.copy()
+    predicted[1:] = (reordered[1:].astype(np.int16) - reordered[:-1] + 128 + 256).astype(np.uint8)
+    compressed = zlib.compress(predicted.tobytes(), 6)
+    # Blocks that don't shrink are stored uncompressed.
+    return compressed if len(compressed) < len(raw) else raw
+
+
+class EXRWriter():
+    """ Streams a single part scanline OpenEXR file with RGB(A) channels, top row first. """
+    def __init__(self, filepath, width, height, channels="RGB", pixel_type=EXR_HALF, compression=EXR_ZIP_COMPRESSION):
+        self.width = width
+        self.height = height
+        # Channels are stored in alphabetical order.
+        self.channels = sorted(channels)
+        self.source_index = ["RGBA".index(channel) for channel in self.channels]
+        self.dtype = np.dtype("<f2") if pixel_type == EXR_HALF else np.dtype("<f4")
+        self.compression = compression
+        self.lines_per_block = _EXR_LINES_PER_BLOCK[compression]
+        self.block_count = (height + self.lines_per_block - 1) // self.lines_per_block
+        self.offsets = []
+        self.pending = None
+
+        channel_list = b"".join(channel.encode() + b"\0" + struct.pack("<iB3xii", pixel_type, 0, 1, 1) for channel in self.channels) + b"\0"
+        window = struct.pack("<iiii", 0, 0, width - 1, height - 1)
+        header = b"".join([
+            struct.pack("<ii", 20000630, 2),
+            _exr_attribute("channels", "chlist", channel_list),
+            _exr_attribute("compression", "compression", struct.pack("<B", compression)),
+            _exr_attribute("dataWindow", "box2i", window),
+            _exr_attribute("displayWindow", "box2i", window),
+            _exr_attribute("lineOrder", "lineOrder", struct.pack("<B", 0)),
+            _exr_attribute("pixelAspectRatio", "float", struct.pack("<f", 1.0)),
+            _exr_attribute("screenWindowCenter", "v2f", struct.pack("<ff", 0.0, 0.0)),
+            _exr_attribute("screenWindowWidth", "float", struct.pack("<f", 1.0)),
+            b"\0",
+        ])
+
+        self.file = open(filepath, "wb")
+        self.file.write(header)
+        # The offset table is filled in once every block has been written.
+        self.table_position = self.file.tell()
+        self.file.write(b"\0" * 8 * self.block_count)
+
+    def write_rows(self, rows):
+        """ Write (n, width, 3+) float rows, top to bottom. """
+        rows = rows[..., self.source_index].astype(self.dtype)
+        if self.pending is not None:
+            rows = np.concatenate([self.pending, rows])
+        full_blocks = len(rows) // self.lines_per_block
+        for block in range(full_blocks):
+            self._write_block(rows[block * self.lines_per_block:(block + 1) * self.lines_per_block])
+        rows = rows[full_blocks * self.lines_per_block:]
+        self.pending = rows if len(rows) else None
+
+    def _write_block(self, rows):
+        y = len(self.offsets) * self.lines_per_block
+        # Scanline data is stored per line, one channel after the other.
+        raw = np.ascontiguousarray(rows.transpose(0, 2, 1)).tobytes()
+        if self.compression == EXR_ZIP_COMPRESSION:
+            raw = _exr_zip(raw)
+        self.offsets.append(self.file.tell())
+        self.file.write(struct.pack("<ii", y, len(raw)))
+        self.file.write(raw)
+
+    def close(self):
+        if self.pending is not None:
+            self._write_block(self.pending)
+            self.pending = None
+        self.file.seek(self.table_position)
+        self.file.write(struct.pack(f"<{len(self.offsets)}Q", *self.offsets))
+        self.file.close()
+
+
+############################## Encoded PNG ##############################
+
+
+def encode_rgbm(rgb, value_range):
+    """ Encode (..., 3) linear floats as 8-bit RGBM. Decode with color = rgb * a * value_range. """
+    rgb = np.nan_to_num(np.maximum(rgb, 0.0), posinf=value_range).astype(np.float32)
+    multiplier = np.clip(rgb.max(axis=-1) / value_range, 1.0 / 255.0, 1.0)
+    # Round the multiplier up so the colour channels never go above one.
+    multiplier = np.ceil(multiplier * 255.0) / 255.0
+    rgbm = np.empty(rgb.shape[:-1] + (4,), dtype=np.uint8)
+    rgbm[..., :3] = np.clip(np.round(rgb / (multiplier * value_range)[..., None] * 255.0), 0, 255)
+    rgbm[..., 3] = np.round(multiplier * 255.0)
+    return rgbm
+
+
+def encode_rgbd(rgb, value_range):
+    """ Encode (..., 3) linear floats as 8-bit RGBD. Decode with color = rgb * value_range / (a * 255).
+    Dark texels get a large divisor, so they keep more precision than with RGBM. """
+    rgb = np.nan_to_num(np.maximum(rgb, 0.0), posinf=value_range).astype(np.float32)
+    brightest = np.maximum(rgb.max(axis=-1), 1e-12)
+    divisor = np.clip(np.floor(value_range / brightest), 1.0, 255.0)
+    rgbd = np.empty(rgb.shape[:-1] + (4,), dtype=np.uint8)
+    rgbd[..., :3] = np.clip(np.round(rgb * (divisor / value_range)[..., None] * 255.0), 0, 255)
+    rgbd[..., 3] = divisor
+    return rgbd
+
+
+def _png_chunk(chunk_type, data):
+    chunk = chunk_type + data
+    return struct.pack(">I", len(data)) + chunk + struct.pack(">I", zlib.crc32(chunk) & 0xffffffff)
+
+
+class PNGWriter():
+    """ Streams an 8-bit RGBA PNG, top row first. encode turns (n, width, 3) float rows into (n, width, 4) uint8. """
+    def __init__(self, filepath, width, height, encode):
+        self.width = width
+        self.height = height
+        self.encode = encode
+        self.previous_row = np.zeros((width * 4,), dtype=np.uint8)
+        self.compressor = zlib.compressobj(6)
+        self.file = open(filepath, "wb")
+        self.file.write(b"\x89PNG\r\n\x1a\n")
+        self.file.write(_png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)))
+
+    def write_rows(self, rows):
+        """ Write (n, width, 3+) float rows, top to bottom. """
+        encoded = self.encode(rows[..., :3]).reshape(len(rows), -1)
+        # The Up filter stores each row as the difference to the one above, smooth lightmaps compress much better that way.
+        above = np.concatenate([self.previous_row[None], encoded[:-1]])
+        filtered = np.empty((len(rows), encoded.shape[1] + 1), dtype=np.uint8)
+        filtered[:, 0] = 2
+        filtered[:, 1:] = encoded - above
+        self.previous_row = encoded[-1].copy()
+        data = self.compressor.compress(filtered.tobytes())
+        if data:
+            self.file.write(_png_chunk(b"IDAT", data))
+
+    def close(self):
+        self.file.write(_png_chunk(b"IDAT", self.compressor.flush()))
+        self.file.write(_png_chunk(b"IEND", b""))
+        self.file.close()
+
+
+############################## Output ##############################
+
+
+FILE_EXTENSIONS = {
+    'HDR': ".hdr",
+    'EXR': ".exr",
+    'RGBM': ".png",
+    'RGBD': ".png",
+}
+
+
+def open_image_writer(filepath, width, height, file_format, encoding_range=8.0):
+    if file_format == 'EXR':
+        return EXRWriter(filepath, width, height)
+    if file_format == 'RGBM':
+        return PNGWriter(filepath, width, height, lambda rgb: encode_rgbm(rgb, encoding_range))
+    if file_format == 'RGBD':
+        return PNGWriter(filepath, width, height, lambda rgb: encode_rgbd(rgb, encoding_range))
+    return HDRWriter(filepath, width, height)
+
+
+def write_image(filepath, pixels, file_format, encoding_range=8.0):
+    """ Write a bottom row first (height, width, 4) float buffer, as read from Blender, straight to filepath. """
+    height, width = pixels.shape[:2]
+    writer = open_image_writer(filepath, width, height, file_format, encoding_range)
+    try:
+        # Image files are stored top row first, write in bands to keep the encode buffers small.
+        band = 256
+        for top in range(height, 0, -band):
+            writer.write_rows(pixels[max(0, top - band):top][::-1])
+    finally:
+        writer.close()
+
+
+def downsample(pixels):
+    """ Half resolution box filtered copy of (height, width, channels) pixels. An odd last row or column is kept as is. """
+    height, width = pixels.shape[:2]
+    if height > 1:
+        even = pixels[:height // 2 * 2]
+        half = 0.5 * (even[0::2] + even[1::2])
+        pixels = np.concatenate([half, pixels[-1:]]) if height % 2 else half
+    if width > 1:
+        even = pixels[:, :width // 2 * 2]
+        half = 0.5 * (even[:, 0::2] + even[:, 1::2])
+        pixels = np.concatenate([half, pixels[:, -1:]], axis=1) if width % 2 else half
+    return pixels
+
+
+def get_mip_path(filepath, level):
+    base, extension = os.path.splitext(filepath)
+    return f"{base}_mip{level}{extension}"
+
+
+def write_mips(filepath, pixels, file_format, encoding_range=8.0):
+    """ Write the mip chain of pixels below the full resolution, down to 1x1, next to filepath. Returns their paths. """
+    paths = []
+    level = 0
+    while max(pixels.shape[:2]) > 1:
+        pixels = downsample(pixels)
+        level += 1
+        path = get_mip_path(filepath, level)
+        write_image(path, pixels, file_format, encoding_range)
+        paths.append(path)
+    return paths
@@ -0,0 +1,74 @@
+from .lightmapper_tiles import BYTES_PER_BAND_PIXEL
+
+MB = 1024 * 1024
+
+# Rough bytes per pixel held at once by each part of a bake. Calibrate them with the estimated and
+# measured peaks recorded in the bake traces.
+BAKE_IMAGE_BYTES = 16       # Blender's float RGBA bake image.
+CYCLES_BAKE_BYTES = 72      # Cycles' bake pixel records, render and result buffers.
+COMPOSITOR_BYTES = 64       # Viewer image and the Denoise node's buffers.
+PROGRESSIVE_BYTES = 40      # Running mean and variance of the passes, plus the pass just read.
+PIXEL_COPY_BYTES = 16       # Float RGBA pixels read back from Blender.
+HALF_COPY_BYTES = 8         # The same in half floats.
+GUIDE_BYTES = 29            # NumPy denoiser positions, normals and coverage.
+ENCODE_BYTES = 8            # Encoded file data of the lightmap being written.
+BYTES_PER_VERTEX = 96
+BYTES_PER_TRIANGLE = 256    # Bake mesh, Cycles' copy of it and its BVH.
+
+
+class MemoryEstimate():
+    """ Predicted peak memory of baking one group on top of what Blender already uses, split by what holds it. """
+    def __init__(self, tiled, half_precision):
+        self.tiled = tiled
+        self.half_precision = half_precision
+        self.parts = {}
+
+    def add(self, name, num_bytes):
+        self.parts[name] = self.parts.get(name, 0) + int(num_bytes)
+
+    @property
+    def total(self):
+        return sum(self.parts.values())
+
+    @property
+    def total_mb(self):
+        return self.total / MB
+
+    def describe(self):
+        mode = ("tiled" if self.tiled else "single image") + (", half precision" if self.half_precision else "")
+        parts = sorted(self.parts.items(), key=lambda item: item[1], reverse=True)
+        return f"{self.total_mb:.0f} MB ({mode}): " + ", ".join(f"{name} {num_bytes / MB:.0f} MB" for name, num_bytes in parts)
+
+
+def estimate_bake_memory(width, height, vertices, triangles, denoiser='NONE', progressive=False, half_precision=False,
+                         pending_outputs=2, mips=False, tile_size=None, padding=0):
+    """ Estimate the peak memory of baking a width x height lightmap of a bake object with the given vertex and
+    triangle counts. A tile_size estimates a tiled bake, whose images only cover a padded tile. """
+    tiled = tile_size is not None
+    estimate = MemoryEstimate(tiled, half_precision and not tiled)
+    estimate.add("geometry", vertices * BYTES_PER_VERTEX + triangles * BYTES_PER_TRIANGLE)
+
+    bake_pixels = (tile_size + 2 * padding) ** 2 if tiled else width * height
+    estimate.add("bake image", bake_pixels * BAKE_IMAGE_BYTES)
+    estimate.add("cycles", bake_pixels * CYCLES_BAKE_BYTES)
+    if denoiser == 'COMPOSITOR':
+        estimate.add("compositor", bake_pixels * COMPOSITOR_BYTES)
+    if progressive:
+        estimate.add("progressive", bake_pixels * PROGRESSIVE_BYTES)
+    estimate.add("pixel copies", bake_pixels * PIXEL_COPY_BYTES)
+
+    if tiled:
+        if denoiser == 'NUMPY':
+            estimate.add("denoise", bake_pixels * (GUIDE_BYTES + PIXEL_COPY_BYTES))
+        estimate.add("tile band", width * tile_size * BYTES_PER_BAND_PIXEL)
+        return estimate
+
+    copy_bytes = HALF_COPY_BYTES if estimate.half_precision else PIXEL_COPY_BYTES
+    # Lightmaps waiting for the output threads while the next group bakes.
+    estimate.add("output queue", pending_outputs * bake_pixels * copy_bytes)
+    if denoiser == 'NUMPY':
+        estimate.add("denoise", bake_pixels * (GUIDE_BYTES + copy_bytes))
+    if mips:
+        estimate.add("mips", bake_pixels * copy_bytes / 3)
+    estimate.add("encoding", bake_pixels * ENCODE_BYTES)
+    return estimate
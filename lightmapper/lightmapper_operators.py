@@ -3,7 +3,26 @@ import bpy.utils
 import bmesh
 import bpy.ops
 import os.path
-import re
+import time
+import numpy as np
+from bpy.props import BoolProperty, StringProperty  # type: ignore
+
+from .lightmapper_bake_mesh import create_bake_mesh_object, read_mesh_arrays
+from .lightmapper_denoise import denoise_lightmap, get_reach, guide_triangles, rasterize_guides
+from .lightmapper_dilation import coverage_mask, dilate
+from .lightmapper_cache import compute_bake_fingerprint, is_cached, write_fingerprint
+from .lightmapper_image_io import FILE_EXTENSIONS, open_image_writer, read_image_pixels, write_image, write_mips
+from .lightmapper_memory import MB, estimate_bake_memory
+from .lightmapper_output_queue import MAX_PENDING_OUTPUTS, OutputQueue
+from .lightmapper_progressive import ProgressiveAccumulator
+from .lightmapper_scheduler import StepScheduler
+from . import lightmapper_texel_density
+from .lightmapper_texel_density import analyze_texel_density, suggest_resolution
+from .lightmapper_trace import BakeTrace, OutputTrace, get_current_rss_mb, summary_lines
+from .lightmapper_tiles import choose_tile_size, iter_tile_bands, tile_uv
+from .lightmapper_uv_pack import pack_lightmap_uvs
+from . import lightmapper_uv_validation
+from .lightmapper_uv_validation import validate_lightmap_uvs
 
 
 
@@ -20,123 +39,234 @@ class LIGHTMAPPER_OT_create_lightmap_uv(bpy.types.Operator):
             self.report({'ERROR'}, "No mesh objects selected.")
             return {'CANCELLED'}
 
+        props = context.scene.lightmapper_properties
+        shared_layout = props.uv_pack_mode == 'SHARED'
+        if shared_layout and context.mode != 'OBJECT':
+            self.report({'ERROR'}, "Packing a shared Lightmap UV requires object mode.")
+            return {'CANCELLED'}
+
         for obj in mesh_objects:
             uv_layers = obj.data.uv_layers
-            if len(uv_layers) < 2:
+            created = len(uv_layers) < 2
+            if created:
                 uv_layer = uv_layers.new(name="Lightmap")
                 uv_layers.active = uv_layer
                 self.report({'INFO'}, f"Lightmap UV created for {obj.name}.")
             else:
                 self.report({'INFO'}, f"{obj.name} already has a Lightmap UV.")
             
+            # A new layer is a copy of the texture UVs, which overlap, mirror and tile, or all zeros without them.
+            # The shared atlas only repacks islands, so they're unwrapped first. Existing Lightmap UVs are kept.
+            if shared_layout and not created:
+                continue
+            if shared_layout:
+                # Only this object, the other selected objects keep their Lightmap UVs.
+                with context.temp_override(active_object=obj, object=obj, selected_objects=[obj], selected_editable_objects=[obj]):
+                    bpy.ops.uv.lightmap_pack()
+                continue
+
             # Perform lightmap unwrap
             print(f"Performing lightmap unwrap for {obj.name}")
             bpy.context.view_layer.objects.active = obj
             bpy.ops.uv.lightmap_pack()
 
+        if shared_layout:
+            for obj in mesh_objects:
+                if "Lightmap" not in obj.data.uv_layers:
+                    self.report({'ERROR'}, f"Object {obj.name} does not have a Lightmap channel.")
+                    return {'CANCELLED'}
+
+            # Pack the islands of every object into one layout, with the same texel density everywhere.
+            try:
+                island_count = pack_lightmap_uvs(mesh_objects, props.lightmap_width, props.lightmap_height, props.uv_margin)
+            except ValueError as e:
+                self.report({'ERROR'}, str(e))
+                return {'CANCELLED'}
+            self.report({'INFO'}, f"Packed {island_count} islands from {len(mesh_objects)} objects into a shared Lightmap UV.")
+
+        return {'FINISHED'}
+
+
+class LIGHTMAPPER_OT_analyze_texel_density(bpy.types.Operator):
+    bl_idname = "lightmapper.analyze_texel_density"
+    bl_label = "Analyze Texel Density"
+    bl_description = "Measure the texel density of the selected objects' Lightmap UVs and suggest a lightmap resolution"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    apply_resolution: BoolProperty(
+        name="Apply Resolution",
+        description="Set the lightmap width and height to the suggested resolution",
+        default=False
+    )  # type: ignore
+
+    def execute(self, context):
+        mesh_objects = [obj for obj in context.selected_objects if obj.type == 'MESH']
+        if not mesh_objects:
+            self.report({'ERROR'}, "No mesh objects selected.")
+            return {'CANCELLED'}
+
+        for obj in mesh_objects:
+            if "Lightmap" not in obj.data.uv_layers:
+                self.report({'ERROR'}, f"Object {obj.name} does not have a Lightmap channel.")
+                return {'CANCELLED'}
+
+        props = context.scene.lightmapper_properties
+        name = context.active_object.name if context.active_object is not None else mesh_objects[0].name
+        try:
+            report = analyze_texel_density(name, read_mesh_arrays(mesh_objects), props.lightmap_width, props.lightmap_height,
+                                           context.scene.unit_settings.scale_length)
+        except ValueError as e:
+            self.report({'ERROR'}, str(e))
+            return {'CANCELLED'}
+
+        width, height = suggest_resolution(report, props.target_texels_per_meter)
+        lightmapper_texel_density.last_report = (report, (width, height))
+        for line in report.lines():
+            print(line)
+        self.report({'INFO'}, f"Median {report.median_density:.1f} texels/m, suggested resolution {width}x{height}.")
+
+        if self.apply_resolution:
+            props.lightmap_width = width
+            props.lightmap_height = height
+        return {'FINISHED'}
+
+
+class LIGHTMAPPER_OT_validate_lightmap_uv(bpy.types.Operator):
+    bl_idname = "lightmapper.validate_lightmap_uv"
+    bl_label = "Validate Lightmap UV"
+    bl_description = "Check the selected objects' Lightmap UVs for overlaps, islands outside 0-1, islands closer than the bake margin and degenerate faces"
+    bl_options = {'REGISTER'}
+
+    def execute(self, context):
+        mesh_objects = [obj for obj in context.selected_objects if obj.type == 'MESH']
+        if not mesh_objects:
+            self.report({'ERROR'}, "No mesh objects selected.")
+            return {'CANCELLED'}
+
+        for obj in mesh_objects:
+            if "Lightmap" not in obj.data.uv_layers:
+                self.report({'ERROR'}, f"Object {obj.name} does not have a Lightmap channel.")
+                return {'CANCELLED'}
+
+        props = context.scene.lightmapper_properties
+        name = context.active_object.name if context.active_object is not None else mesh_objects[0].name
+        report = validate_lightmap_uvs(name, read_mesh_arrays(mesh_objects), props.lightmap_width, props.lightmap_height,
+                                       context.scene.render.bake.margin)
+        lightmapper_uv_validation.last_report = report
+        for line in report.lines():
+            print(line)
+        self.report({'INFO'} if report.is_valid else {'WARNING'}, report.summary())
         return {'FINISHED'}
 
+
 class SceneState():
-    def __init__(self, bake_node_material_name="LIGHTMAPPER_TMP_EMPTY_MAT", bake_node_name="LIGHTMAPPER_TMP_IMAGE_NODE"):
-        self.original_selection = None
-        self.bake_node_material_name = bake_node_material_name
-        self.bake_node_name = bake_node_name
+    """ Records the original value of everything the bake changes, so restoring only touches what was changed.
 
-        
-    def save_original_materials(self):
-        original_materials = {}
-        for obj in bpy.context.selected_objects:
-            if obj.type == 'MESH':
-                original_materials[obj] = [slot.material for slot in obj.material_slots]
-        return original_materials
-    
-    def save_compositor_state(self):
-        scene = bpy.context.scene
-        if scene.use_nodes:
-            self.original_compositor_nodes = [node.copy() for node in scene.node_tree.nodes]
-            self.original_compositor_links = [link.copy() for link in scene.node_tree.links]
+    Changes go through set(), select() and new_node() instead of being made directly. The first change of a property
+    remembers its original value, restore() puts those back and removes the inserted nodes, in O(changed).
+    """
+    def __init__(self):
+        # (pointer, attribute) -> (struct, attribute, original value), in the order they were first changed.
+        self.original_values = {}
+        # pointer -> (object, originally selected)
+        self.original_selection = {}
+        # (node tree, node name) of every node added for the bake.
+        self.inserted_nodes = []
+        # Materials that only exist for the bake.
+        self.created_materials = []
 
-    def restore_compositor_state(self):
-        scene = bpy.context.scene
-        if scene.use_nodes and self.original_compositor_nodes and self.original_compositor_links:
-            scene.node_tree.nodes.clear()
-            scene.node_tree.links.clear()
-            for node in self.original_compositor_nodes:
-                scene.node_tree.nodes.new(type=node.bl_idname)
-                for attr in dir(node):
-                    if not attr.startswith("__") and not callable(getattr(node, attr)):
-                        setattr(scene.node_tree.nodes[-1], attr, getattr(node, attr))
-            for link in self.original_compositor_links:
-                scene.node_tree.links.new(
-                    scene.node_tree.nodes[link.from_node.name].outputs[link.from_socket.name],
-                    scene.node_tree.nodes[link.to_node.name].inputs[link.to_socket.name]
-                )
-    
-    def restore_empty_materials(self):
-        """ Removes temporary bake material from selected objects, they will be applied if the material slot has an empty material """
-        for obj in self.original_selection:
-            if obj.type == 'MESH':
-                for slot in obj.material_slots:
-                    if slot.material and slot.material.name == self.bake_node_material_name:
-                        obj.data.materials.pop(index=obj.material_slots.find(slot.material.name))
-                        
-    def restore_original_materials(self):
-        """ Removes the bake image node that was created for the bake. """
-        for obj, materials in self.original_materials.items():
-            for material in materials:
-                if material and material.node_tree:
-                    nodes = material.node_tree.nodes
-                    for node in nodes:
-                        if node.name == self.bake_node_name:
-                            nodes.remove(node)
-                            
-    def restore_selection(self):
-        # deselect all
-        bpy.ops.object.select_all(action='DESELECT')
-        
-        # select all original objects and make them renderable.
-        for obj in self.original_selection:
-            obj.select_set(True)
-            obj.hide_render = False
-            
-        # set the original active object
-        if self.original_active_object is not None:
-            bpy.context.view_layer.objects.active = self.original_active_object
-        
-    def save(self, context):
-        self.engine = bpy.context.scene.render.engine
-        self.samples = bpy.context.scene.cycles.samples
-        self.use_denoising = bpy.context.scene.cycles.use_denoising
-        self.bake_type = bpy.context.scene.cycles.bake_type
-        self.use_pass_direct = bpy.context.scene.render.bake.use_pass_direct
-        self.use_pass_indirect = bpy.context.scene.render.bake.use_pass_indirect
-        self.use_pass_color = bpy.context.scene.render.bake.use_pass_color
-        self.use_selected_to_active = bpy.context.scene.render.bake.use_selected_to_active
-        
-        self.original_active_object = bpy.context.view_layer.objects.active
-        self.original_selection = context.selected_objects
-        self.active_object = context.active_object
-        self.original_materials = self.save_original_materials()
+    def remember(self, struct, attribute):
+        """ Record the current value of struct.attribute, unless it's already recorded. """
+        key = (struct.as_pointer(), attribute)
+        if key not in self.original_values:
+            self.original_values[key] = (struct, attribute, getattr(struct, attribute))
+
+    def set(self, struct, attribute, value):
+        self.remember(struct, attribute)
+        setattr(struct, attribute, value)
+
+    def revert(self, struct, attribute):
+        """ Put back the original value of a single property ahead of the full restore. """
+        entry = self.original_values.pop((struct.as_pointer(), attribute), None)
+        if entry is not None:
+            setattr(struct, attribute, entry[2])
+
+    def select(self, obj, state):
+        key = obj.as_pointer()
+        if key not in self.original_selection:
+            self.original_selection[key] = (obj, obj.select_get())
+        obj.select_set(state)
+
+    def new_node(self, tree, node_type, name=None):
+        node = tree.nodes.new(type=node_type)
+        if name is not None:
+            node.name = name
+        self.inserted_nodes.append((tree, node.name))
+        return node
+
+    def new_material(self, name):
+        material = bpy.data.materials.new(name)
+        self.created_materials.append(material)
+        return material
 
-        # self.save_compositor_state()
-    
     def restore(self, context):
-        bpy.context.scene.render.engine = self.engine
-        bpy.context.scene.cycles.samples = self.samples
-        bpy.context.scene.cycles.use_denoising = self.use_denoising
+        # Nodes first, they may point at data the properties below refer to.
+        for tree, name in reversed(self.inserted_nodes):
+            try:
+                node = tree.nodes.get(name)
+                if node is not None:
+                    tree.nodes.remove(node)
+            except ReferenceError:
+                pass # The tree was removed with its owner.
 
-        bpy.context.scene.cycles.bake_type = self.bake_type
-        bpy.context.scene.render.bake.use_pass_direct = self.use_pass_direct
-        bpy.context.scene.render.bake.use_pass_indirect = self.use_pass_indirect
-        bpy.context.scene.render.bake.use_pass_color = self.use_pass_color
+        for struct, attribute, value in reversed(list(self.original_values.values())):
+            try:
+                setattr(struct, attribute, value)
+            except ReferenceError:
+                pass
 
-        bpy.context.scene.render.bake.use_selected_to_active = self.use_selected_to_active
+        for obj, selected in self.original_selection.values():
+            try:
+                obj.select_set(selected)
+            except ReferenceError:
+                pass
 
-        self.restore_selection()
-        self.restore_original_materials()
-        self.restore_empty_materials()
-        # self.restore_compositor_state()
-        
+        for material in self.created_materials:
+            try:
+                bpy.data.materials.remove(material, do_unlink=True)
+            except ReferenceError:
+                pass
+
+        self.original_values.clear()
+        self.original_selection.clear()
+        self.inserted_nodes.clear()
+        self.created_materials.clear()
+
+
+# Cycles bake type and diffuse pass filter (direct, indirect, color) of each bake pass, in output order.
+BAKE_PASSES = {
+    'LIGHTMAP': ('DIFFUSE', True, True, False),
+    'DIRECT': ('DIFFUSE', True, False, False),
+    'INDIRECT': ('DIFFUSE', False, True, False),
+    'AO': ('AO', False, False, False),
+    'COLOR': ('DIFFUSE', False, False, True),
+}
+
+
+def post_process_lightmap(pixels, uv_triangles, positions, normals, numpy_denoise, dilation):
+    """ Denoise a baked lightmap, or a tile of it given UVs remapped to the tile, with the NumPy denoiser when
+    numpy_denoise is (iterations, strength), then dilate it. Never touches bpy, so it can run off the main thread. """
+    height, width = pixels.shape[:2]
+    mask = None
+    if numpy_denoise is not None:
+        guides = rasterize_guides(uv_triangles, positions, normals, width, height)
+        pixels = denoise_lightmap(pixels, guides, *numpy_denoise)
+        mask = guides.mask
+    if dilation > 0:
+        if mask is None:
+            mask = coverage_mask(uv_triangles, width, height)
+        dilate(pixels, mask, dilation)
+    return pixels
 
 
 class LIGHTMAPPER_OT_bake_lightmap(bpy.types.Operator):
@@ -146,15 +276,26 @@ class LIGHTMAPPER_OT_bake_lightmap(bpy.types.Operator):
     bl_options = {'REGISTER', 'UNDO'}
 
     def __init__(self):
-        self.TMP_EMPTY_MAT_NAME = "BAKELAB_TMP_EMPTY_MAT"
-        self.TMP_IMAGE_NODE_NAME = "BAKELAB_TMP_IMAGE_NODE"
+        self.TMP_EMPTY_MAT_NAME = "LIGHTMAPPER_TMP_EMPTY_MAT"
+        self.TMP_IMAGE_NODE_NAME = "LIGHTMAPPER_TMP_IMAGE_NODE"
+        self.TMP_COMPOSITOR_PREFIX = "LIGHTMAPPER_TMP_DENOISE_"
         
-        self._timer = None
+        self.scheduler = None
         self.bake_iterator = None
         
         self.bake_object = None
         self.bake_name = None
         self.bake_image = None
+        self.bake_width = None
+        self.bake_height = None
+        self.trace = None
+        self.empty_material = None
+        self.output_queue = None
+        self.bake_pass = 'LIGHTMAP'
+        # Picked per group by the memory estimate.
+        self.tiled = False
+        self.tile_layout = None
+        self.half_precision = False
         
         self.scene_state = SceneState()
 
@@ -224,15 +365,17 @@ class LIGHTMAPPER_OT_bake_lightmap(bpy.types.Operator):
         self.report({'INFO'}, "Correcting UV Selections.")
         # Ensure that the first UVMap is set to render, and that "Lightmap" UV is selected.
         for obj in mesh_objects:
+            uv_layers = obj.data.uv_layers
             # If the lightmap is renderable, set it to the first UVMap. Otherwise respect user choice.
-            obj.data.uv_layers[0].active_render = True
+            self.scene_state.set(uv_layers[0], "active_render", True)
             # Ensure the lightmap is selected, as that's the UV we're baking to.
-            obj.data.uv_layers["Lightmap"].active = True
+            self.scene_state.set(uv_layers, "active", uv_layers["Lightmap"])
        
-    def _create_bake_image(self, context):
-        # get the resolution from the props
-        width = self.lightmapper_props.lightmap_width
-        height = self.lightmapper_props.lightmap_height
+    def _create_bake_image(self, context, width=None, height=None):
+        # get the resolution of the group being baked
+        if width is None or height is None:
+            width = self.bake_width
+            height = self.bake_height
         new_image = bpy.data.images.new(name="BakeImage", width=width, height=height)
         
         # set the float depth
@@ -245,81 +388,53 @@ class LIGHTMAPPER_OT_bake_lightmap(bpy.types.Operator):
         return new_image
         
        
-    def _create_bakeable_object(self, mesh_objects):
-        """ Create a combined mesh from the selected objects, applying modifiers to the duplicated objects only. """
-        
-        # Deselect all objects
-        bpy.ops.object.select_all(action='DESELECT')
-        
-        # Select the objects to duplicate
-        for obj in mesh_objects:
-            obj.select_set(True)
-
-        # Duplicate the selected objects
-        bpy.ops.object.duplicate(linked=False)
-        
-        # Get the duplicated objects
-        duplicated_objects = [obj for obj in bpy.context.selected_objects if obj not in mesh_objects]
-        
-        # Apply modifiers to the duplicated objects
-        for obj in duplicated_objects:
-            # Set the duplicated object as active
-            bpy.context.view_layer.objects.active = obj
-            
-            # Apply all modifiers on the duplicated object
-            for modifier in obj.modifiers:
-                bpy.ops.object.modifier_apply(modifier=modifier.name)
-        
-        # Join the duplicated objects into a single object
-        bpy.ops.object.join()
-
-        # The newly created object will be the active object
-        new_object = bpy.context.view_layer.objects.active
-        
-        # Rename the new object to "BakeableObject"
-        new_object.name = "BakeableObject"
-        
-        # Return the new combined object
-        return new_object
+    def _create_bakeable_object(self, mesh_objects, mesh_arrays=None):
+        """ Create a combined mesh from the evaluated selected objects. The originals and their modifiers are left untouched. """
+        return create_bake_mesh_object(mesh_objects, name="BakeableObject", mesh_arrays=mesh_arrays)
 
 
 
     
     def _get_empty_material(self):
-        """ Creates a bake compatible material for the bake object. """
-        mat = bpy.data.materials.new(self.TMP_EMPTY_MAT_NAME)
-        mat.use_nodes = True
-        img_node = mat.node_tree.nodes.new(type = 'ShaderNodeTexImage')
-        img_node.name = self.TMP_IMAGE_NODE_NAME
-        return mat
+        """ Bake compatible material for empty slots. One is shared by every group of a bake, and removed when it's done. """
+        if self.empty_material is None:
+            mat = self.scene_state.new_material(self.TMP_EMPTY_MAT_NAME)
+            mat.use_nodes = True
+            img_node = mat.node_tree.nodes.new(type = 'ShaderNodeTexImage')
+            img_node.name = self.TMP_IMAGE_NODE_NAME
+            self.empty_material = mat
+        return self.empty_material
     
     def _apply_bake_image(self, bake_object):
-        """ Apply the bake image to all materials in the bake_object"""
-        if len(bake_object.material_slots) == 0:
-            bpy.ops.object.material_slot_add()
-        for slot in bake_object.material_slots:
-            if slot.material is None:
-                slot.material = self._get_empty_material()
-            mat = slot.material
-            mat.use_nodes = True
-            if self.TMP_IMAGE_NODE_NAME in mat.node_tree.nodes:
-                img_node = mat.node_tree.nodes[self.TMP_IMAGE_NODE_NAME]
+        """ Apply the bake image to all materials in the bake_object. Each material is set up once, however many slots use it. """
+        materials = bake_object.data.materials
+        if len(materials) == 0:
+            materials.append(None)
+        for index, material in enumerate(materials):
+            if material is None:
+                materials[index] = self._get_empty_material()
+
+        unique_materials = {mat.as_pointer(): mat for mat in materials}
+        for mat in unique_materials.values():
+            self.scene_state.set(mat, "use_nodes", True)
+            nodes = mat.node_tree.nodes
+            if self.TMP_IMAGE_NODE_NAME in nodes:
+                img_node = nodes[self.TMP_IMAGE_NODE_NAME]
             else:
-                img_node = mat.node_tree.nodes.new(type = 'ShaderNodeTexImage')
-                img_node.name = self.TMP_IMAGE_NODE_NAME
-            mat.node_tree.nodes.active = img_node
+                img_node = self.scene_state.new_node(mat.node_tree, 'ShaderNodeTexImage', self.TMP_IMAGE_NODE_NAME)
+            self.scene_state.set(nodes, "active", img_node)
             img_node.image = self.bake_image
             
     def _prepare_object_for_bake(self, mesh_objects, bake_object):
         """ Get object context ready for baking, disabling the original objects and setting the bake object as the active object. """
         # Ensure the original objects are hidden and unselected
         for obj in mesh_objects:
-            obj.select_set(False)
-            obj.hide_render = True
+            self.scene_state.select(obj, False)
+            self.scene_state.set(obj, "hide_render", True)
         
         # Ensure the bake object is selected and active, with correct UVs
         bake_object.select_set(True)
-        bpy.context.view_layer.objects.active = bake_object
+        self.scene_state.set(bpy.context.view_layer.objects, "active", bake_object)
         
         # Ensure the lightmap is selected, as that's the UV we're baking to.
         bake_object.data.uv_layers[0].active_render = True
@@ -328,80 +443,110 @@ class LIGHTMAPPER_OT_bake_lightmap(bpy.types.Operator):
     
     def _setup_bake_settings(self):
         """ Set up bake settings for diffuse lightmap baking. """
-        bpy.context.scene.render.engine = 'CYCLES'
-        bpy.context.scene.cycles.samples = self.lightmapper_props.num_samples
-        bpy.context.scene.cycles.use_denoising = False
-
-        bpy.context.scene.cycles.bake_type = 'DIFFUSE'
-        bpy.context.scene.render.bake.use_pass_direct = True
-        bpy.context.scene.render.bake.use_pass_indirect = True
-        bpy.context.scene.render.bake.use_pass_color = False
+        scene = bpy.context.scene
+        state = self.scene_state
+        state.set(scene.render, "engine", 'CYCLES')
+        state.set(scene.cycles, "samples", self.lightmapper_props.num_samples)
+        state.set(scene.cycles, "use_denoising", False)
+
+        state.set(scene.cycles, "bake_type", 'DIFFUSE')
+        state.set(scene.render.bake, "use_pass_direct", True)
+        state.set(scene.render.bake, "use_pass_indirect", True)
+        state.set(scene.render.bake, "use_pass_color", False)
         
-        bpy.context.scene.render.bake.use_selected_to_active = False
+        state.set(scene.render.bake, "use_selected_to_active", False)
+
+    def _setup_bake_pass(self, bake_pass):
+        """ Point Cycles at one bake pass. The bake object, its materials and the scene are shared by all passes. """
+        bake_type, direct, indirect, color = BAKE_PASSES[bake_pass]
+        scene = bpy.context.scene
+        state = self.scene_state
+        self.bake_pass = bake_pass
+        state.set(scene.cycles, "bake_type", bake_type)
+        state.set(scene.render.bake, "use_pass_direct", direct)
+        state.set(scene.render.bake, "use_pass_indirect", indirect)
+        state.set(scene.render.bake, "use_pass_color", color)
         
     def _setup_compositor_for_denoising(self):
         # Enable use_nodes for the current scene
-        bpy.context.scene.use_nodes = True
-        tree = bpy.context.scene.node_tree
+        scene = bpy.context.scene
+        self.scene_state.set(scene, "use_nodes", True)
+        tree = scene.node_tree
 
-        # Clear default nodes
-        for node in tree.nodes:
-            tree.nodes.remove(node)
+        input_name = self.TMP_COMPOSITOR_PREFIX + "INPUT"
+        if input_name not in tree.nodes:
+            # Leave the user's compositor in place, but stop it from rendering the scene or writing files.
+            for node in tree.nodes:
+                if node.bl_idname in {'CompositorNodeRLayers', 'CompositorNodeOutputFile'} and not node.mute:
+                    self.scene_state.set(node, "mute", True)
 
-        # Create input image node
-        input_node = tree.nodes.new(type='CompositorNodeImage')
-        input_node.image = self.bake_image
+            # Create input image node
+            input_node = self.scene_state.new_node(tree, 'CompositorNodeImage', input_name)
 
-        # Create denoise node
-        denoise_node = tree.nodes.new(type='CompositorNodeDenoise')
+            # Create denoise node
+            denoise_node = self.scene_state.new_node(tree, 'CompositorNodeDenoise', self.TMP_COMPOSITOR_PREFIX + "DENOISE")
 
-        # Create output node
-        output_node = tree.nodes.new(type='CompositorNodeOutputFile')
-        output_node.format.file_format = 'HDR'
-        output_node.format.color_depth = '32'
-        output_node.format.exr_codec = 'ZIP'
-        
-        
-        output_node.base_path = bpy.context.scene.lightmapper_properties.export_path
-        output_node.file_slots[0].path = self.bake_name
+            # Create a viewer node, we read the denoised pixels back from its image instead of writing files.
+            viewer_node = self.scene_state.new_node(tree, 'CompositorNodeViewer', self.TMP_COMPOSITOR_PREFIX + "VIEWER")
+
+            # Link nodes
+            tree.links.new(input_node.outputs[0], denoise_node.inputs[0])
+            tree.links.new(denoise_node.outputs[0], viewer_node.inputs[0])
 
-        # Link nodes
-        tree.links.new(input_node.outputs[0], denoise_node.inputs[0])
-        tree.links.new(denoise_node.outputs[0], output_node.inputs[0])
+            # Rendering fails without a Composite node, in versions that still have one.
+            composite_type = 'CompositorNodeComposite'
+            if hasattr(bpy.types, composite_type) and not any(node.bl_idname == composite_type for node in tree.nodes):
+                composite_node = self.scene_state.new_node(tree, composite_type, self.TMP_COMPOSITOR_PREFIX + "COMPOSITE")
+                tree.links.new(denoise_node.outputs[0], composite_node.inputs[0])
+
+        # Batch bakes reuse the nodes of the previous group.
+        tree.nodes[input_name].image = self.bake_image
+        self.scene_state.set(tree.nodes, "active", tree.nodes[self.TMP_COMPOSITOR_PREFIX + "VIEWER"])
         
     def _render_denoised_image(self):
-        # Run the compositor
-        bpy.ops.render.render(write_still=True)
-        
-    def _clean_up_exported_name(self):
-        export_path = bpy.context.scene.lightmapper_properties.export_path
-        exported_file = None
-        cleaned_file = os.path.join(export_path, f"{self.bake_name}.hdr")
-
-        print(f"Export path: {export_path}")
-        print(f"Expected cleaned file: {cleaned_file}")
-
-        for file in os.listdir(export_path):
-            print(f"Checking file: {file}")
-            if file.startswith(self.bake_name) and file.endswith(".hdr"):
-                if re.match(rf"{re.escape(self.bake_name)}\d{{4}}\.hdr$", file):
-                    exported_file = os.path.join(export_path, file)
-                    print(f"Found exported file: {exported_file}")
-                    break
-
-        if exported_file is None:
-            print("Exported file not found.")
-            return
+        """ Run the compositor. With the Render Layers nodes muted the scene itself isn't rendered.
+        Returns False, after reporting why, when it didn't leave the denoised pixels in the viewer image. """
+        try:
+            result = bpy.ops.render.render()
+        except RuntimeError as e:
+            self.report({'ERROR'}, f"Denoising {self.bake_name} in the compositor failed: {e}")
+            return False
+        viewer = bpy.data.images.get("Viewer Node")
+        if 'FINISHED' not in result or viewer is None:
+            self.report({'ERROR'}, f"Denoising {self.bake_name} in the compositor left no Viewer Node image. "
+                                   f"Check the scene's compositor, or use the NumPy denoiser.")
+            return False
+        return True
 
-        if os.path.exists(cleaned_file):
-            print(f"Removing existing cleaned file: {cleaned_file}")
-            os.remove(cleaned_file)
+    def _read_output_pixels(self):
+        """ Read the final lightmap pixels, from the compositor viewer when denoising there, or straight from the bake image. """
+        if self._get_denoiser() == 'COMPOSITOR':
+            return read_image_pixels(bpy.data.images["Viewer Node"])
+        return read_image_pixels(self.bake_image)
+
+    def _get_denoiser(self):
+        # Albedo has no noise to remove.
+        if self.bake_pass == 'COLOR':
+            return 'NONE'
+        return self.lightmapper_props.denoiser
+
+    def _get_bake_passes(self):
+        """ The selected bake passes, in output order. """
+        return [bake_pass for bake_pass in BAKE_PASSES if bake_pass in self.lightmapper_props.bake_passes] or ['LIGHTMAP']
+
+    def _get_pass_name(self, bake_pass):
+        """ The lightmap pass keeps the group's name, other passes get it suffixed, like Room_ao. """
+        return self.bake_name if bake_pass == 'LIGHTMAP' else f"{self.bake_name}_{bake_pass.lower()}"
+
+    def _get_output_file(self, bake_pass=None):
+        """ File a bake pass is written to, the first selected pass by default. """
+        bake_pass = bake_pass or self._get_bake_passes()[0]
+        extension = FILE_EXTENSIONS[self.lightmapper_props.output_format]
+        return os.path.join(self.lightmapper_props.export_path, f"{self._get_pass_name(bake_pass)}{extension}")
 
-        print(f"Renaming {exported_file} to {cleaned_file}")
-        os.rename(exported_file, cleaned_file)
-        
     def save_state(self, context):
-        self.scene_state.save(context)
+        # The active object changes as soon as the bake object is created.
+        self.scene_state.remember(context.view_layer.objects, "active")
         
     def restore_state(self, context):
         self.scene_state.restore(context)
@@ -425,21 +570,42 @@ class LIGHTMAPPER_OT_bake_lightmap(bpy.types.Operator):
         # Run the update loop as an iterator.
         self.save_state(context)
         self.bake_iterator = self.bake(context)
-        # We'll update every 0.5 seconds.
-        self._timer = context.window_manager.event_timer_add(0.5, window=context.window)  # Check every 0.5 seconds
+
+        if bpy.app.background:
+            # Command line bakes have no window to drive a modal operator, run the whole bake now.
+            self.bake_name = self._get_bake_name(context)
+            return self._execute_blocking(context)
+
+        # Cheap steps run back to back, the scheduler only slows down to poll while Cycles is busy.
+        self.scheduler = StepScheduler(context.window_manager, context.window)
+        self.scheduler.start()
         context.window_manager.modal_handler_add(self)
-        
+
+        self.bake_name = self._get_bake_name(context)
+
+        return {'RUNNING_MODAL'}
+
+    def _execute_blocking(self, context):
+        for result in self.bake_iterator:
+            if result == 2:
+                time.sleep(0.01) # Waiting on the output threads.
+            if result == -1:
+                self.cancel(context)
+                return {'CANCELLED'}
+            if result == 0:
+                self.finish(context)
+                return {'FINISHED'}
+        self.finish(context)
+        return {'FINISHED'}
+
+    def _get_bake_name(self, context):
         bake_name_target = bpy.context.scene.lightmapper_properties.bake_name
-        if bake_name_target == 'ACTIVE_OBJECT':
-            self.bake_name = context.active_object.name
+        if bake_name_target == 'ACTIVE_OBJECT' and context.active_object is not None:
+            return context.active_object.name
         elif bake_name_target == 'COLLECTION':
-            self.bake_name = context.view_layer.active_layer_collection.collection.name
-        else:
-            self.bake_name = "error: bad_name"
-        
+            return context.view_layer.active_layer_collection.collection.name
+        return "error: bad_name"
 
-        return {'RUNNING_MODAL'}
-    
     def bake(self, context):
        
         
@@ -448,45 +614,471 @@ class LIGHTMAPPER_OT_bake_lightmap(bpy.types.Operator):
         
         mesh_objects = [obj for obj in context.selected_objects if obj.type == 'MESH']
         # deselect everything so we're not baking lights and empties.
-        bpy.ops.object.select_all(action='DESELECT')
+        for obj in context.selected_objects:
+            self.scene_state.select(obj, False)
         
-        if not self._validate_export_path(context):
+        self.trace = BakeTrace(self.bake_name)
+        with self.trace.phase("validate"):
+            valid = self._validate_export_path(context) and self._validate_mesh_objects(context, mesh_objects)
+        if not valid:
             yield -1
-        
-        if not self._validate_mesh_objects(context, mesh_objects):
+
+        self._setup_bake_settings()
+        status = yield from self.bake_group(context, mesh_objects)
+        if status == 'FAILED':
             yield -1
-        
-        self._select_correct_uv(mesh_objects)
+
+        failures = yield from self._wait_for_outputs()
+        if failures:
+            yield -1
+        yield 0
+
+    def bake_group(self, context, mesh_objects):
+        """ Bake mesh_objects into a single lightmap named self.bake_name. Bake settings must already be set up. """
+        trace = self.trace
+        with trace.phase("select_uv"):
+            self._select_correct_uv(mesh_objects)
         
         yield 1
         
+        # Skip the bake when nothing that ends up in the lightmap has changed.
+        with trace.phase("read_mesh"):
+            mesh_arrays = read_mesh_arrays(mesh_objects)
+            self.bake_width, self.bake_height = self._get_bake_resolution(context, mesh_arrays)
+        # Decide how to bake before anything big is allocated, rather than running out of memory halfway through.
+        with trace.phase("estimate_memory"):
+            fits = self._plan_memory(context, mesh_arrays)
+        if not fits:
+            self._finish_trace('FAILED')
+            return 'FAILED'
+        export_path = self.lightmapper_props.export_path
+        bake_settings = self._get_bake_settings()
+        parts = mesh_arrays[0]
+        trace.add(objects=len(mesh_objects), vertices=sum(len(part.co) for part in parts),
+                  faces=sum(len(part.loop_start) for part in parts), output_file=self._get_output_file(),
+                  blender=bpy.app.version_string, **bake_settings)
+        with trace.phase("fingerprint"):
+            fingerprint = compute_bake_fingerprint(context.scene, mesh_objects, mesh_arrays, bake_settings)
+            # Every pass is cached on its own, only the missing or outdated ones are baked.
+            use_cache = self.lightmapper_props.use_bake_cache
+            bake_passes = [bake_pass for bake_pass in self._get_bake_passes() if not use_cache or
+                           not is_cached(export_path, self._get_pass_name(bake_pass), self._get_output_file(bake_pass), fingerprint)]
+        if not bake_passes:
+            self.report({'INFO'}, f"{self.bake_name} is unchanged, reusing {self._get_output_file()}.")
+            self._finish_trace('CACHED')
+            return 'CACHED'
+        trace.add(bake_passes=bake_passes)
+        yield 1
+
+        # Catch broken Lightmap UVs before spending minutes on a bake.
+        uv_validation = self.lightmapper_props.uv_validation
+        if uv_validation != 'OFF':
+            with trace.phase("validate_uv"):
+                uv_report = validate_lightmap_uvs(self.bake_name, mesh_arrays, self.bake_width, self.bake_height,
+                                                  context.scene.render.bake.margin)
+            lightmapper_uv_validation.last_report = uv_report
+            if not uv_report.is_valid:
+                for line in uv_report.lines():
+                    print(line)
+                if uv_validation == 'ABORT':
+                    self.report({'ERROR'}, uv_report.summary())
+                    self._finish_trace('FAILED')
+                    return 'FAILED'
+                self.report({'WARNING'}, uv_report.summary())
+            yield 1
 
         # 2. Create an image to bake to, and a new bake object to be baked to.
-        self.bake_image = self._create_bake_image(context)
-        self.bake_object = self._create_bakeable_object(mesh_objects)
+        tiled = self.tiled
+        with trace.phase("create_image"):
+            if tiled:
+                tile_size, padding = self.tile_layout
+                print(f"Tiled bake of {self.bake_width}x{self.bake_height} in {tile_size}px tiles with {padding}px padding")
+                self.bake_image = self._create_bake_image(context, tile_size + 2 * padding, tile_size + 2 * padding)
+            else:
+                self.bake_image = self._create_bake_image(context)
+        with trace.phase("create_bake_object"):
+            self.bake_object = self._create_bakeable_object(mesh_objects, mesh_arrays)
         yield 1
-        self._apply_bake_image(self.bake_object)
+        with trace.phase("apply_bake_image"):
+            self._apply_bake_image(self.bake_object)
         yield 1
-        self._prepare_object_for_bake(mesh_objects, self.bake_object)
+        with trace.phase("prepare_object"):
+            self._prepare_object_for_bake(mesh_objects, self.bake_object)
         yield 1
-        self._setup_bake_settings()
-        
 
-        while bpy.ops.object.bake('INVOKE_DEFAULT', type='DIFFUSE') != {'RUNNING_MODAL'}:
-            yield 1 # 'INVOKE_DEFAULT' will give us the progress bar.
-        while not self.bake_image.is_dirty:
-            yield 1
-            
-        self._setup_compositor_for_denoising()
-        yield 1
-        
-        self._render_denoised_image()
-        while bpy.ops.render.render() == {'RUNNING_MODAL'}:
+        # The bake object, its materials and the scene are set up once and shared by every pass.
+        for index, bake_pass in enumerate(bake_passes):
+            self._setup_bake_pass(bake_pass)
+            output_file = self._get_output_file(bake_pass)
+            cache_name = self._get_pass_name(bake_pass)
+            if tiled:
+                # Tiles are streamed into the file while baking, it's complete once the last one is done.
+                complete = yield from self._bake_tiles(context, output_file, tile_size, padding, mesh_arrays)
+                if not complete:
+                    self._finish_trace('FAILED')
+                    return 'FAILED'
+                print(f"Exported lightmap: {output_file}")
+                write_fingerprint(export_path, cache_name, output_file, fingerprint, bake_settings)
+                continue
+
+            if index > 0:
+                # Cycles only writes the texels it bakes, don't let the previous pass show through.
+                self.bake_image.pixels.foreach_set(np.zeros(len(self.bake_image.pixels), dtype=np.float32))
+            with trace.phase("cycles_bake"):
+                baked = yield from self._bake_samples(self.lightmapper_props.sample_time_budget)
+            if not baked:
+                self._finish_trace('FAILED')
+                return 'FAILED'
+
+            if self._get_denoiser() == 'COMPOSITOR':
+                with trace.phase("denoise"):
+                    self._setup_compositor_for_denoising()
+                    yield 1
+
+                    denoised = self._render_denoised_image()
+                if not denoised:
+                    self._finish_trace('FAILED')
+                    return 'FAILED'
+                yield 1
+
+            # Encoding and writing happen on a background thread, the next pass or group can start baking meanwhile.
+            with trace.phase("queue_output"):
+                pixels = self._read_output_pixels()
+                if self.half_precision:
+                    # Half floats hold more precision than any of the output formats, at half the memory.
+                    pixels = pixels.astype(np.float16)
+                if self.output_queue is None:
+                    self.output_queue = OutputQueue()
+                while self.output_queue.is_full():
+                    yield 2
+                self.output_queue.submit(self.bake_name, self._get_output_job(output_file, cache_name, pixels, mesh_arrays,
+                                                                              fingerprint, bake_settings))
+        if "noise_error" in trace.info:
+            self.report({'INFO'}, f"{self.bake_name}: progressive bake reached {trace.info['noise_error']:.2%} noise.")
+        self._finish_trace('BAKED')
+        return 'BAKED'
+
+    def _get_output_job(self, output_file, cache_name, pixels, mesh_arrays, fingerprint, bake_settings):
+        """ A function denoising, dilating and writing the lightmap, its mips and its fingerprint, safe to run off the main thread. """
+        # Read everything from Blender now, the job must not touch bpy.
+        export_path = self.lightmapper_props.export_path
+        bake_name = self.bake_name
+        output_format = self.lightmapper_props.output_format
+        encoding_range = self.lightmapper_props.encoding_range
+        mips = self.lightmapper_props.write_mips
+        numpy_denoise = self._get_numpy_denoise()
+        dilation = self.lightmapper_props.dilation_pixels
+
+        def write_outputs():
+            nonlocal pixels
+            # The bake's trace is already written, the output adds its own write_output event.
+            trace = OutputTrace(bake_name, output_file)
+            try:
+                if numpy_denoise is not None or dilation > 0:
+                    with trace.phase("post_process"):
+                        pixels = post_process_lightmap(pixels, *guide_triangles(mesh_arrays), numpy_denoise, dilation)
+                with trace.phase("write_output"):
+                    write_image(output_file, pixels, output_format, encoding_range)
+                if mips:
+                    with trace.phase("write_mips"):
+                        mip_files = write_mips(output_file, pixels, output_format, encoding_range)
+                    print(f"Exported {len(mip_files)} mips of {bake_name}")
+            except Exception:
+                # Don't leave a partial file that looks like a finished lightmap.
+                if os.path.exists(output_file):
+                    os.remove(output_file)
+                trace.write(export_path, 'FAILED')
+                raise
+            record = trace.write(export_path, 'WRITTEN')
+            print(f"Exported lightmap: {output_file} in {record['total_seconds']:.2f}s")
+            # Only a fully written lightmap may be picked up by the bake cache.
+            write_fingerprint(export_path, cache_name, output_file, fingerprint, bake_settings)
+        return write_outputs
+
+    def _wait_for_outputs(self):
+        """ Wait for the queued lightmaps to be written. Returns the names of those that failed. """
+        if self.output_queue is None:
+            return set()
+        while not self.output_queue.is_idle():
+            yield 2
+        return self._join_output_queue()
+
+    def _join_output_queue(self):
+        finished, failures = self.output_queue.join()
+        self.output_queue = None
+        for name, seconds in finished:
+            print(f"Wrote {name} in {seconds:.2f}s")
+        for name, error in failures:
+            self.report({'ERROR'}, f"Writing the lightmap of {name} failed: {error}")
+        return {name for name, _ in failures}
+
+    def _finish_trace(self, status):
+        """ Append the trace of the current group next to its lightmap. """
+        if self.trace is None:
+            return
+        trace, self.trace = self.trace, None
+        if not os.path.isdir(self.lightmapper_props.export_path):
+            return
+        record = trace.write(self.lightmapper_props.export_path, status)
+        print("Bake trace: " + ", ".join(summary_lines(record)))
+
+    def _run_cycles_bake(self):
+        """ Bake the active object and wait for Cycles to finish. Returns False, after reporting why, when Cycles refused to bake. """
+        bake_type = BAKE_PASSES[self.bake_pass][0]
+        if bpy.app.background:
+            # Without an event loop the bake job would never run, bake in place instead.
+            try:
+                bpy.ops.object.bake(type=bake_type)
+            except RuntimeError as e:
+                self.report({'ERROR'}, f"Baking {self.bake_name} failed: {e}")
+                return False
+            return True
+        while True:
+            try:
+                result = bpy.ops.object.bake('INVOKE_DEFAULT', type=bake_type) # 'INVOKE_DEFAULT' will give us the progress bar.
+            except RuntimeError as e:
+                self.report({'ERROR'}, f"Baking {self.bake_name} failed: {e}")
+                return False
+            if result == {'RUNNING_MODAL'}:
+                break
+            # Only another bake still running is worth waiting for, anything else fails the same way every time.
+            if not bpy.app.is_job_running('OBJECT_BAKE'):
+                self.report({'ERROR'}, f"Cycles refused to bake {self.bake_name}, see the console for why.")
+                return False
+            yield 2
+        while bpy.app.is_job_running('OBJECT_BAKE'):
+            yield 2 # Cycles is baking, poll slowly.
+        return True
+
+    def _bake_samples(self, time_budget):
+        """ Bake into self.bake_image, either all samples in one go or progressively until the noise is low enough.
+        Returns False when a bake failed. """
+        props = self.lightmapper_props
+        if props.sampling_mode != 'PROGRESSIVE':
+            return (yield from self._run_cycles_bake())
+
+        # Cycles can't vary the samples per texel when baking, so every pass covers the whole image with a new seed,
+        # and passes stop once the accumulated mean is clean enough.
+        scene = bpy.context.scene
+        pass_samples = min(props.pass_samples, props.num_samples)
+        self.scene_state.set(scene.cycles, "samples", pass_samples)
+        self.scene_state.remember(scene.cycles, "seed")
+        accumulator = ProgressiveAccumulator()
+        start_time = time.perf_counter()
+        error = None
+        while True:
+            scene.cycles.seed = accumulator.count
+            if not (yield from self._run_cycles_bake()):
+                return False
+            accumulator.add(read_image_pixels(self.bake_image))
+            error = accumulator.error()
+            samples = accumulator.count * pass_samples
+            if error is not None and error <= props.noise_threshold:
+                break
+            if samples + pass_samples > props.num_samples or time.perf_counter() - start_time > time_budget:
+                break
             yield 1
 
-        self._clean_up_exported_name()
-            
-        yield 0
+        self.bake_image.pixels.foreach_set(accumulator.pixels().ravel())
+        seconds = time.perf_counter() - start_time
+        error_text = f"{error:.2%}" if error is not None else "unknown"
+        print(f"Progressive bake of {self.bake_name}: {samples} samples in {accumulator.count} passes, {seconds:.1f}s, noise {error_text}")
+        if self.trace is not None:
+            previous_error = self.trace.info.get("noise_error") or 0.0
+            self.trace.add(progressive_passes=self.trace.info.get("progressive_passes", 0) + accumulator.count,
+                           noise_error=max(previous_error, error or 0.0))
+        return True
+
+    def _get_bake_resolution(self, context, mesh_arrays):
+        """ Lightmap size of the group being baked, either from the settings or sized for the target texel density. """
+        width = self.lightmapper_props.lightmap_width
+        height = self.lightmapper_props.lightmap_height
+        if not self.lightmapper_props.auto_resolution:
+            return width, height
+
+        try:
+            report = analyze_texel_density(self.bake_name, mesh_arrays, width, height, context.scene.unit_settings.scale_length)
+        except ValueError as e:
+            self.report({'WARNING'}, f"{e} Using {width}x{height}.")
+            return width, height
+        width, height = suggest_resolution(report, self.lightmapper_props.target_texels_per_meter)
+        lightmapper_texel_density.last_report = (report, (width, height))
+        print(f"Auto resolution for {self.bake_name}: {width}x{height} "
+              f"(median {report.median_density:.1f} texels/m at {report.width}x{report.height})")
+        return width, height
+
+    def _get_tile_padding(self, context):
+        """ Padding baked around each tile of a tiled bake. """
+        # Pad by the bake margin so islands on tile borders get the same margin as in a single bake,
+        # and by the dilation and NumPy denoiser reach so they can see across tile borders.
+        padding = max(context.scene.render.bake.margin, self.lightmapper_props.dilation_pixels)
+        if self.lightmapper_props.denoiser == 'NUMPY':
+            padding = max(padding, get_reach(self.lightmapper_props.denoise_iterations))
+        return padding
+
+    def _plan_memory(self, context, mesh_arrays):
+        """ Estimate the peak memory of baking the group and pick the precision and tiling that fit the memory budget.
+        Sets self.tiled, self.tile_layout and self.half_precision. Returns False when the group must not be baked. """
+        props = self.lightmapper_props
+        parts = mesh_arrays[0]
+        vertices = sum(len(part.co) for part in parts)
+        triangles = sum(int(np.maximum(part.loop_total - 2, 0).sum()) for part in parts)
+        budget = props.memory_budget_mb * MB
+        padding = self._get_tile_padding(context)
+
+        def estimate_mode(half_precision, tile_size=None):
+            return estimate_bake_memory(self.bake_width, self.bake_height, vertices, triangles, props.denoiser,
+                                        props.sampling_mode == 'PROGRESSIVE', half_precision, MAX_PENDING_OUTPUTS,
+                                        props.write_mips, tile_size, padding if tile_size else 0)
+
+        # Tiles as large as the budget allows.
+        tile_size = choose_tile_size(self.bake_width, self.bake_height, lambda size: estimate_mode(False, size).total <= budget)
+        # Cheapest change first: half float copies lose nothing the output formats keep, tiles change how the bake runs.
+        modes = [(False, tile_size)] if props.bake_tiling == 'TILED' else [(False, None), (True, None), (False, tile_size)]
+        if props.memory_policy != 'ADAPT':
+            modes = modes[:1]
+        estimates = [estimate_mode(*mode) for mode in modes]
+        chosen = next((estimate for estimate in estimates if estimate.total <= budget), estimates[-1])
+        print(f"Memory estimate of {self.bake_name}: {chosen.describe()}")
+
+        if chosen.total > budget:
+            message = f"{self.bake_name} needs an estimated {chosen.total_mb:.0f} MB, over the {props.memory_budget_mb} MB budget."
+            if props.memory_policy == 'ABORT':
+                self.report({'ERROR'}, message + " Lower the resolution, bake in tiles or raise the budget.")
+                return False
+            self.report({'WARNING'}, message)
+        elif chosen is not estimates[0]:
+            mode = "tiled baking" if chosen.tiled else "half precision copies"
+            self.report({'INFO'}, f"{self.bake_name}: switched to {mode} to stay within the {props.memory_budget_mb} MB budget.")
+
+        self.tiled = chosen.tiled
+        self.tile_layout = (tile_size, padding) if chosen.tiled else None
+        self.half_precision = chosen.half_precision
+        # Estimated next to measured peaks in the trace calibrate the estimator.
+        baseline = get_current_rss_mb()
+        self.trace.add(estimated_memory_mb=round(chosen.total_mb, 1),
+                       estimated_peak_mb=round(baseline + chosen.total_mb, 1) if baseline is not None else None,
+                       estimated_memory_parts_mb={name: round(num_bytes / MB, 1) for name, num_bytes in chosen.parts.items()})
+        return True
+
+    def _bake_tiles(self, context, output_file, tile_size, padding, mesh_arrays):
+        """ Bake the atlas one tile at a time, streaming each finished band of tiles into the output file.
+        Returns False when a tile failed, the partial file is removed. """
+        width = self.bake_width
+        height = self.bake_height
+        denoise = self._get_denoiser() == 'COMPOSITOR'
+        numpy_denoise = self._get_numpy_denoise()
+        dilation = self.lightmapper_props.dilation_pixels
+        post_process = numpy_denoise is not None or dilation > 0
+        if post_process:
+            # Tiles are post processed with their padding, which holds the texels of the neighbouring tiles.
+            uv_triangles, positions, normals = guide_triangles(mesh_arrays)
+            flat_uv = uv_triangles.reshape(-1, 2)
+
+        # Each tile is baked by remapping the Lightmap UVs so the tile fills the bake image.
+        uv_layer = self.bake_object.data.uv_layers["Lightmap"]
+        atlas_uv = np.empty(len(uv_layer.data) * 2, dtype=np.float32)
+        uv_layer.data.foreach_get("uv", atlas_uv)
+        atlas_uv = atlas_uv.reshape(-1, 2)
+        blank = np.zeros(len(self.bake_image.pixels), dtype=np.float32)
+
+        if denoise:
+            with self.trace.phase("denoise"):
+                self._setup_compositor_for_denoising()
+
+        if self.lightmapper_props.write_mips:
+            # The full atlas is never in memory during a tiled bake.
+            self.report({'WARNING'}, "Mips are not written for tiled bakes.")
+        writer = open_image_writer(output_file, width, height, self.lightmapper_props.output_format, self.lightmapper_props.encoding_range)
+        complete = False
+        try:
+            for y0, rows, tiles in iter_tile_bands(width, height, tile_size):
+                band = np.zeros((rows, width, 3), dtype=np.float32)
+                for x0, columns in tiles:
+                    with self.trace.phase("prepare_tile"):
+                        uv_layer.data.foreach_set("uv", tile_uv(atlas_uv, x0, y0, tile_size, padding, width, height).ravel())
+                        self.bake_object.data.update()
+                        # The tile image is reused, clear what the previous tile left behind.
+                        self.bake_image.pixels.foreach_set(blank)
+
+                    with self.trace.phase("cycles_bake"):
+                        # Tiles share the time budget by area.
+                        baked = yield from self._bake_samples(self.lightmapper_props.sample_time_budget * rows * columns / (width * height))
+                    if not baked:
+                        return False
+
+                    if denoise:
+                        with self.trace.phase("denoise"):
+                            denoised = self._render_denoised_image()
+                        if not denoised:
+                            return False
+                        yield 1
+
+                    pixels = self._read_output_pixels()
+                    if post_process:
+                        with self.trace.phase("post_process"):
+                            tile_triangles = tile_uv(flat_uv, x0, y0, tile_size, padding, width, height).reshape(-1, 3, 2)
+                            pixels = post_process_lightmap(pixels, tile_triangles, positions, normals, numpy_denoise, dilation)
+                    band[:, x0:x0 + columns] = pixels[padding:padding + rows, padding:padding + columns, :3]
+                    print(f"Baked tile ({x0}, {y0}) of {self.bake_name}")
+                with self.trace.phase("write_output"):
+                    writer.write_rows(band[::-1])
+            complete = True
+        finally:
+            writer.close()
+            if not complete and os.path.exists(output_file):
+                os.remove(output_file)
+            # The next pass of the group bakes against the atlas UVs again.
+            uv_layer.data.foreach_set("uv", atlas_uv.ravel())
+            self.bake_object.data.update()
+        return complete
+
+    def _get_numpy_denoise(self):
+        """ (iterations, strength) of the NumPy denoiser, or None when it's not used. """
+        if self._get_denoiser() != 'NUMPY':
+            return None
+        return self.lightmapper_props.denoise_iterations, self.lightmapper_props.denoise_strength
+
+    def _get_bake_settings(self):
+        """ Settings that change the baked result, stored with the lightmap fingerprint. """
+        return {
+            "width": self.bake_width,
+            "height": self.bake_height,
+            "num_samples": self.lightmapper_props.num_samples,
+            "denoiser": self.lightmapper_props.denoiser,
+            "denoise_iterations": self.lightmapper_props.denoise_iterations,
+            "denoise_strength": self.lightmapper_props.denoise_strength,
+            "output_format": self.lightmapper_props.output_format,
+            "encoding_range": self.lightmapper_props.encoding_range,
+            "write_mips": self.lightmapper_props.write_mips,
+            "dilation_pixels": self.lightmapper_props.dilation_pixels,
+            "bake_tiling": 'TILED' if self.tiled else 'NONE',
+            "half_precision": self.half_precision,
+            "sampling_mode": self.lightmapper_props.sampling_mode,
+            "pass_samples": self.lightmapper_props.pass_samples,
+            "noise_threshold": self.lightmapper_props.noise_threshold,
+            "sample_time_budget": self.lightmapper_props.sample_time_budget,
+        }
+
+    def _clean_up_group(self, context, mesh_objects):
+        """ Remove the bake object and image of a finished group, and make its objects renderable again for the next group. """
+        debug_mode = context.scene.lightmapper_properties.debug_mode
+        for obj in mesh_objects:
+            self.scene_state.revert(obj, "hide_render")
+
+        if self.bake_object is not None:
+            self.bake_object.select_set(False)
+            if debug_mode:
+                # Keep it for inspection, but don't let it cast light onto the next group.
+                self.bake_object.hide_render = True
+            elif self.bake_object.data is not None:
+                bpy.data.meshes.remove(self.bake_object.data, do_unlink=True)
+
+        if self.bake_image is not None and not debug_mode:
+            bpy.data.images.remove(self.bake_image, do_unlink=True)
+
+        self.bake_object = None
+        self.bake_image = None
 
     def modal(self, context, event):
         if event.type in {'RIGHTMOUSE', 'ESC'}:
@@ -494,8 +1086,8 @@ class LIGHTMAPPER_OT_bake_lightmap(bpy.types.Operator):
             return {'CANCELLED'}
         
         if event.type == 'TIMER':
-            result = next(self.bake_iterator)
-            if result == 1:
+            result = self.scheduler.step(self.bake_iterator)
+            if result in {1, 2}:
                 return {"RUNNING_MODAL"}
             if result == -1:
                 self.cancel(context)
@@ -508,27 +1100,133 @@ class LIGHTMAPPER_OT_bake_lightmap(bpy.types.Operator):
 
     def cancel(self, context):
         print("Modal cancelled")
-        if self._timer:
-            context.window_manager.event_timer_remove(self._timer)
+        self._finish_trace('CANCELLED')
+        if self.output_queue is not None:
+            # Let lightmaps that are already baked finish writing.
+            self._join_output_queue()
+        if self.scheduler:
+            self.scheduler.stop()
         self.restore_state(context)
     
     def finish(self, context):
         print("Modal Finished")
         if self.bake_iterator.gi_running:
             self.bake_iterator.close()
-        wm = context.window_manager
-        if self._timer:
-            wm.event_timer_remove(self._timer)
+        if self.scheduler:
+            self.scheduler.stop()
+            print(f"Bake scheduling: {self.scheduler.summary()}")
         self.restore_state(context)
 
+
+# Results of the last batch bake, as (collection name, status, seconds, output file).
+last_batch_results = []
+
+
+class LIGHTMAPPER_OT_bake_lightmap_batch(LIGHTMAPPER_OT_bake_lightmap):
+    bl_idname = "lightmapper.bake_lightmap_batch"
+    bl_label = "Batch Bake Lightmaps"
+    bl_description = "Bake one lightmap per collection for all collections tagged for batch baking"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    collection_names: StringProperty(
+        name="Collections",
+        description="Comma separated collection names to bake. Leave empty to bake every collection tagged for batch baking",
+        default=""
+    )  # type: ignore
+
+    def __init__(self):
+        super().__init__()
+        self.results = []
+        self.group_objects = []
+
+    def _get_bake_name(self, context):
+        # Each group is named after its collection.
+        return None
+
+    def _get_bake_collections(self):
+        if self.collection_names.strip():
+            names = [name.strip() for name in self.collection_names.split(",") if name.strip()]
+            return [bpy.data.collections[name] for name in names if name in bpy.data.collections]
+        return [col for col in bpy.data.collections if col.lightmapper_batch_bake]
+
+    def _get_group_objects(self, context, collection):
+        return [obj for obj in collection.all_objects if obj.type == 'MESH' and obj.name in context.view_layer.objects]
+
+    def bake(self, context):
+        yield 1
+
+        collections = self._get_bake_collections()
+        if not collections:
+            self.report({'ERROR'}, "No collections tagged for batch baking.")
+            yield -1
+
+        if not self._validate_export_path(context):
+            yield -1
+
+        for obj in context.selected_objects:
+            self.scene_state.select(obj, False)
+
+        # Scene wide settings are set once for the whole batch, and restored once at the end.
+        self._setup_bake_settings()
+
+        for collection in collections:
+            start_time = time.perf_counter()
+            mesh_objects = self._get_group_objects(context, collection)
+            self.group_objects = mesh_objects
+            self.bake_name = collection.name
+            print(f"Batch baking {collection.name} ({len(mesh_objects)} objects)")
+
+            self.trace = BakeTrace(self.bake_name)
+            with self.trace.phase("validate"):
+                valid = self._validate_mesh_objects(context, mesh_objects)
+            if not valid:
+                self._finish_trace('FAILED')
+                self.results.append((collection.name, 'FAILED', 0.0, None))
+                continue
+
+            status = yield from self.bake_group(context, mesh_objects)
+            self._clean_up_group(context, mesh_objects)
+            self.group_objects = []
+            self.results.append((collection.name, status, time.perf_counter() - start_time, self._get_output_file()))
+            yield 1
+
+        failures = yield from self._wait_for_outputs()
+        self.results = [(name, 'FAILED' if name in failures else status, seconds, output_file)
+                        for name, status, seconds, output_file in self.results]
+        self._report_results()
+        yield 0
+
+    def _report_results(self):
+        print("Batch bake summary:")
+        for name, status, seconds, output_file in self.results:
+            print(f"  {name:<40} {status:<8} {seconds:8.2f}s  {output_file or ''}")
+        baked = len([result for result in self.results if result[1] in {'BAKED', 'CACHED'}])
+        level = {'INFO'} if baked == len(self.results) else {'WARNING'}
+        self.report(level, f"Baked {baked} of {len(self.results)} lightmaps.")
+        # Kept for callers without access to the operator instance, like the command line baker.
+        global last_batch_results
+        last_batch_results = list(self.results)
+
+    def cancel(self, context):
+        # Clean up the group that was in flight when the batch was stopped.
+        self._clean_up_group(context, self.group_objects)
+        self._report_results()
+        super().cancel(context)
+
 def register():
     print("Registering lightmapper_operators")
     bpy.utils.register_class(LIGHTMAPPER_OT_create_lightmap_uv)
+    bpy.utils.register_class(LIGHTMAPPER_OT_analyze_texel_density)
+    bpy.utils.register_class(LIGHTMAPPER_OT_validate_lightmap_uv)
     bpy.utils.register_class(LIGHTMAPPER_OT_bake_lightmap)
+    bpy.utils.register_class(LIGHTMAPPER_OT_bake_lightmap_batch)
 
 def unregister():
     bpy.utils.unregister_class(LIGHTMAPPER_OT_create_lightmap_uv)
+    bpy.utils.unregister_class(LIGHTMAPPER_OT_analyze_texel_density)
+    bpy.utils.unregister_class(LIGHTMAPPER_OT_validate_lightmap_uv)
     bpy.utils.unregister_class(LIGHTMAPPER_OT_bake_lightmap)
+    bpy.utils.unregister_class(LIGHTMAPPER_OT_bake_lightmap_batch)
 
 if __name__ == "__main__":
     register()
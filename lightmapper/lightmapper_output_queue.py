@@ -0,0 +1,47 @@
+import concurrent.futures
+import time
+
+# Lightmaps waiting to be written hold a full float copy of their pixels, this caps how many can pile up.
+MAX_PENDING_OUTPUTS = 2
+MAX_OUTPUT_THREADS = 2
+
+
+class OutputQueue():
+    """ Encodes and writes lightmaps on background threads while the next group bakes.
+
+    Jobs only get pixel buffers already copied out of Blender and never touch bpy. Callers wait for is_full()
+    to clear before submitting more, so memory stays bounded, and join() once at the end to collect failures.
+    """
+    def __init__(self, max_pending=MAX_PENDING_OUTPUTS, max_threads=MAX_OUTPUT_THREADS):
+        self.max_pending = max_pending
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_threads, thread_name_prefix="lightmapper_output")
+        self.jobs = []
+
+    def _pending(self):
+        return len([future for _, future in self.jobs if not future.done()])
+
+    def is_full(self):
+        return self._pending() >= self.max_pending
+
+    def is_idle(self):
+        return self._pending() == 0
+
+    def submit(self, name, function):
+        def run():
+            start_time = time.perf_counter()
+            function()
+            return time.perf_counter() - start_time
+        self.jobs.append((name, self.executor.submit(run)))
+
+    def join(self):
+        """ Wait for every job and shut the threads down. Returns [(name, seconds)] of finished and [(name, exception)] of failed jobs. """
+        finished = []
+        failures = []
+        for name, future in self.jobs:
+            try:
+                finished.append((name, future.result()))
+            except Exception as e:
+                failures.append((name, e))
+        self.jobs = []
+        self.executor.shutdown(wait=True)
+        return finished, failures
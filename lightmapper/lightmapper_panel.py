@@ -2,6 +2,10 @@ import bpy
 
 import bpy.utils
 
+from . import lightmapper_texel_density
+from . import lightmapper_trace
+from . import lightmapper_uv_validation
+
 class LIGHTMAPPER_PT_main_panel(bpy.types.Panel):
         bl_idname = "OBJECT_PT_lightmapper_panel"
         bl_label = "Lightmapper Panel"
@@ -24,24 +28,74 @@ class LIGHTMAPPER_PT_main_panel(bpy.types.Panel):
             # Create UV Lightmap
             box = layout.box()
             box.label(text="Lightmap UV", icon='UV')
+            row = box.row(align=True)
+            row.prop(props, "uv_pack_mode", text="")
+            if props.uv_pack_mode == 'SHARED':
+                row.prop(props, "uv_margin", text="Margin")
             box.operator("lightmapper.create_lightmap_uv", icon='ADD')
+            row = box.row(align=True)
+            row.prop(props, "uv_validation", text="")
+            row.operator("lightmapper.validate_lightmap_uv", text="Validate", icon='CHECKMARK')
+            if lightmapper_uv_validation.last_report is not None:
+                col = box.column(align=True)
+                for line in lightmapper_uv_validation.last_report.lines():
+                    col.label(text=line)
 
             # Lightmap Resolution
             box = layout.box()
             box.label(text="Lightmap Settings", icon='TEXTURE')
             col = box.column(align=True)
             row = col.row(align=True)
+            row.enabled = not props.auto_resolution
             row.prop(props, "lightmap_width", text="Width")
             row.prop(props, "lightmap_height", text="Height")
+            row = col.row(align=True)
+            row.prop(props, "auto_resolution", text="Auto")
+            row.prop(props, "target_texels_per_meter", text="Texels/m")
             col.prop(props, "num_samples", text="Samples")
+            col.prop(props, "sampling_mode")
+            if props.sampling_mode == 'PROGRESSIVE':
+                col.prop(props, "pass_samples")
+                col.prop(props, "noise_threshold")
+                col.prop(props, "sample_time_budget")
+            row = col.row(align=True)
+            row.prop(props, "bake_passes")
+            col.prop(props, "bake_tiling")
+            row = col.row(align=True)
+            row.prop(props, "memory_budget_mb", text="Budget (MB)")
+            row.prop(props, "memory_policy", text="")
+
+            # Texel Density
+            row = box.row(align=True)
+            row.operator("lightmapper.analyze_texel_density", icon='VIEWZOOM')
+            row.operator("lightmapper.analyze_texel_density", text="", icon='CHECKMARK').apply_resolution = True
+            if lightmapper_texel_density.last_report is not None:
+                report, (width, height) = lightmapper_texel_density.last_report
+                col = box.column(align=True)
+                for line in report.lines():
+                    col.label(text=line)
+                col.label(text=f"Suggested resolution: {width}x{height}")
 
             # Export Settings
             box = layout.box()
             box.label(text="Export Settings", icon='EXPORT')
             box.prop(props, "export_path")
+            box.prop(props, "output_format")
+            if props.output_format in {'RGBM', 'RGBD'}:
+                box.prop(props, "encoding_range")
+            box.prop(props, "dilation_pixels")
+            row = box.row()
+            row.enabled = props.bake_tiling != 'TILED'
+            row.prop(props, "write_mips")
+            box.prop(props, "denoiser")
+            if props.denoiser == 'NUMPY':
+                row = box.row(align=True)
+                row.prop(props, "denoise_iterations")
+                row.prop(props, "denoise_strength")
             box.label(text="Bake Name", icon='TEXTURE')
             export_row = box.row(align=True)
             export_row.prop(props, "bake_name", expand=True)
+            box.prop(props, "use_bake_cache")
             
 
 
@@ -50,6 +104,22 @@ class LIGHTMAPPER_PT_main_panel(bpy.types.Panel):
             row = layout.row()
             row.scale_y = 2
             row.operator("lightmapper.bake_lightmap", text="Bake Lightmap", icon='RENDER_STILL')
+
+            # Last Bake
+            if lightmapper_trace.last_trace is not None:
+                box = layout.box()
+                box.label(text="Last Bake", icon='TIME')
+                col = box.column(align=True)
+                for line in lightmapper_trace.summary_lines(lightmapper_trace.last_trace):
+                    col.label(text=line)
+
+            # Batch Bake
+            box = layout.box()
+            box.label(text="Batch Bake", icon='OUTLINER_COLLECTION')
+            active_collection = context.view_layer.active_layer_collection.collection
+            box.prop(active_collection, "lightmapper_batch_bake", text=f"Include {active_collection.name}")
+            batch_count = len([col for col in bpy.data.collections if col.lightmapper_batch_bake])
+            box.operator("lightmapper.bake_lightmap_batch", text=f"Batch Bake ({batch_count})", icon='RENDER_STILL')
     
 def register():
         bpy.utils.register_class(LIGHTMAPPER_PT_main_panel)
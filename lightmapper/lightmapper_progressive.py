@@ -0,0 +1,56 @@
+import numpy as np
+
+LUMINANCE = np.array([0.2126, 0.7152, 0.0722], dtype=np.float32)
+# Noise is measured relative to the texel's brightness plus this share of the average brightness,
+# so near black texels don't need endless samples for noise nobody can see.
+BRIGHTNESS_FLOOR = 0.05
+# The error reported and compared against the threshold is this percentile of the per texel error.
+ERROR_PERCENTILE = 95.0
+
+
+class ProgressiveAccumulator():
+    """ Running mean of successive bake passes, and Welford's running variance of their luminance. """
+    def __init__(self):
+        self.count = 0
+        self.mean = None
+        self.luminance_mean = None
+        self.luminance_m2 = None
+        self.alpha = None
+
+    def add(self, pixels):
+        """ Add one pass, (height, width, 3+) float pixels. """
+        rgb = pixels[..., :3].astype(np.float32)
+        luminance = rgb @ LUMINANCE
+        self.count += 1
+        if pixels.shape[-1] > 3:
+            self.alpha = pixels[..., 3].astype(np.float32)
+        if self.mean is None:
+            self.mean = rgb.copy()
+            self.luminance_mean = luminance
+            self.luminance_m2 = np.zeros_like(luminance)
+            return
+        self.mean += (rgb - self.mean) / self.count
+        delta = luminance - self.luminance_mean
+        self.luminance_mean += delta / self.count
+        self.luminance_m2 += delta * (luminance - self.luminance_mean)
+
+    def error(self):
+        """ Relative standard error of the accumulated mean, at ERROR_PERCENTILE over the lit texels. None until there are two passes. """
+        if self.count < 2:
+            return None
+        lit = self.luminance_mean > 0.0
+        if not lit.any():
+            return 0.0
+        variance_of_mean = self.luminance_m2[lit] / (self.count * (self.count - 1))
+        brightness = self.luminance_mean[lit]
+        relative = np.sqrt(variance_of_mean) / (brightness + BRIGHTNESS_FLOOR * brightness.mean())
+        return float(np.percentile(relative, ERROR_PERCENTILE))
+
+    def pixels(self):
+        """ The accumulated mean as (height, width, 4) pixels, with the alpha of the last pass. """
+        height, width = self.mean.shape[:2]
+        pixels = np.ones((height, width, 4), dtype=np.float32)
+        pixels[..., :3] = self.mean
+        if self.alpha is not None:
+            pixels[..., 3] = self.alpha
+        return pixels
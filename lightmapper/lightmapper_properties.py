@@ -18,6 +18,49 @@ class LIGHTMAPPER_PT_properties(bpy.types.PropertyGroup):
         max=8192
     )  # type: ignore
 
+    target_texels_per_meter: bpy.props.FloatProperty(
+        name="Texels per Meter",
+        description="Texel density the lightmap resolution is chosen for when analyzing or auto sizing",
+        default=20.0,
+        min=0.1,
+        max=10000.0
+    )  # type: ignore
+
+    auto_resolution: BoolProperty(
+        name="Auto Resolution",
+        description="Size each bake to the smallest power of two resolution that reaches the target texels per meter, instead of using Width and Height",
+        default=False
+    )  # type: ignore
+
+    uv_pack_mode: EnumProperty(
+        name="UV Packing",
+        description="How Lightmap UVs are laid out",
+        items=[
+            ('SHARED', "Shared Atlas", "Pack the islands of all selected objects into one layout with a uniform texel density. New Lightmap UVs are unwrapped with Lightmap Pack first"),
+            ('PER_OBJECT', "Per Object", "Run Lightmap Pack on each object, every object fills its own 0-1 layout"),
+        ],
+        default='SHARED'
+    )  # type: ignore
+
+    uv_margin: bpy.props.IntProperty(
+        name="UV Margin",
+        description="Gap between packed islands in pixels, at the lightmap resolution",
+        default=4,
+        min=0,
+        max=64
+    )  # type: ignore
+
+    uv_validation: EnumProperty(
+        name="UV Validation",
+        description="Check the Lightmap UVs of each bake group before baking",
+        items=[
+            ('OFF', "Off", "Don't check the Lightmap UVs"),
+            ('WARN', "Warn", "Report Lightmap UV problems and bake anyway"),
+            ('ABORT', "Abort", "Don't bake groups with Lightmap UV problems"),
+        ],
+        default='WARN'
+    )  # type: ignore
+
     export_path: StringProperty(
         name="Export Path",
         description="Path to export the lightmap",
@@ -41,9 +84,160 @@ class LIGHTMAPPER_PT_properties(bpy.types.PropertyGroup):
             description="Number of samples for baking",
             default=64,
             min=8,
-            max=256
+            # Scripts can bake references with more samples than the slider offers.
+            soft_max=256,
+            max=16384
         )  # type: ignore
 
+    sampling_mode: EnumProperty(
+        name="Sampling",
+        description="How many samples the lightmap is baked with",
+        items=[
+            ('FIXED', "Fixed", "Bake with Number of Samples"),
+            ('PROGRESSIVE', "Progressive", "Bake passes of Pass Samples until the noise threshold or the time budget is reached, up to Number of Samples"),
+        ],
+        default='FIXED'
+    )  # type: ignore
+
+    pass_samples: bpy.props.IntProperty(
+        name="Pass Samples",
+        description="Samples per progressive pass",
+        default=16,
+        min=1,
+        max=256
+    )  # type: ignore
+
+    noise_threshold: bpy.props.FloatProperty(
+        name="Noise Threshold",
+        description="Stop progressive baking once 95% of the lit texels have less relative noise than this",
+        default=0.02,
+        min=0.001,
+        max=1.0,
+        subtype='FACTOR'
+    )  # type: ignore
+
+    sample_time_budget: bpy.props.FloatProperty(
+        name="Time Budget",
+        description="Stop progressive baking after this many seconds, whatever the noise",
+        default=300.0,
+        min=1.0,
+        subtype='TIME_ABSOLUTE',
+        unit='TIME_ABSOLUTE'
+    )  # type: ignore
+
+    bake_passes: EnumProperty(
+        name="Passes",
+        description="Passes baked for every group in one session, each written to its own file",
+        items=[
+            ('LIGHTMAP', "Lightmap", "Direct and indirect diffuse light, written as <name>"),
+            ('DIRECT', "Direct", "Direct diffuse light only, written as <name>_direct"),
+            ('INDIRECT', "Indirect", "Indirect diffuse light only, written as <name>_indirect"),
+            ('AO', "AO", "Ambient occlusion, written as <name>_ao"),
+            ('COLOR', "Color", "Diffuse albedo, written as <name>_color. Never denoised"),
+        ],
+        options={'ENUM_FLAG'},
+        default={'LIGHTMAP'}
+    )  # type: ignore
+
+    bake_tiling: EnumProperty(
+        name="Tiling",
+        description="Bake the lightmap in one go, or in tiles to bound memory use on large atlases",
+        items=[
+            ('NONE', "Single Image", "Bake the whole lightmap at once"),
+            ('TILED', "Tiled", "Bake the lightmap in tiles sized to fit the memory budget, streaming them into the output file"),
+        ],
+        default='NONE'
+    )  # type: ignore
+
+    memory_budget_mb: bpy.props.IntProperty(
+        name="Memory Budget (MB)",
+        description="Peak memory a bake may use for its images, buffers and geometry, on top of what Blender already uses",
+        default=4096,
+        min=256,
+        max=262144
+    )  # type: ignore
+
+    memory_policy: EnumProperty(
+        name="Over Budget",
+        description="What to do when the estimated peak memory of a group exceeds the budget",
+        items=[
+            ('ADAPT', "Adapt", "Keep lightmap copies in half floats, then bake in tiles, until the estimate fits"),
+            ('ABORT', "Abort", "Refuse to bake the group"),
+            ('WARN', "Warn", "Bake as configured and only warn"),
+        ],
+        default='ADAPT'
+    )  # type: ignore
+
+    output_format: EnumProperty(
+        name="Output Format",
+        description="File format the lightmap is written in",
+        items=[
+            ('HDR', "Radiance HDR", "32-bit run length encoded Radiance HDR"),
+            ('EXR', "OpenEXR Half", "16-bit half float OpenEXR with ZIP compression"),
+            ('RGBM', "RGBM PNG", "8-bit PNG, color = rgb * a * range"),
+            ('RGBD', "RGBD PNG", "8-bit PNG, color = rgb * range / (a * 255). More precision in dark areas than RGBM"),
+        ],
+        default='HDR'
+    )  # type: ignore
+
+    encoding_range: bpy.props.FloatProperty(
+        name="Encoding Range",
+        description="Brightest linear value RGBM and RGBD can store, brighter texels are clamped",
+        default=8.0,
+        min=1.0,
+        max=255.0
+    )  # type: ignore
+
+    dilation_pixels: bpy.props.IntProperty(
+        name="Dilation",
+        description="Push the baked texels this many pixels outwards into the empty space around the UV islands, "
+                    "so filtering and mips don't bleed the background into the lightmap. 0 keeps Blender's bake margin only",
+        default=0,
+        min=0,
+        max=64
+    )  # type: ignore
+
+    write_mips: BoolProperty(
+        name="Write Mips",
+        description="Also write box filtered mip levels down to 1x1, as <name>_mip<level> next to the lightmap",
+        default=False
+    )  # type: ignore
+
+    denoiser: EnumProperty(
+        name="Denoiser",
+        description="How the baked lightmap is denoised before export",
+        items=[
+            ('COMPOSITOR', "Compositor", "Denoise with the compositor Denoise node. Uses the scene compositor"),
+            ('NUMPY', "NumPy", "Edge avoiding à-trous filter guided by the baked positions and normals. "
+                               "Runs on background threads without touching the compositor"),
+            ('NONE', "None", "Write the baked lightmap as is"),
+        ],
+        default='COMPOSITOR'
+    )  # type: ignore
+
+    denoise_iterations: bpy.props.IntProperty(
+        name="Iterations",
+        description="Filter passes of the NumPy denoiser, each one reaches twice as far as the last",
+        default=5,
+        min=1,
+        max=8
+    )  # type: ignore
+
+    denoise_strength: bpy.props.FloatProperty(
+        name="Strength",
+        description="How different in brightness neighbouring texels may be and still be averaged. "
+                    "Higher removes more noise but softens shadow edges",
+        default=2.0,
+        min=0.1,
+        max=16.0
+    )  # type: ignore
+
+    use_bake_cache: BoolProperty(
+        name="Use Bake Cache",
+        description="Skip baking groups whose geometry, materials, lighting and settings are unchanged since the last export",
+        default=True
+    )  # type: ignore
+
     debug_mode: BoolProperty(
         name="Debug Mode",
         description="Will not remove temporary bake objects after baking.",
@@ -55,7 +249,13 @@ def register():
     print("Registering lightmapper_properties")
     bpy.utils.register_class(LIGHTMAPPER_PT_properties)
     bpy.types.Scene.lightmapper_properties = bpy.props.PointerProperty(type=LIGHTMAPPER_PT_properties)
+    bpy.types.Collection.lightmapper_batch_bake = BoolProperty(
+        name="Batch Bake",
+        description="Bake this collection to its own lightmap when running a batch bake",
+        default=False
+    )
 
 def unregister():
     del bpy.types.Scene.lightmapper_properties
+    del bpy.types.Collection.lightmapper_batch_bake
     bpy.utils.unregister_class(LIGHTMAPPER_PT_properties)
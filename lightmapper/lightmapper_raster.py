@@ -0,0 +1,85 @@
+import numpy as np
+
+# Upper bound on candidate pixels tested at once, keeps the rasterizer's temporary arrays small.
+CHUNK_PIXELS = 1 << 22
+
+
+def _edge(ax, ay, bx, by, px, py):
+    return (bx - ax) * (py - ay) - (by - ay) * (px - ax)
+
+
+def _owns_edge(ax, ay, bx, by):
+    """ Top left fill rule for counter clockwise triangles, so pixels on shared edges belong to exactly one triangle. """
+    return (by < ay) | ((by == ay) & (bx < ax))
+
+
+def rasterize_triangles(triangles, width, height):
+    """ Rasterize (n, 3, 2) triangles given in pixel units, sampling at pixel centres.
+
+    Yields (triangle_index, x, y, barycentric) arrays chunk by chunk, one entry per covered pixel.
+    Pixels outside the image are dropped.
+    """
+    triangles = np.asarray(triangles, dtype=np.float64)
+    if len(triangles) == 0:
+        return
+
+    # Make every triangle counter clockwise.
+    a, b, c = triangles[:, 0], triangles[:, 1], triangles[:, 2]
+    area = _edge(a[:, 0], a[:, 1], b[:, 0], b[:, 1], c[:, 0], c[:, 1])
+    flipped = area < 0
+    b, c = np.where(flipped[:, None], c, b), np.where(flipped[:, None], b, c)
+    area = np.abs(area)
+
+    # Pixels whose centres fall inside each triangle's bounding box.
+    x0 = np.clip(np.ceil(np.minimum(np.minimum(a[:, 0], b[:, 0]), c[:, 0]) - 0.5), 0, width - 1).astype(np.int64)
+    x1 = np.clip(np.floor(np.maximum(np.maximum(a[:, 0], b[:, 0]), c[:, 0]) - 0.5), -1, width - 1).astype(np.int64)
+    y0 = np.clip(np.ceil(np.minimum(np.minimum(a[:, 1], b[:, 1]), c[:, 1]) - 0.5), 0, height - 1).astype(np.int64)
+    y1 = np.clip(np.floor(np.maximum(np.maximum(a[:, 1], b[:, 1]), c[:, 1]) - 0.5), -1, height - 1).astype(np.int64)
+    box_w = np.maximum(x1 - x0 + 1, 0)
+    box_h = np.maximum(y1 - y0 + 1, 0)
+    box_pixels = np.where(area > 0, box_w * box_h, 0)
+
+    owns_ab = _owns_edge(a[:, 0], a[:, 1], b[:, 0], b[:, 1])
+    owns_bc = _owns_edge(b[:, 0], b[:, 1], c[:, 0], c[:, 1])
+    owns_ca = _owns_edge(c[:, 0], c[:, 1], a[:, 0], a[:, 1])
+
+    candidates = np.flatnonzero(box_pixels)
+    cumulative = np.cumsum(box_pixels[candidates])
+    start = 0
+    while start < len(candidates):
+        # Take as many triangles as fit in one chunk, but at least one.
+        base = cumulative[start - 1] if start else 0
+        end = max(np.searchsorted(cumulative, base + CHUNK_PIXELS, side='right'), start + 1)
+        tris = candidates[start:end]
+        start = end
+
+        counts = box_pixels[tris]
+        tri = np.repeat(tris, counts)
+        index_in_box = np.arange(len(tri)) - np.repeat(np.cumsum(counts) - counts, counts)
+        px = x0[tri] + index_in_box % box_w[tri]
+        py = y0[tri] + index_in_box // box_w[tri]
+        cx, cy = px + 0.5, py + 0.5
+
+        w_a = _edge(b[tri, 0], b[tri, 1], c[tri, 0], c[tri, 1], cx, cy)
+        w_b = _edge(c[tri, 0], c[tri, 1], a[tri, 0], a[tri, 1], cx, cy)
+        w_c = _edge(a[tri, 0], a[tri, 1], b[tri, 0], b[tri, 1], cx, cy)
+        inside = ((w_a > 0) | ((w_a == 0) & owns_bc[tri])) & \
+                 ((w_b > 0) | ((w_b == 0) & owns_ca[tri])) & \
+                 ((w_c > 0) | ((w_c == 0) & owns_ab[tri]))
+        if not inside.any():
+            continue
+
+        tri, px, py = tri[inside], px[inside], py[inside]
+        barycentric = np.stack([w_a[inside], w_b[inside], w_c[inside]], axis=1) / area[tri, None]
+        # Undo the winding flip so barycentrics match the caller's vertex order.
+        swap = flipped[tri]
+        barycentric[swap] = barycentric[swap][:, [0, 2, 1]]
+        yield tri, px, py, barycentric
+
+
+def coverage_counts(triangles, width, height):
+    """ Number of triangles covering each pixel, as a (height, width) array. """
+    counts = np.zeros(width * height, dtype=np.int32)
+    for tri, px, py, _ in rasterize_triangles(triangles, width, height):
+        counts += np.bincount(py * width + px, minlength=width * height).astype(np.int32)
+    return counts.reshape(height, width)
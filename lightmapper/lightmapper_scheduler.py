@@ -0,0 +1,72 @@
+import time
+
+
+class StepScheduler():
+    """ Drives a bake generator from a modal operator's timer events.
+
+    The generator yields:
+     1 after a cheap step, the next one runs straight away until the frame budget is used up.
+     2 while it waits on Cycles, polled on a slow timer so the UI stays responsive.
+     0 when it's finished, and -1 when it failed.
+    """
+    def __init__(self, window_manager, window, frame_budget=0.02, fast_interval=0.001, poll_interval=0.25):
+        self.window_manager = window_manager
+        self.window = window
+        self.frame_budget = frame_budget
+        self.fast_interval = fast_interval
+        self.poll_interval = poll_interval
+
+        self._timer = None
+        self._interval = None
+
+        self.start_time = None
+        self.busy_time = 0.0
+        self.scheduling_time = 0.0
+        self.steps = 0
+        self.polls = 0
+        self._ready_since = None
+
+    def start(self):
+        self.start_time = time.perf_counter()
+        self._set_interval(self.fast_interval)
+
+    def stop(self):
+        if self._timer is not None:
+            self.window_manager.event_timer_remove(self._timer)
+            self._timer = None
+
+    def _set_interval(self, interval):
+        if interval == self._interval:
+            return
+        self.stop()
+        self._timer = self.window_manager.event_timer_add(interval, window=self.window)
+        self._interval = interval
+
+    def step(self, iterator):
+        """ Advance the iterator for one timer tick, returns the last value it yielded. """
+        tick_start = time.perf_counter()
+        if self._ready_since is not None:
+            # The generator had more work ready, this is time spent waiting for the event loop.
+            self.scheduling_time += tick_start - self._ready_since
+            self._ready_since = None
+
+        while True:
+            result = next(iterator)
+            self.steps += 1
+            if result != 1 or time.perf_counter() - tick_start > self.frame_budget:
+                break
+
+        now = time.perf_counter()
+        self.busy_time += now - tick_start
+        if result == 1:
+            self._ready_since = now
+            self._set_interval(self.fast_interval)
+        elif result == 2:
+            self.polls += 1
+            self._set_interval(self.poll_interval)
+        return result
+
+    def summary(self):
+        total = time.perf_counter() - self.start_time if self.start_time is not None else 0.0
+        return (f"{total:.2f}s total, {self.busy_time:.2f}s in steps, {self.scheduling_time:.3f}s lost to scheduling, "
+                f"{self.steps} steps, {self.polls} polls")
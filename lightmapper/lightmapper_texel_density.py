@@ -0,0 +1,111 @@
+import numpy as np
+
+from .lightmapper_raster import coverage_counts
+from .lightmapper_uv_pack import fan_triangles, polygon_areas
+
+# Coverage is measured on a downscaled atlas, that's plenty to estimate overlap and wasted space.
+MAX_ANALYSIS_SIZE = 1024
+MIN_RESOLUTION = 4
+MAX_RESOLUTION = 8192
+# Resolutions are chosen so this share of the surface meets the target, stray slivers shouldn't force huge lightmaps.
+TARGET_PERCENTILE = 5.0
+
+# Report of the last analysis, shown in the panel.
+last_report = None
+
+
+class TexelDensityReport():
+    """ Texel density statistics of one bake group at a given lightmap resolution. Densities are in texels per meter. """
+    def __init__(self, name, width, height, min_density, low_density, median_density, max_density,
+                 coverage, overlap, degenerate_faces, face_count):
+        self.name = name
+        self.width = width
+        self.height = height
+        self.min_density = min_density
+        self.low_density = low_density
+        self.median_density = median_density
+        self.max_density = max_density
+        self.coverage = coverage
+        self.overlap = overlap
+        self.degenerate_faces = degenerate_faces
+        self.face_count = face_count
+
+    @property
+    def wasted(self):
+        return 1.0 - self.coverage
+
+    def lines(self):
+        return [
+            f"{self.name}: {self.width}x{self.height}, {self.face_count} faces",
+            f"Texels/m min {self.min_density:.1f}, median {self.median_density:.1f}, max {self.max_density:.1f}",
+            f"Atlas used {self.coverage:.1%}, wasted {self.wasted:.1%}, overlapping {self.overlap:.1%}",
+        ] + ([f"{self.degenerate_faces} faces with no UV or world area"] if self.degenerate_faces else [])
+
+
+def _weighted_percentiles(values, weights, percentiles):
+    """ Percentiles of values where each value counts with its weight. """
+    order = np.argsort(values)
+    values, weights = values[order], weights[order]
+    cumulative = np.cumsum(weights)
+    positions = np.asarray(percentiles, dtype=np.float64) / 100.0 * cumulative[-1]
+    return values[np.minimum(np.searchsorted(cumulative, positions), len(values) - 1)]
+
+
+def _stack_parts(parts):
+    """ Concatenate the loop_start, loop_total, vertex_index, co and Lightmap UV arrays of all parts. """
+    vertex_offsets = np.cumsum([0] + [len(part.co) for part in parts])
+    loop_offsets = np.cumsum([0] + [len(part.vertex_index) for part in parts])
+    loop_start = np.concatenate([part.loop_start + loop_offsets[i] for i, part in enumerate(parts)]).astype(np.int64)
+    loop_total = np.concatenate([part.loop_total for part in parts]).astype(np.int64)
+    vertex_index = np.concatenate([part.vertex_index + vertex_offsets[i] for i, part in enumerate(parts)]).astype(np.int64)
+    co = np.concatenate([part.co for part in parts]).astype(np.float64)
+    uv = np.concatenate([part.lightmap_uv for part in parts]).astype(np.float64)
+    return loop_start, loop_total, vertex_index, co, uv
+
+
+def analyze_texel_density(name, mesh_arrays, width, height, scale_length=1.0):
+    """ Measure the texel density of the world space meshes in mesh_arrays, as read by read_mesh_arrays,
+    when their Lightmap UVs are baked at width x height. scale_length converts scene units to meters. """
+    parts, _ = mesh_arrays
+    loop_start, loop_total, vertex_index, co, uv = _stack_parts(parts)
+    world_area, uv_area = polygon_areas(loop_start, loop_total, vertex_index, co * scale_length, uv)
+
+    valid = (world_area > 1e-12) & (uv_area > 0.0)
+    if not valid.any():
+        raise ValueError(f"{name} has no faces with both a world and a Lightmap UV area.")
+    density = np.sqrt(uv_area[valid] * width * height / world_area[valid])
+    low, median = _weighted_percentiles(density, world_area[valid], [TARGET_PERCENTILE, 50.0])
+
+    # Rasterize the UV layout to find how much of the atlas is used, and how much of it more than once.
+    scale = min(1.0, MAX_ANALYSIS_SIZE / max(width, height))
+    analysis_width = max(1, int(round(width * scale)))
+    analysis_height = max(1, int(round(height * scale)))
+    _, a, b, c = fan_triangles(loop_start, loop_total)
+    triangles = np.stack([uv[a], uv[b], uv[c]], axis=1) * np.array([analysis_width, analysis_height], dtype=np.float64)
+    counts = coverage_counts(triangles, analysis_width, analysis_height)
+    pixel_count = analysis_width * analysis_height
+
+    return TexelDensityReport(
+        name, width, height,
+        min_density=float(density.min()),
+        low_density=float(low),
+        median_density=float(median),
+        max_density=float(density.max()),
+        coverage=np.count_nonzero(counts) / pixel_count,
+        overlap=np.count_nonzero(counts > 1) / pixel_count,
+        degenerate_faces=int(np.count_nonzero(~valid)),
+        face_count=len(loop_start),
+    )
+
+
+def _next_power_of_two(value):
+    return 1 << max(0, int(np.ceil(np.log2(max(value, 1.0)))))
+
+
+def suggest_resolution(report, target_density):
+    """ Smallest power of two resolution at which the low percentile of the report reaches target_density texels per meter.
+    Density grows linearly with resolution, so both axes are scaled by the same factor. """
+    factor = target_density / max(report.low_density, 1e-12)
+    width = _next_power_of_two(report.width * factor)
+    height = _next_power_of_two(report.height * factor)
+    return (int(np.clip(width, MIN_RESOLUTION, MAX_RESOLUTION)), int(np.clip(height, MIN_RESOLUTION, MAX_RESOLUTION)))
@@ -0,0 +1,31 @@
+import numpy as np
+
+# Bytes per pixel of the full width band that collects finished tiles before they're written.
+BYTES_PER_BAND_PIXEL = 12
+MIN_TILE_SIZE = 64
+
+
+def choose_tile_size(width, height, fits):
+    """ Largest power of two tile size for which fits(tile_size) is true, but at least MIN_TILE_SIZE. """
+    tile_size = MIN_TILE_SIZE
+    while tile_size < max(width, height):
+        if not fits(tile_size * 2):
+            break
+        tile_size *= 2
+    return tile_size
+
+
+def iter_tile_bands(width, height, tile_size):
+    """ Yield (y0, rows, [(x0, columns), ...]) bands of tiles, starting with the top of the image. """
+    for band_top in range(height, 0, -tile_size):
+        y0 = max(0, band_top - tile_size)
+        yield y0, band_top - y0, [(x0, min(tile_size, width - x0)) for x0 in range(0, width, tile_size)]
+
+
+def tile_uv(uv, x0, y0, tile_size, padding, width, height):
+    """ Map full atlas UVs so the padded tile at pixel (x0, y0) covers the 0-1 range. """
+    padded = tile_size + 2 * padding
+    tiled = np.empty_like(uv)
+    tiled[:, 0] = (uv[:, 0] * width - (x0 - padding)) / padded
+    tiled[:, 1] = (uv[:, 1] * height - (y0 - padding)) / padded
+    return tiled
@@ -0,0 +1,200 @@
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+
+# Trace of the last bake, shown in the panel.
+last_trace = None
+# Output threads append to the same trace files as the bake.
+_write_lock = threading.Lock()
+
+
+def get_trace_path(export_path, bake_name):
+    return os.path.join(export_path, f"{bake_name}.trace.jsonl")
+
+
+def _read_status_kb(field):
+    """ A memory field of /proc/self/status in kB, or None where there's no procfs. """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _windows_memory_counters():
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [
+            ("cb", wintypes.DWORD),
+            ("PageFaultCount", wintypes.DWORD),
+            ("PeakWorkingSetSize", ctypes.c_size_t),
+            ("WorkingSetSize", ctypes.c_size_t),
+            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+            ("PagefileUsage", ctypes.c_size_t),
+            ("PeakPagefileUsage", ctypes.c_size_t),
+        ]
+
+    counters = PROCESS_MEMORY_COUNTERS()
+    counters.cb = ctypes.sizeof(PROCESS_MEMORY_COUNTERS)
+    ctypes.windll.psapi.GetProcessMemoryInfo(ctypes.windll.kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb)
+    return counters
+
+
+def get_peak_rss_mb():
+    """ Peak resident memory of this process in MB, since start or since the last reset_peak_rss. """
+    if sys.platform == "win32":
+        return _windows_memory_counters().PeakWorkingSetSize / (1024 * 1024)
+    peak = _read_status_kb("VmHWM")
+    if peak is not None:
+        return peak / 1024
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, other systems kB.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def get_current_rss_mb():
+    """ Resident memory of this process in MB right now, or None where it can't be read. """
+    if sys.platform == "win32":
+        return _windows_memory_counters().WorkingSetSize / (1024 * 1024)
+    current = _read_status_kb("VmRSS")
+    return current / 1024 if current is not None else None
+
+
+def reset_peak_rss():
+    """ Restart peak memory tracking so it covers a single phase. Returns False where the OS can't do that. """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+class BakeTrace():
+    """ Wall time and peak memory of each phase of one bake, plus details of what was baked. """
+    def __init__(self, bake_name):
+        self.bake_name = bake_name
+        self.start_time = time.perf_counter()
+        self.phases = {}
+        self.info = {}
+        # Without a reset the peak of a phase includes everything that ran before it.
+        self.per_phase_peak = True
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """ Time a phase. Phases that run more than once, like tiles, add up. """
+        self.per_phase_peak = reset_peak_rss() and self.per_phase_peak
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            peak = get_peak_rss_mb()
+            phase = self.phases.setdefault(name, {"seconds": 0.0, "peak_rss_mb": 0.0, "count": 0})
+            phase["seconds"] += seconds
+            phase["peak_rss_mb"] = max(phase["peak_rss_mb"], peak)
+            phase["count"] += 1
+
+    def add(self, **info):
+        self.info.update(info)
+
+    @property
+    def peak_rss_mb(self):
+        """ Highest peak of any phase, the measured peak of the whole bake. """
+        return max((phase["peak_rss_mb"] for phase in self.phases.values()), default=0.0)
+
+    @property
+    def total_seconds(self):
+        return time.perf_counter() - self.start_time
+
+    def to_dict(self, status):
+        return {
+            "bake_name": self.bake_name,
+            "status": status,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "total_seconds": round(self.total_seconds, 4),
+            "per_phase_peak": self.per_phase_peak,
+            "peak_rss_mb": round(self.peak_rss_mb, 1),
+            "phases": {name: {"seconds": round(phase["seconds"], 4), "peak_rss_mb": round(phase["peak_rss_mb"], 1), "count": phase["count"]}
+                       for name, phase in self.phases.items()},
+            **self.info,
+        }
+
+    def write(self, export_path, status):
+        """ Append this bake as one JSON line to <bake_name>.trace.jsonl, so runs can be compared over time. """
+        global last_trace
+        record = self.to_dict(status)
+        with _write_lock:
+            last_trace = record
+            with open(get_trace_path(export_path, self.bake_name), "a") as f:
+                f.write(json.dumps(record) + "\n")
+        return record
+
+
+class OutputTrace():
+    """ Wall time of post processing and writing one lightmap on an output thread. The bake's record is written
+    before the output is, so this is appended to the trace as a separate write_output event.
+
+    The peak is the process peak while writing. Resetting it here would cut short the peaks of the phases
+    the main thread is timing meanwhile. """
+    def __init__(self, bake_name, output_file):
+        self.bake_name = bake_name
+        self.output_file = output_file
+        self.start_time = time.perf_counter()
+        self.phases = {}
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = {"seconds": round(time.perf_counter() - start, 4), "peak_rss_mb": round(get_peak_rss_mb(), 1), "count": 1}
+
+    def write(self, export_path, status):
+        record = {
+            "bake_name": self.bake_name,
+            "event": "write_output",
+            "output_file": self.output_file,
+            "status": status,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "total_seconds": round(time.perf_counter() - self.start_time, 4),
+            "peak_rss_mb": max((phase["peak_rss_mb"] for phase in self.phases.values()), default=0.0),
+            "phases": self.phases,
+        }
+        with _write_lock:
+            # Show the write in the panel with the bake it belongs to.
+            if last_trace is not None and last_trace["bake_name"] == self.bake_name:
+                for name, phase in self.phases.items():
+                    merged = last_trace["phases"].setdefault(name, {"seconds": 0.0, "peak_rss_mb": 0.0, "count": 0})
+                    merged["seconds"] = round(merged["seconds"] + phase["seconds"], 4)
+                    merged["peak_rss_mb"] = max(merged["peak_rss_mb"], phase["peak_rss_mb"])
+                    merged["count"] += 1
+                last_trace["peak_rss_mb"] = max(last_trace["peak_rss_mb"], record["peak_rss_mb"])
+            if os.path.isdir(export_path):
+                with open(get_trace_path(export_path, self.bake_name), "a") as f:
+                    f.write(json.dumps(record) + "\n")
+        return record
+
+
+def summary_lines(record, max_phases=6):
+    """ Short description of a trace record, slowest phases first. """
+    lines = [f"{record['bake_name']}: {record['status']} in {record['total_seconds']:.2f}s"]
+    if record.get("estimated_peak_mb") is not None:
+        lines.append(f"memory: {record['estimated_peak_mb']:.0f} MB estimated, {record['peak_rss_mb']:.0f} MB measured")
+    phases = sorted(record["phases"].items(), key=lambda item: item[1]["seconds"], reverse=True)
+    for name, phase in phases[:max_phases]:
+        lines.append(f"{name}: {phase['seconds']:.2f}s, {phase['peak_rss_mb']:.0f} MB peak")
+    return lines
@@ -0,0 +1,224 @@
+import numpy as np
+
+LIGHTMAP_UV_NAME = "Lightmap"
+# Islands with less than this fraction of the total UV area are degenerate, collapsed to a line or a point.
+DEGENERATE_UV_FRACTION = 1e-9
+
+
+class _PackSource():
+    """ Bulk copy of a mesh's topology, world space positions and Lightmap UVs. """
+    def __init__(self, obj):
+        mesh = obj.data
+        if LIGHTMAP_UV_NAME not in mesh.uv_layers:
+            raise ValueError(f"Object {obj.name} does not have a Lightmap channel.")
+        self.mesh = mesh
+        num_verts = len(mesh.vertices)
+        num_loops = len(mesh.loops)
+        num_polys = len(mesh.polygons)
+
+        co = np.empty(num_verts * 3, dtype=np.float32)
+        mesh.vertices.foreach_get("co", co)
+        matrix = np.array(obj.matrix_world, dtype=np.float64)
+        self.co = co.reshape(-1, 3) @ matrix[:3, :3].T + matrix[:3, 3]
+
+        self.vertex_index = np.empty(num_loops, dtype=np.int64)
+        mesh.loops.foreach_get("vertex_index", self.vertex_index)
+        self.loop_start = np.empty(num_polys, dtype=np.int64)
+        mesh.polygons.foreach_get("loop_start", self.loop_start)
+        self.loop_total = np.empty(num_polys, dtype=np.int64)
+        mesh.polygons.foreach_get("loop_total", self.loop_total)
+
+        uv = np.empty(num_loops * 2, dtype=np.float32)
+        mesh.uv_layers[LIGHTMAP_UV_NAME].data.foreach_get("uv", uv)
+        self.uv = uv.reshape(-1, 2).astype(np.float64)
+
+    def write_uv(self, uv):
+        self.mesh.uv_layers[LIGHTMAP_UV_NAME].data.foreach_set("uv", uv.astype(np.float32).ravel())
+        self.mesh.update()
+
+
+def fan_triangles(loop_start, loop_total):
+    """ Loop indices (a, b, c) of a triangle fan over every polygon. """
+    tris_per_poly = np.maximum(loop_total - 2, 0)
+    poly = np.repeat(np.arange(len(loop_start)), tris_per_poly)
+    index_in_poly = np.arange(len(poly)) - np.repeat(np.cumsum(tris_per_poly) - tris_per_poly, tris_per_poly)
+    a = loop_start[poly]
+    b = a + index_in_poly + 1
+    return poly, a, b, b + 1
+
+
+def polygon_areas(loop_start, loop_total, vertex_index, co, uv):
+    """ World space and UV space area of every polygon. """
+    poly, a, b, c = fan_triangles(loop_start, loop_total)
+    p0, p1, p2 = co[vertex_index[a]], co[vertex_index[b]], co[vertex_index[c]]
+    world = 0.5 * np.linalg.norm(np.cross(p1 - p0, p2 - p0), axis=1)
+    e1, e2 = uv[b] - uv[a], uv[c] - uv[a]
+    uv_area = 0.5 * np.abs(e1[:, 0] * e2[:, 1] - e1[:, 1] * e2[:, 0])
+    num_polys = len(loop_start)
+    return np.bincount(poly, weights=world, minlength=num_polys), np.bincount(poly, weights=uv_area, minlength=num_polys)
+
+
+def connected_components(num_nodes, a, b):
+    """ Component label of every node of the graph with edges (a, b), using vectorized union find. """
+    parent = np.arange(num_nodes)
+    while True:
+        root_a, root_b = parent[a], parent[b]
+        low, high = np.minimum(root_a, root_b), np.maximum(root_a, root_b)
+        differ = low != high
+        if not differ.any():
+            break
+        np.minimum.at(parent, high[differ], low[differ])
+        # Pointer jumping until every node points at its root.
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
+    return np.unique(parent, return_inverse=True)[1]
+
+
+def find_uv_islands(loop_start, loop_total, vertex_index, uv):
+    """ Island index of every polygon. Polygons are connected when they share a vertex with the same UV. """
+    num_polys = len(loop_start)
+    poly_of_loop = np.repeat(np.arange(num_polys), loop_total)
+    quantized = np.round(uv * 1e5).astype(np.int64)
+    keys = np.stack([vertex_index, quantized[:, 0], quantized[:, 1]], axis=1)
+    uv_vertex = np.unique(keys, axis=0, return_inverse=True)[1].ravel()
+    labels = connected_components(num_polys + uv_vertex.max() + 1, poly_of_loop, num_polys + uv_vertex)
+    return np.unique(labels[:num_polys], return_inverse=True)[1]
+
+
+def island_scales(island_world, island_uv):
+    """ Scale of every island that makes its UV area match its world area, which gives a uniform texel density.
+
+    Islands with (almost) no UV area would get a huge scale and shrink every other island when the layout is
+    normalised, so they get the median scale of the others instead. """
+    degenerate = island_uv <= DEGENERATE_UV_FRACTION * island_uv.sum()
+    scales = np.ones(len(island_uv))
+    valid = ~degenerate
+    scales[valid] = np.sqrt(np.maximum(island_world[valid], 1e-12) / island_uv[valid])
+    scales[degenerate] = np.median(scales[valid]) if valid.any() else 1.0
+    return scales
+
+
+def skyline_pack(sizes, width, height):
+    """ Bottom left skyline packing of integer (w, h) rectangles. Returns their positions, or None when they don't fit. """
+    order = np.lexsort((-sizes[:, 0], -sizes[:, 1]))
+    positions = np.zeros_like(sizes)
+    # Skyline segments as [x, y, width], left to right.
+    skyline = [[0, 0, width]]
+    for index in order:
+        w, h = int(sizes[index, 0]), int(sizes[index, 1])
+        best = None
+        for i in range(len(skyline)):
+            x = skyline[i][0]
+            if x + w > width:
+                break
+            # The rectangle rests on the highest segment it spans.
+            y = 0
+            remaining = w
+            j = i
+            while remaining > 0:
+                y = max(y, skyline[j][1])
+                remaining -= skyline[j][2]
+                j += 1
+            if y + h <= height and (best is None or (y + h, x) < (best[1] + h, best[0])):
+                best = (x, y, i)
+        if best is None:
+            return None
+        x, y, i = best
+        positions[index] = (x, y)
+
+        # Replace the covered part of the skyline with the top of the new rectangle.
+        new_segment = [x, y + h, w]
+        end = x + w
+        j = i
+        while j < len(skyline) and skyline[j][0] < end:
+            segment_end = skyline[j][0] + skyline[j][2]
+            if segment_end > end:
+                skyline[j] = [end, skyline[j][1], segment_end - end]
+                break
+            del skyline[j]
+        skyline.insert(i, new_segment)
+
+        # Merge neighbours at the same height.
+        merged = [skyline[0]]
+        for segment in skyline[1:]:
+            if segment[1] == merged[-1][1]:
+                merged[-1][2] += segment[2]
+            else:
+                merged.append(segment)
+        skyline = merged
+    return positions
+
+
+def pack_lightmap_uvs(mesh_objects, width, height, margin):
+    """ Pack the Lightmap UV islands of all mesh_objects into one shared layout at a uniform texel density.
+    margin is the gap between islands in pixels at width x height. Returns the number of islands packed. """
+    # Objects sharing mesh data share their UVs, only pack each mesh once.
+    sources = []
+    seen = set()
+    for obj in mesh_objects:
+        if obj.data.name not in seen:
+            seen.add(obj.data.name)
+            sources.append(_PackSource(obj))
+
+    # Stack every mesh so islands are found and packed in one go.
+    loop_offsets = np.cumsum([0] + [len(source.uv) for source in sources])
+    vertex_offsets = np.cumsum([0] + [len(source.co) for source in sources])
+    loop_start = np.concatenate([source.loop_start + loop_offsets[i] for i, source in enumerate(sources)])
+    loop_total = np.concatenate([source.loop_total for source in sources])
+    vertex_index = np.concatenate([source.vertex_index + vertex_offsets[i] for i, source in enumerate(sources)])
+    co = np.concatenate([source.co for source in sources])
+    uv = np.concatenate([source.uv for source in sources])
+
+    island_of_poly = find_uv_islands(loop_start, loop_total, vertex_index, uv)
+    island_of_loop = np.repeat(island_of_poly, loop_total)
+    num_islands = island_of_poly.max() + 1
+
+    # Scale every island so its UV area matches its world area, that gives a uniform texel density.
+    world_area, uv_area = polygon_areas(loop_start, loop_total, vertex_index, co, uv)
+    island_world = np.bincount(island_of_poly, weights=world_area, minlength=num_islands)
+    island_uv = np.bincount(island_of_poly, weights=uv_area, minlength=num_islands)
+    uv = uv * island_scales(island_world, island_uv)[island_of_loop, None]
+
+    island_min = np.full((num_islands, 2), np.inf)
+    island_max = np.full((num_islands, 2), -np.inf)
+    np.minimum.at(island_min, island_of_loop, uv)
+    np.maximum.at(island_max, island_of_loop, uv)
+    uv -= island_min[island_of_loop]
+    extent = island_max - island_min
+
+    # Lay tall islands on their side, skyline packing works best with wide rectangles.
+    rotate = extent[:, 1] > extent[:, 0]
+    rotated_loops = rotate[island_of_loop]
+    uv[rotated_loops] = np.stack([uv[rotated_loops, 1], extent[island_of_loop[rotated_loops], 0] - uv[rotated_loops, 0]], axis=1)
+    extent[rotate] = extent[rotate][:, ::-1]
+
+    # Search for the largest texel density whose islands still fit in the atlas.
+    usable = max(width * height - margin * margin * num_islands, 1)
+    low = 0.0
+    high = np.sqrt(usable / max(np.sum(extent[:, 0] * extent[:, 1]), 1e-12))
+    density = high
+    best = None
+    for _ in range(20):
+        sizes = np.ceil(extent * density).astype(np.int64) + margin
+        positions = skyline_pack(sizes, width, height)
+        if positions is None:
+            high = density
+        else:
+            low = density
+            best = (density, positions)
+            if high - low < high * 0.005:
+                break
+        density = (low + high) / 2
+    if best is None:
+        raise ValueError(f"Could not fit {num_islands} islands into {width}x{height} with a {margin}px margin.")
+
+    density, positions = best
+    offset = positions[island_of_loop] + margin / 2.0
+    packed = (uv * density + offset) / np.array([width, height], dtype=np.float64)
+
+    for i, source in enumerate(sources):
+        source.write_uv(packed[loop_offsets[i]:loop_offsets[i + 1]])
+    return num_islands
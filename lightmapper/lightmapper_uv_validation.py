@@ -0,0 +1,171 @@
+import numpy as np
+
+from .lightmapper_raster import rasterize_triangles
+from .lightmapper_uv_pack import fan_triangles, find_uv_islands, polygon_areas
+
+# UV faces smaller than this many texels can't receive any light.
+DEGENERATE_TEXEL_AREA = 1e-6
+# Slack for UVs that sit exactly on the border of the 0-1 range.
+BOUNDS_EPSILON = 1e-5
+
+# Report of the last validation, shown in the panel.
+last_report = None
+
+
+class ObjectUVReport():
+    def __init__(self, name, faces, islands):
+        self.name = name
+        self.faces = faces
+        self.islands = islands
+        self.degenerate_faces = 0
+        self.out_of_bounds_islands = 0
+        self.overlapping_texels = 0
+        self.close_islands = 0
+
+    @property
+    def is_valid(self):
+        return not (self.degenerate_faces or self.out_of_bounds_islands or self.overlapping_texels or self.close_islands)
+
+    def describe(self):
+        problems = []
+        if self.overlapping_texels:
+            problems.append(f"{self.overlapping_texels} overlapping texels")
+        if self.out_of_bounds_islands:
+            problems.append(f"{self.out_of_bounds_islands} islands outside 0-1")
+        if self.close_islands:
+            problems.append(f"{self.close_islands} islands closer than the margin")
+        if self.degenerate_faces:
+            problems.append(f"{self.degenerate_faces} degenerate faces")
+        return f"{self.name}: " + (", ".join(problems) if problems else "ok")
+
+
+class UVValidationReport():
+    """ Lightmap UV problems of one bake group at its bake resolution, per object. """
+    def __init__(self, name, width, height, margin, objects):
+        self.name = name
+        self.width = width
+        self.height = height
+        self.margin = margin
+        self.objects = objects
+
+    @property
+    def is_valid(self):
+        return all(obj.is_valid for obj in self.objects)
+
+    def summary(self):
+        invalid = [obj for obj in self.objects if not obj.is_valid]
+        if not invalid:
+            return f"Lightmap UVs of {self.name} are valid at {self.width}x{self.height}."
+        overlapping = sum(obj.overlapping_texels for obj in self.objects)
+        return f"Lightmap UVs of {self.name}: {len(invalid)} of {len(self.objects)} objects have problems, {overlapping} overlapping texels."
+
+    def lines(self):
+        return [self.summary()] + [obj.describe() for obj in self.objects if not obj.is_valid]
+
+
+def _neighbour_views(array):
+    """ (a, b) views of array where b is the right, lower, lower right and lower left neighbour of a. """
+    return ((array[:, :-1], array[:, 1:]), (array[:-1], array[1:]), (array[:-1, :-1], array[1:, 1:]), (array[:-1, 1:], array[1:, :-1]))
+
+
+def _touching_labels(labels):
+    """ (a, b) label pairs of different, non empty, neighbouring pixels, diagonals included. """
+    pairs = []
+    for first, second in _neighbour_views(labels):
+        touching = (first > 0) & (second > 0) & (first != second)
+        pairs.append(np.stack([first[touching], second[touching]], axis=1))
+    return np.concatenate(pairs)
+
+
+def _contested_labels(labels):
+    """ (a, b) label pairs of different labels next to the same empty pixel, diagonals included. """
+    highest = np.zeros_like(labels)
+    lowest = np.full_like(labels, np.iinfo(labels.dtype).max)
+    for (high_a, high_b), (low_a, low_b), (a, b) in zip(_neighbour_views(highest), _neighbour_views(lowest), _neighbour_views(labels)):
+        np.maximum(high_a, b, out=high_a)
+        np.maximum(high_b, a, out=high_b)
+        np.minimum(low_a, np.where(b > 0, b, low_a), out=low_a)
+        np.minimum(low_b, np.where(a > 0, a, low_b), out=low_b)
+    contested = (labels == 0) & (highest > 0) & (lowest != highest)
+    return np.stack([highest[contested], lowest[contested]], axis=1)
+
+
+def _grow_labels(labels):
+    """ Fill every empty pixel next to a label with that label, diagonals included. """
+    grown = labels.copy()
+    neighbours = np.zeros_like(labels)
+    for (neighbours_a, neighbours_b), (a, b) in zip(_neighbour_views(neighbours), _neighbour_views(labels)):
+        np.maximum(neighbours_a, b, out=neighbours_a)
+        np.maximum(neighbours_b, a, out=neighbours_b)
+    empty = labels == 0
+    grown[empty] = neighbours[empty]
+    return grown
+
+
+def find_close_islands(labels, margin):
+    """ Labels of islands with less than margin empty pixels between them and another island, diagonals
+    included. Islands grow one pixel per step from both sides, so after (margin - 1) // 2 steps the touching
+    ones had at most 2 * steps pixels between them. An odd margin - 1 adds the islands one empty pixel apart
+    after those steps. """
+    steps = max(0, margin - 1) // 2
+    for _ in range(steps):
+        labels = _grow_labels(labels)
+    pairs = [_touching_labels(labels)]
+    if max(0, margin - 1) % 2:
+        pairs.append(_contested_labels(labels))
+    return np.unique(np.concatenate(pairs))
+
+
+def validate_lightmap_uvs(name, mesh_arrays, width, height, margin):
+    """ Rasterize the Lightmap UVs of mesh_arrays, as read by read_mesh_arrays, at width x height and look for
+    overlapping texels, islands outside the 0-1 range, islands closer than margin pixels and degenerate faces. """
+    parts, _ = mesh_arrays
+    counts = np.zeros(width * height, dtype=np.int32)
+    labels = np.zeros(width * height, dtype=np.int32)
+    size = np.array([width, height], dtype=np.float64)
+
+    reports = []
+    object_pixels = []
+    island_objects = []
+    for part in parts:
+        loop_start = part.loop_start.astype(np.int64)
+        loop_total = part.loop_total.astype(np.int64)
+        vertex_index = part.vertex_index.astype(np.int64)
+        uv = part.lightmap_uv.astype(np.float64)
+
+        island_of_poly = find_uv_islands(loop_start, loop_total, vertex_index, uv) if len(loop_start) else np.zeros(0, dtype=np.int64)
+        num_islands = int(island_of_poly.max()) + 1 if len(island_of_poly) else 0
+        report = ObjectUVReport(part.name, len(loop_start), num_islands)
+
+        _, uv_area = polygon_areas(loop_start, loop_total, vertex_index, part.co.astype(np.float64), uv)
+        report.degenerate_faces = int(np.count_nonzero(uv_area * width * height < DEGENERATE_TEXEL_AREA))
+
+        island_of_loop = np.repeat(island_of_poly, loop_total)
+        outside = np.any((uv < -BOUNDS_EPSILON) | (uv > 1.0 + BOUNDS_EPSILON), axis=1)
+        report.out_of_bounds_islands = len(np.unique(island_of_loop[outside]))
+
+        # Islands are labelled across the whole group, 0 is empty.
+        label_offset = len(island_objects) + 1
+        island_objects.extend([len(reports)] * num_islands)
+        poly, a, b, c = fan_triangles(loop_start, loop_total)
+        triangles = np.stack([uv[a], uv[b], uv[c]], axis=1) * size
+        pixels = [np.zeros(0, dtype=np.int64)]
+        for tri, px, py, _ in rasterize_triangles(triangles, width, height):
+            index = py * width + px
+            labels[index] = island_of_poly[poly[tri]] + label_offset
+            pixels.append(index)
+        # Objects are usually small next to the atlas, count their texels sparsely.
+        covered, texel_counts = np.unique(np.concatenate(pixels), return_counts=True)
+        counts[covered] += texel_counts.astype(np.int32)
+        object_pixels.append(covered)
+        reports.append(report)
+
+    for report, pixels in zip(reports, object_pixels):
+        report.overlapping_texels = int(np.count_nonzero(counts[pixels] > 1))
+
+    island_objects = np.array(island_objects, dtype=np.int64)
+    close = find_close_islands(labels.reshape(height, width), margin)
+    for object_index in island_objects[close - 1]:
+        reports[object_index].close_islands += 1
+
+    return UVValidationReport(name, width, height, margin, reports)
@@ -0,0 +1,174 @@
+""" Batch importer for folders of ripped .zip files.
+
+Every archive is imported by its own background Blender process, several at once, into <name>/<name>.blend
+next to the zip, exactly like the Import button does:
+
+    blender -b --python ripper/batch_import.py -- D:/Ripped/Sketchfab [--report report.json] [--workers N]
+    python ripper/batch_import.py D:/Ripped/Sketchfab --blender /path/to/blender
+
+A JSON report of the successes, failures and per archive timings is written next to the archives.
+Archives found in the import cache (see import_cache.py) are skipped without starting Blender.
+"""
+import argparse
+import concurrent.futures
+import json
+import os
+import subprocess
+import sys
+import time
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+if __package__:
+    from .import_cache import GB, ImportCache
+else:
+    # Run as a script, by Blender or plain Python.
+    sys.path.insert(0, script_dir)
+    from import_cache import GB, ImportCache  # noqa: E402
+
+
+def find_archives(zip_dir):
+    """ .zip files directly inside zip_dir, largest first so the slowest imports don't start last. """
+    archives = [os.path.join(zip_dir, name) for name in os.listdir(zip_dir) if name.lower().endswith(".zip")]
+    return sorted(archives, key=os.path.getsize, reverse=True)
+
+
+def run_archive(blender, zip_path, threads, log_dir, cache=None, reset_method='BATCH_REMOVE', obj_importer='BLENDER'):
+    """ Import one archive in a background Blender process, returns its report entry. """
+    name = os.path.splitext(os.path.basename(zip_path))[0]
+    start_time = time.perf_counter()
+    blend = cache.lookup(zip_path) if cache is not None else None
+    if blend:
+        entry = {"zip": zip_path, "exit_code": 0, "seconds": time.perf_counter() - start_time, "log": None, "blend": blend,
+                 "error": None, "status": 'CACHED'}
+        print(f"{name:<48} {entry['status']:<9} {entry['seconds']:8.2f}s")
+        return entry
+
+    log_path = os.path.join(log_dir, name + ".log")
+    result_path = os.path.join(log_dir, name + ".json")
+    if os.path.exists(result_path):
+        os.remove(result_path)
+
+    command = [
+        blender, "-b", "--factory-startup",
+        "-t", str(threads),
+        "--python-exit-code", "2",
+        "--python", os.path.abspath(__file__),
+        "--", "--worker", zip_path, "--result", result_path, "--reset", reset_method,
+        "--obj-importer", obj_importer,
+        # The workers are the parallel part, a worker only parses OBJ files with its share of the cores.
+        "--parse-workers", str(threads),
+    ]
+    with open(log_path, "w") as log:
+        exit_code = subprocess.call(command, stdout=log, stderr=subprocess.STDOUT)
+    seconds = time.perf_counter() - start_time
+
+    entry = {"zip": zip_path, "exit_code": exit_code, "seconds": seconds, "log": log_path, "blend": None, "error": None}
+    if os.path.exists(result_path):
+        with open(result_path) as f:
+            entry.update(json.load(f))
+    elif exit_code != 0:
+        entry["error"] = f"Blender exited with code {exit_code}"
+    members = entry.pop("members", [])
+    entry["status"] = 'IMPORTED' if exit_code == 0 and entry["blend"] else 'FAILED'
+    if cache is not None and entry["status"] == 'IMPORTED':
+        entry["evicted"] = cache.store(zip_path, entry["blend"], members)
+    print(f"{name:<48} {entry['status']:<9} {seconds:8.2f}s {entry['error'] or ''}")
+    return entry
+
+
+def run_batch(zip_dir, report_path, blender, workers=None, cache=None, reset_method='BATCH_REMOVE', obj_importer='BLENDER'):
+    """ Import every archive of zip_dir with a pool of Blender processes and write the JSON report. Returns the exit code. """
+    archives = find_archives(zip_dir)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(archives) or 1))
+    # Importers are mostly single threaded, split the cores so the workers don't fight over them.
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    log_dir = os.path.splitext(report_path)[0] + "_logs"
+    os.makedirs(log_dir, exist_ok=True)
+    print(f"Importing {len(archives)} archives with {workers} workers")
+
+    start_time = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        entries = list(pool.map(lambda zip_path: run_archive(blender, zip_path, threads, log_dir, cache, reset_method, obj_importer), archives))
+
+    failed = [entry for entry in entries if entry["status"] == 'FAILED']
+    report = {
+        "directory": os.path.abspath(zip_dir),
+        "workers": workers,
+        "reset_method": reset_method,
+        "obj_importer": obj_importer,
+        "seconds": time.perf_counter() - start_time,
+        "imported": len(entries) - len(failed),
+        "cached": sum(1 for entry in entries if entry["status"] == 'CACHED'),
+        "failed": len(failed),
+        "archives": entries,
+    }
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"{report['imported']} of {len(entries)} archives imported in {report['seconds']:.2f}s, report: {report_path}")
+    return 1 if failed else 0
+
+
+def run_worker(zip_path, result_path, reset_method, obj_importer, parse_workers):
+    """ Runs inside a background Blender, imports a single archive. """
+    import importlib
+    # Import the addon from wherever this file lives, as an installed extension or from a checkout.
+    sys.path.insert(0, os.path.dirname(script_dir))
+    import_panel = importlib.import_module(os.path.basename(script_dir) + ".import_panel")
+
+    start_time = time.perf_counter()
+    result = {"blend": None, "error": None}
+    try:
+        # The driver looks the archive up in the cache and records it, workers always import.
+        result["blend"], _ = import_panel.import_zip(zip_path, reset_method=reset_method, obj_importer=obj_importer,
+                                                     parse_workers=parse_workers)
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["timings"] = dict(import_panel.last_import_timings)
+    result["members"] = import_panel.last_extraction.members if import_panel.last_extraction else []
+    result["import_seconds"] = time.perf_counter() - start_time
+    with open(result_path, "w") as f:
+        json.dump(result, f, indent=2)
+    if result["error"]:
+        sys.exit(1)
+
+
+def main():
+    # Blender passes the script's own arguments after "--".
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else sys.argv[1:]
+    parser = argparse.ArgumentParser(description="Import a folder of ripped .zip files to .blend files with background Blender processes.")
+    parser.add_argument("directory", nargs="?", help="Folder of .zip files")
+    parser.add_argument("--report", help="Where to write the JSON report, defaults to batch_import_report.json in the folder")
+    parser.add_argument("--workers", type=int, help="Number of Blender processes, defaults to the number of cores")
+    parser.add_argument("--blender", help="Blender executable, defaults to the running Blender")
+    parser.add_argument("--reset", choices=["BATCH_REMOVE", "EMPTY_FILE"], default="BATCH_REMOVE",
+                        help="How each worker empties its scene before importing")
+    parser.add_argument("--obj-importer", choices=["BLENDER", "NUMPY"], default="BLENDER",
+                        help="How archives without an FBX file import their OBJ files")
+    parser.add_argument("--no-cache", action="store_true", help="Import every archive, even those imported before")
+    parser.add_argument("--cache-limit-gb", type=float, default=0.0,
+                        help="Delete files extracted by older imports beyond this size, 0 keeps everything. The .blend files stay")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    parser.add_argument("--parse-workers", type=int, default=1, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        run_worker(args.worker, args.result, args.reset, args.obj_importer, args.parse_workers)
+        return
+
+    if not args.directory:
+        parser.error("a folder of .zip files is required")
+    blender = args.blender
+    if blender is None:
+        try:
+            import bpy
+            blender = bpy.app.binary_path
+        except ImportError:
+            parser.error("--blender is required when not running inside Blender")
+    report_path = args.report or os.path.join(args.directory, "batch_import_report.json")
+    cache = None if args.no_cache else ImportCache(max_bytes=int(args.cache_limit_gb * GB), variant=args.obj_importer)
+    sys.exit(run_batch(args.directory, report_path, blender, args.workers, cache, args.reset, args.obj_importer))
+
+
+if __name__ == "__main__":
+    main()
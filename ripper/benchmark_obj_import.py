@@ -0,0 +1,122 @@
+""" Compare the NumPy OBJ importer with Blender's on extracted models.
+
+Every folder holding .obj files, for example the ones left next to imported archives, is imported twice in
+a background Blender: with bpy.ops.wm.obj_import one file after the other, and with import_obj_files. The
+parse alone is also timed in one process and in the pool. Timings and counts end up in a JSON report.
+
+    blender -b --factory-startup --python ripper/benchmark_obj_import.py -- D:/Ripped/Sketchfab [--report report.json]
+    python ripper/benchmark_obj_import.py D:/Ripped/Sketchfab --blender /path/to/blender
+"""
+import argparse
+import importlib
+import json
+import os
+import subprocess
+import sys
+import time
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+def find_model_folders(directory, min_files):
+    """ Folders under directory with at least min_files .obj files, and those files. """
+    folders = []
+    for root, _, files in os.walk(directory):
+        obj_files = sorted(os.path.join(root, name) for name in files if name.lower().endswith(".obj"))
+        if len(obj_files) >= max(1, min_files):
+            folders.append((root, obj_files))
+    return folders
+
+
+def scene_counts():
+    import bpy
+    meshes = [obj.data for obj in bpy.context.scene.objects if obj.type == 'MESH']
+    return {"objects": len(meshes), "vertices": sum(len(mesh.vertices) for mesh in meshes),
+            "faces": sum(len(mesh.polygons) for mesh in meshes)}
+
+
+def benchmark_folder(obj_files, import_panel, obj_import, obj_reader, workers):
+    import bpy
+
+    import_panel.reset_scene()
+    start_time = time.perf_counter()
+    for obj_file in obj_files:
+        bpy.ops.wm.obj_import(filepath=obj_file)
+    blender = {"seconds": time.perf_counter() - start_time, **scene_counts()}
+
+    import_panel.reset_scene()
+    start_time = time.perf_counter()
+    obj_import.import_obj_files(obj_files, max_workers=workers)
+    numpy = {"seconds": time.perf_counter() - start_time, **scene_counts()}
+
+    start_time = time.perf_counter()
+    obj_reader.parse_obj_files(obj_files, 1)
+    numpy["parse_serial_seconds"] = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    # Always through the pool, import_obj_files skips it for small models.
+    obj_reader.parse_obj_files(obj_files, workers, min_pool_bytes=0)
+    numpy["parse_pool_seconds"] = time.perf_counter() - start_time
+    import_panel.reset_scene()
+    return blender, numpy
+
+
+def run_benchmark(directory, report_path, min_files, workers):
+    """ Runs inside Blender. Returns the exit code. """
+    # Import the addon from wherever this file lives, as an installed extension or from a checkout.
+    sys.path.insert(0, os.path.dirname(script_dir))
+    package = os.path.basename(script_dir)
+    import_panel = importlib.import_module(package + ".import_panel")
+    obj_import = importlib.import_module(package + ".obj_import")
+    obj_reader = importlib.import_module(package + ".obj_reader")
+    workers = workers or obj_reader.MAX_PARSE_PROCESSES
+
+    results = []
+    for folder, obj_files in find_model_folders(directory, min_files):
+        blender, numpy = benchmark_folder(obj_files, import_panel, obj_import, obj_reader, workers)
+        result = {
+            "folder": folder,
+            "files": len(obj_files),
+            "megabytes": sum(os.path.getsize(path) for path in obj_files) / (1024 * 1024),
+            "blender": blender,
+            "numpy": numpy,
+            "speedup": blender["seconds"] / max(numpy["seconds"], 1e-6),
+        }
+        results.append(result)
+        print(f"{os.path.basename(folder):<40} {len(obj_files):4d} files {result['megabytes']:8.1f} MB | "
+              f"blender {blender['seconds']:7.2f}s | numpy {numpy['seconds']:7.2f}s "
+              f"(parse {numpy['parse_serial_seconds']:.2f}s serial, {numpy['parse_pool_seconds']:.2f}s pool) | "
+              f"{result['speedup']:5.2f}x")
+
+    with open(report_path, "w") as f:
+        json.dump({"directory": os.path.abspath(directory), "workers": workers, "results": results}, f, indent=2)
+    print(f"{len(results)} folders benchmarked, report: {report_path}")
+    return 0 if results else 1
+
+
+def main():
+    # Blender passes the script's own arguments after "--".
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else sys.argv[1:]
+    parser = argparse.ArgumentParser(description="Compare the speed of the NumPy OBJ importer with Blender's.")
+    parser.add_argument("directory", help="Folder searched for folders of .obj files")
+    parser.add_argument("--report", help="Where to write the JSON report, defaults to obj_import_benchmark.json in the folder")
+    parser.add_argument("--min-files", type=int, default=1, help="Skip folders with fewer .obj files")
+    parser.add_argument("--workers", type=int, help="Parse processes, defaults to up to 8")
+    parser.add_argument("--blender", help="Blender executable, when not running inside Blender")
+    args = parser.parse_args(argv)
+    report_path = args.report or os.path.join(args.directory, "obj_import_benchmark.json")
+
+    try:
+        import bpy  # noqa: F401
+    except ImportError:
+        if not args.blender:
+            parser.error("--blender is required when not running inside Blender")
+        command = [args.blender, "-b", "--factory-startup", "--python-exit-code", "2", "--python", os.path.abspath(__file__),
+                   "--", args.directory, "--report", report_path, "--min-files", str(args.min_files)]
+        if args.workers:
+            command += ["--workers", str(args.workers)]
+        sys.exit(subprocess.call(command))
+    sys.exit(run_benchmark(args.directory, report_path, args.min_files, args.workers))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import zipfile
+
+# Bump when import_zip changes what ends up in the .blend, so archives imported before are imported again.
+IMPORTER_VERSION = 1
+INDEX_VERSION = 2
+HASH_CHUNK_SIZE = 1024 * 1024
+GB = 1024 * 1024 * 1024
+# Deleting extracted files is opt-in, by default the cache keeps everything.
+DEFAULT_MAX_BYTES = 0
+# The index lock is only held to read and write the index, an older lock file was left by a process that died.
+LOCK_STALE_SECONDS = 30.0
+LOCK_POLL_SECONDS = 0.05
+
+
+def default_index_path():
+    cache_dir = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_dir, "ripper", "import_cache.json")
+
+
+def archive_sha256(path):
+    """ SHA-256 of a file, read in chunks so large archives aren't loaded at once. """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        while True:
+            chunk = file.read(HASH_CHUNK_SIZE)
+            if not chunk:
+                return digest.hexdigest()
+            digest.update(chunk)
+
+
+def members_size(members):
+    total = 0
+    for _, path in members:
+        try:
+            total += os.path.getsize(path)
+        except OSError:
+            pass
+    return total
+
+
+def remove_members(members, folder):
+    """ Delete extracted member files, and the folders they leave empty up to folder. """
+    for _, path in members:
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        directory = os.path.dirname(path)
+        while os.path.abspath(directory) != os.path.abspath(folder) and directory.startswith(folder):
+            try:
+                os.rmdir(directory)
+            except OSError:
+                break
+            directory = os.path.dirname(directory)
+
+
+def restore_members(zip_path, members):
+    """ Extract again the member files eviction deleted. """
+    missing = [(name, path) for name, path in members if not os.path.isfile(path)]
+    if not missing:
+        return
+    with zipfile.ZipFile(zip_path, "r") as archive:
+        for name, path in missing:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            partial = path + ".partial"
+            with archive.open(name) as source, open(partial, "wb") as destination:
+                shutil.copyfileobj(source, destination, HASH_CHUNK_SIZE)
+            os.replace(partial, path)
+
+
+class ImportCache():
+    """ Index of the archives imported before, keyed by the SHA-256 of the archive and the importer version.
+
+    A hit returns the .blend of the earlier import, wherever the archive was when it was imported. With a
+    max_bytes above 0, the archive members extracted by the least recently used imports beyond that size are
+    deleted, starting with those of older importer versions. The .blend files are never deleted, and a later
+    hit extracts the deleted members again before returning the .blend.
+
+    The index is a JSON file shared by every Blender instance and batch worker. It's read, changed and
+    replaced as a temporary file under a lock file, so concurrent imports don't lose each other's entries.
+    Imports with different importer settings are told apart by variant.
+    """
+    def __init__(self, index_path=None, max_bytes=DEFAULT_MAX_BYTES, variant=""):
+        self.index_path = index_path or default_index_path()
+        self.max_bytes = max_bytes
+        self.variant = variant
+        self.lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def _locked(self):
+        """ Hold the index against other threads, and other processes through a lock file created exclusively. """
+        lock_path = self.index_path + ".lock"
+        with self.lock:
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+            while True:
+                try:
+                    os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                    break
+                except FileExistsError:
+                    pass
+                try:
+                    if time.time() - os.path.getmtime(lock_path) > LOCK_STALE_SECONDS:
+                        os.remove(lock_path)
+                        continue
+                except OSError:
+                    continue
+                time.sleep(LOCK_POLL_SECONDS)
+            try:
+                yield
+            finally:
+                os.remove(lock_path)
+
+    def _load(self):
+        try:
+            with open(self.index_path, "r") as f:
+                data = json.load(f)
+            if data.get("version") == INDEX_VERSION:
+                return data
+        except (OSError, ValueError):
+            pass
+        return {"version": INDEX_VERSION, "archives": {}, "entries": {}}
+
+    def _save(self, data):
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        partial = f"{self.index_path}.{os.getpid()}.{threading.get_ident()}.partial"
+        with open(partial, "w") as f:
+            json.dump(data, f, indent=1)
+        os.replace(partial, self.index_path)
+
+    def _archive(self, zip_path):
+        """ Hash record of an archive. The hash is remembered with the archive's size and modification time, so
+        unchanged archives aren't read again. Hashing happens outside the lock, lookups of other archives don't wait. """
+        stat = os.stat(zip_path)
+        with self._locked():
+            archive = self._load()["archives"].get(zip_path)
+        if archive is None or archive["size"] != stat.st_size or archive["mtime_ns"] != stat.st_mtime_ns:
+            archive = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": archive_sha256(zip_path)}
+        return archive
+
+    def _key(self, archive):
+        key = f"{archive['sha256']}-v{IMPORTER_VERSION}"
+        return f"{key}-{self.variant}" if self.variant else key
+
+    def lookup(self, zip_path):
+        """ The .blend of an earlier import of this archive, or None. """
+        zip_path = os.path.abspath(zip_path)
+        archive = self._archive(zip_path)
+        key = self._key(archive)
+        with self._locked():
+            data = self._load()
+            data["archives"][zip_path] = archive
+            entry = data["entries"].get(key)
+            if entry is not None and not os.path.isfile(entry["blend"]):
+                del data["entries"][key]
+                entry = None
+            if entry is not None:
+                entry["last_used"] = time.time()
+            self._save(data)
+        if entry is None:
+            return None
+
+        if entry["evicted"]:
+            restore_members(zip_path, entry["members"])
+            with self._locked():
+                data = self._load()
+                if key in data["entries"]:
+                    data["entries"][key]["evicted"] = False
+                    data["entries"][key]["bytes"] = members_size(entry["members"])
+                    self._save(data)
+        return entry["blend"]
+
+    def store(self, zip_path, blend_path, members):
+        """ Record a finished import and the (member name, path) of the archive members it extracted, then evict
+        members of other imports beyond max_bytes. Returns the folders whose members were deleted. """
+        zip_path = os.path.abspath(zip_path)
+        archive = self._archive(zip_path)
+        key = self._key(archive)
+        folder = os.path.dirname(os.path.abspath(blend_path))
+        members = [(name, os.path.abspath(path)) for name, path in members]
+        with self._locked():
+            data = self._load()
+            data["archives"][zip_path] = archive
+            # Earlier imports into the same folder were just overwritten.
+            for old_key in [k for k, entry in data["entries"].items() if entry["folder"] == folder]:
+                del data["entries"][old_key]
+            data["entries"][key] = {
+                "zip": zip_path,
+                "blend": os.path.abspath(blend_path),
+                "folder": folder,
+                "members": members,
+                "bytes": members_size(members),
+                "evicted": False,
+                "last_used": time.time(),
+                "importer_version": IMPORTER_VERSION,
+            }
+            evicted = self._evict(data, key)
+            self._save(data)
+            return evicted
+
+    def _evict(self, data, keep_key):
+        entries = data["entries"]
+        for key in [key for key, entry in entries.items() if not os.path.isfile(entry["blend"])]:
+            del entries[key]
+        if self.max_bytes <= 0:
+            return []
+
+        total = sum(entry["bytes"] for entry in entries.values())
+        stale_first = sorted(entries, key=lambda key: (entries[key]["importer_version"] == IMPORTER_VERSION, entries[key]["last_used"]))
+        evicted = []
+        for key in stale_first:
+            if total <= self.max_bytes:
+                break
+            entry = entries[key]
+            if key == keep_key or entry["evicted"]:
+                continue
+            # Only the files extracted from the archive, the .blend and anything saved next to it stay.
+            remove_members(entry["members"], entry["folder"])
+            total -= entry["bytes"]
+            entry["bytes"] = 0
+            entry["evicted"] = True
+            evicted.append(entry["folder"])
+        return evicted
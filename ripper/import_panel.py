@@ -1,6 +1,13 @@
 import bpy
 import os
-import zipfile
+import threading
+import time
+
+from . import batch_import
+from .import_cache import GB, ImportCache
+from .obj_import import import_obj_files
+from .obj_reader import MAX_PARSE_PROCESSES
+from .zip_extract import extract_model
 
 # Define the global property
 bpy.types.Scene.zip_file_path = bpy.props.StringProperty(
@@ -10,6 +17,53 @@ bpy.types.Scene.zip_file_path = bpy.props.StringProperty(
     subtype='FILE_PATH'
 )
 
+bpy.types.Scene.zip_directory_path = bpy.props.StringProperty(
+    name="Folder",
+    description="Folder of .zip files to batch import",
+    default=r"D:\Ripped\Sketchfab",
+    subtype='DIR_PATH'
+)
+
+bpy.types.Scene.use_import_cache = bpy.props.BoolProperty(
+    name="Use Import Cache",
+    description="Open the .blend of an earlier import of the same archive instead of importing it again",
+    default=True
+)
+
+bpy.types.Scene.import_cache_limit_gb = bpy.props.FloatProperty(
+    name="Cache Limit (GB)",
+    description="Delete the files extracted by the least recently used imports beyond this size, 0 keeps everything. "
+                "The .blend files stay, deleted files are extracted again when the archive is imported again",
+    default=0.0,
+    min=0.0
+)
+
+bpy.types.Scene.import_reset_method = bpy.props.EnumProperty(
+    name="Scene Reset",
+    description="How the batch import processes empty their scene before importing. Import always uses Batch Remove",
+    items=[
+        ('BATCH_REMOVE', "Batch Remove", "Remove the objects and their data in a single batch_remove call"),
+        ('EMPTY_FILE', "Empty File", "Start from an empty file, without the startup file's scene settings. Background processes only"),
+    ],
+    default='BATCH_REMOVE'
+)
+
+bpy.types.Scene.obj_importer = bpy.props.EnumProperty(
+    name="OBJ Importer",
+    description="How archives without an FBX file import their OBJ files",
+    items=[
+        ('BLENDER', "Blender", "Blender's OBJ importer, one file after the other"),
+        ('NUMPY', "NumPy", "Parse the OBJ files in parallel processes and build the meshes in bulk, faster for many parts"),
+    ],
+    default='BLENDER'
+)
+
+def get_import_cache(scene):
+    if not scene.use_import_cache:
+        return None
+    # Keep the imports of both OBJ importers apart.
+    return ImportCache(max_bytes=int(scene.import_cache_limit_gb * GB), variant=scene.obj_importer)
+
 class ImportPanel(bpy.types.Panel):
     bl_idname = "OBJECT_PT_ripper_import_panel"
     bl_label = "Import"
@@ -27,10 +81,130 @@ class ImportPanel(bpy.types.Panel):
         layout = self.layout
         layout.label(text="Import Panel")
         layout.prop(context.scene, "zip_file_path", text="Select .zip File")
+        layout.prop(context.scene, "use_import_cache")
+        if context.scene.use_import_cache:
+            layout.prop(context.scene, "import_cache_limit_gb")
+        layout.prop(context.scene, "obj_importer")
         
         # Add a button to trigger the import operator
         layout.operator("ripper.import_zip", text="Import")
 
+        layout.separator()
+        layout.prop(context.scene, "zip_directory_path", text="Select Folder")
+        layout.prop(context.scene, "import_reset_method")
+        layout.operator("ripper.batch_import_zips", text="Batch Import")
+
+class ZipImportError(Exception):
+    pass
+
+
+# Data removed by a scene reset, everything objects bring along. Collections, worlds and scenes stay.
+RESET_DATA = ("objects", "meshes", "materials", "images", "textures", "curves", "armatures", "actions", "shape_keys",
+              "cameras", "lights", "lightprobes", "lattices", "metaballs", "grease_pencils", "particles", "volumes",
+              "pointclouds", "hair_curves", "speakers")
+
+# Seconds spent in each stage of the last import_zip call.
+last_import_timings = {}
+# ExtractionResult of the last import_zip call.
+last_extraction = None
+
+
+def collect_reset_ids():
+    """ Every ID a scene reset removes, gathered in one pass. """
+    ids = set()
+    for name in RESET_DATA:
+        # Some collections only exist in some Blender versions.
+        ids.update(getattr(bpy.data, name, ()))
+    # Node groups are shared with what stays, drop only those used by removed data or other dropped groups.
+    user_map = bpy.data.user_map(subset=bpy.data.node_groups)
+    changed = True
+    while changed:
+        changed = False
+        for group, users in user_map.items():
+            if group not in ids and users <= ids:
+                ids.add(group)
+                changed = True
+    return ids
+
+
+def reset_scene(method='BATCH_REMOVE'):
+    """ Empty the scene so the archive is imported into an empty file. Returns the seconds it took.
+
+    BATCH_REMOVE removes every ID of collect_reset_ids with a single batch_remove, which relinks the
+    remaining data once instead of once per removed ID. EMPTY_FILE loads an empty file instead. That frees
+    every ID and the context with them, so the operator running it would be left with dangling references.
+    It only runs in background processes like the batch import workers, and everything after it re-fetches
+    bpy.context.
+    """
+    start_time = time.perf_counter()
+    if method == 'EMPTY_FILE' and not bpy.app.background:
+        raise ZipImportError("The Empty File scene reset only runs in background Blender processes")
+    if method == 'EMPTY_FILE':
+        bpy.ops.wm.read_homefile(use_empty=True)
+    else:
+        if bpy.context.mode != 'OBJECT':
+            bpy.ops.object.mode_set(mode='OBJECT')
+        bpy.data.batch_remove(collect_reset_ids())
+    seconds = time.perf_counter() - start_time
+    print(f"Scene reset ({method}) in {seconds:.3f}s")
+    return seconds
+
+
+def import_zip(file_path, cache=None, reset_method='BATCH_REMOVE', obj_importer='BLENDER', parse_workers=MAX_PARSE_PROCESSES):
+    """ Import the model of a ripped .zip into an emptied scene and save it as <name>/<name>.blend next to the zip.
+    With a cache, an archive imported before by the same importer version isn't imported again. parse_workers
+    caps the processes the NumPy OBJ importer parses with, batch workers already run in parallel.
+    Returns the path of the .blend file and whether it came from the cache. Raises ZipImportError when there is nothing to import. """
+    if not file_path.endswith(".zip"):
+        raise ZipImportError("Please select a .zip file")
+
+    if cache is not None:
+        blend_file_path = cache.lookup(file_path)
+        if blend_file_path:
+            return blend_file_path, True
+
+    global last_extraction
+    last_import_timings.clear()
+    last_import_timings["reset"] = reset_scene(reset_method)
+
+    # Unzip only the model and the textures it references, ripped archives carry lots of unused files.
+    start_time = time.perf_counter()
+    unzip_dir = os.path.splitext(file_path)[0]
+    extraction = last_extraction = extract_model(file_path, unzip_dir)
+    last_import_timings["extract"] = time.perf_counter() - start_time
+    print(extraction.summary())
+    for texture in extraction.missing_textures:
+        print(f"Texture not found in the archive: {texture}")
+
+    # Try to import an FBX file
+    start_time = time.perf_counter()
+    fbx_file = extraction.fbx_file
+    obj_files = extraction.obj_files
+    if fbx_file:
+        bpy.ops.import_scene.fbx(filepath=fbx_file)
+
+    # If no FBX file was found, import all OBJ files
+    if not fbx_file and obj_files and obj_importer == 'NUMPY':
+        import_obj_files(obj_files, max_workers=parse_workers)
+    elif not fbx_file and obj_files:
+        for obj_file in obj_files:
+            bpy.ops.wm.obj_import(filepath=obj_file)
+    elif not fbx_file and not obj_files:
+        raise ZipImportError("No FBX or OBJ file found in the zip")
+
+    last_import_timings["import"] = time.perf_counter() - start_time
+
+    # Save the blend file
+    start_time = time.perf_counter()
+    blend_file_path = os.path.join(unzip_dir, os.path.basename(unzip_dir) + ".blend")
+    bpy.ops.wm.save_as_mainfile(filepath=blend_file_path)
+    last_import_timings["save"] = time.perf_counter() - start_time
+    if cache is not None:
+        for folder in cache.store(file_path, blend_file_path, extraction.members):
+            print(f"Evicted from the import cache: {folder}")
+    return blend_file_path, False
+
+
 class ImportZipOperator(bpy.types.Operator):
     bl_idname = "ripper.import_zip"
     bl_label = "Import"
@@ -43,73 +217,92 @@ class ImportZipOperator(bpy.types.Operator):
         # save the current file only if there is a current filepath
         if current_file_path:
             bpy.ops.wm.save_mainfile()
-        # remove all mesh, material and image data in the blender scene
-        # Remove all objects
-        bpy.ops.object.select_all(action='SELECT')
-        bpy.ops.object.delete()
 
-        # Remove all meshes
-        bpy.ops.outliner.orphans_purge(do_local_ids=True, do_linked_ids=True, do_recursive=True)
+        start_time = time.perf_counter()
+        try:
+            # Loading an empty file would free this operator's context, the scene is emptied in place.
+            blend_file_path, cached = import_zip(context.scene.zip_file_path, get_import_cache(context.scene),
+                                                 'BATCH_REMOVE', context.scene.obj_importer)
+        except ZipImportError as e:
+            self.report({'ERROR'}, str(e))
+            return {'CANCELLED'}
 
-        # Remove all materials
-        for material in bpy.data.materials:
-            bpy.data.materials.remove(material)
+        if cached:
+            self.report({'INFO'}, f"Opened cached import in {time.perf_counter() - start_time:.2f}s: {blend_file_path}")
+            bpy.ops.wm.open_mainfile(filepath=blend_file_path)
+            return {'FINISHED'}
+        self.report({'INFO'}, f"Imported and saved blend file: {blend_file_path} (scene reset {last_import_timings['reset']:.2f}s)")
+        return {'FINISHED'}
 
-        # Remove all images
-        for image in bpy.data.images:
-            bpy.data.images.remove(image)
 
+class BatchImportZipOperator(bpy.types.Operator):
+    bl_idname = "ripper.batch_import_zips"
+    bl_label = "Batch Import"
+    bl_description = "Import every .zip in a folder to its own .blend file, using a pool of background Blender processes"
 
-        
-        file_path = context.scene.zip_file_path
-        if not file_path.endswith(".zip"):
-            self.report({'ERROR'}, "Please select a .zip file")
-            return {'CANCELLED'}
-        
-        # Unzip the file
-        unzip_dir = os.path.splitext(file_path)[0]
-        with zipfile.ZipFile(file_path, 'r') as zip_ref:
-            zip_ref.extractall(unzip_dir)
-        
-                # Try to import an FBX file
-        fbx_file = None
-        obj_files = []
-        for root, dirs, files in os.walk(unzip_dir):
-            for file in files:
-                if file.endswith(".fbx") and fbx_file is None:
-                    fbx_file = os.path.join(root, file)
-                    bpy.ops.import_scene.fbx(filepath=fbx_file)
-                    break
-                elif file.endswith(".obj"):
-                    obj_files.append(os.path.join(root, file))
-
-            if fbx_file:
-                break
-
-        # If no FBX file was found, import all OBJ files
-        if not fbx_file and obj_files:
-            for obj_file in obj_files:
-                bpy.ops.wm.obj_import(filepath=obj_file)
-        elif not fbx_file and not obj_files:
-            self.report({'ERROR'}, "No FBX or OBJ file found in the zip")
+    workers: bpy.props.IntProperty(
+        name="Workers",
+        description="Number of Blender processes, 0 uses every core",
+        default=0,
+        min=0
+    )  # type: ignore
+
+    def execute(self, context):
+        zip_dir = bpy.path.abspath(context.scene.zip_directory_path)
+        if not os.path.isdir(zip_dir):
+            self.report({'ERROR'}, "Please select a folder of .zip files")
             return {'CANCELLED'}
-        
-        # Save the blend file
-        blend_file_path = os.path.join(unzip_dir, os.path.basename(unzip_dir) + ".blend")
-        bpy.ops.wm.save_as_mainfile(filepath=blend_file_path)
 
-        self.report({'INFO'}, f"Imported and saved blend file: {blend_file_path}")
+        # The imports run in other processes, this one only waits for them without blocking the UI.
+        # Everything the thread needs is read here, it must not touch Blender data or operator properties.
+        self.report_path = os.path.join(zip_dir, "batch_import_report.json")
+        self.outcome = {"exit_code": None, "error": None}
+        args = (zip_dir, self.report_path, bpy.app.binary_path, self.workers or None, get_import_cache(context.scene),
+                context.scene.import_reset_method, context.scene.obj_importer)
+        self.batch = threading.Thread(target=self._run, args=(self.outcome, args), daemon=True)
+        self.batch.start()
+        self.timer = context.window_manager.event_timer_add(1.0, window=context.window)
+        context.window_manager.modal_handler_add(self)
+        self.report({'INFO'}, f"Batch importing {zip_dir}, see the console for progress")
+        return {'RUNNING_MODAL'}
+
+    @staticmethod
+    def _run(outcome, args):
+        try:
+            outcome["exit_code"] = batch_import.run_batch(*args)
+        except Exception as e:
+            outcome["error"] = f"{type(e).__name__}: {e}"
+
+    def modal(self, context, event):
+        if event.type != 'TIMER' or self.batch.is_alive():
+            return {'PASS_THROUGH'}
+        context.window_manager.event_timer_remove(self.timer)
+        if self.outcome["error"]:
+            self.report({'ERROR'}, f"Batch import failed: {self.outcome['error']}")
+            return {'CANCELLED'}
+        if self.outcome["exit_code"] == 0:
+            self.report({'INFO'}, f"Batch import finished, report: {self.report_path}")
+        else:
+            self.report({'WARNING'}, f"Batch import finished with failures, report: {self.report_path}")
         return {'FINISHED'}
 
+
 def register():
     print("Registering ImportPanel")
     bpy.utils.register_class(ImportPanel)
     bpy.utils.register_class(ImportZipOperator)
+    bpy.utils.register_class(BatchImportZipOperator)
 
 def unregister():
     bpy.utils.unregister_class(ImportPanel)
     bpy.utils.unregister_class(ImportZipOperator)
+    bpy.utils.unregister_class(BatchImportZipOperator)
     del bpy.types.Scene.zip_file_path
+    del bpy.types.Scene.zip_directory_path
+    del bpy.types.Scene.use_import_cache
+    del bpy.types.Scene.import_cache_limit_gb
+    del bpy.types.Scene.import_reset_method
+    del bpy.types.Scene.obj_importer
 
 if __name__ == "__main__":
     register()
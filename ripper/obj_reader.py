@@ -0,0 +1,354 @@
+""" OBJ and MTL reader built on NumPy, without bpy so it can parse in a pool of processes.
+
+A file is read in chunks of whole lines, memory mapped when it is large. Every chunk is classified line by
+line with array operations on its bytes, then the bytes of all vertex, uv, normal and face lines are each
+parsed in one np.fromstring call. Lines this doesn't understand fall back to plain Python parsing.
+"""
+import concurrent.futures
+import importlib
+import mmap
+import multiprocessing
+import os
+import sys
+import warnings
+
+import numpy as np
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+CHUNK_SIZE = 16 * 1024 * 1024
+MMAP_THRESHOLD = 4 * 1024 * 1024
+MAX_PARSE_PROCESSES = min(8, os.cpu_count() or 1)
+# Below this many bytes in total the pool is no faster: starting the processes and sending the arrays back
+# costs about what it saves, it measured no speedup on about 40 MB of OBJ files.
+POOL_MIN_BYTES = 64 * 1024 * 1024
+
+# MTL statements that reference a texture file.
+MTL_TEXTURE_STATEMENTS = {"map_ka", "map_kd", "map_ks", "map_ke", "map_ns", "map_d", "map_bump", "bump", "disp", "decal",
+                          "refl", "norm", "map_pr", "map_pm", "map_ps", "map_rma", "map_orm"}
+# Texture options and how many values follow them. -o, -s and -t take up to three.
+MTL_TEXTURE_OPTIONS = {"-blendu": 1, "-blendv": 1, "-bm": 1, "-boost": 1, "-cc": 1, "-clamp": 1, "-imfchan": 1,
+                       "-mm": 2, "-o": 3, "-s": 3, "-t": 3, "-texres": 1, "-type": 1}
+
+NEWLINE = ord("\n")
+SPACE = ord(" ")
+TAB = ord("\t")
+SLASH = ord("/")
+
+# Line kinds.
+OTHER, VERTEX, UV, NORMAL, FACE, OBJECT, USEMTL, MTLLIB = range(8)
+
+
+class ObjData():
+    """ Arrays of one OBJ file. Corners index positions, uvs and normals from 0, or -1 where they have none.
+    Faces are runs of face_sizes corners and index material_names and object_names, materials with -1 for none. """
+    def __init__(self, path):
+        self.path = path
+        self.positions = np.zeros((0, 3), np.float32)
+        self.uvs = np.zeros((0, 2), np.float32)
+        self.normals = np.zeros((0, 3), np.float32)
+        self.corner_positions = np.zeros(0, np.int32)
+        self.corner_uvs = np.zeros(0, np.int32)
+        self.corner_normals = np.zeros(0, np.int32)
+        self.face_sizes = np.zeros(0, np.int32)
+        self.face_materials = np.zeros(0, np.int32)
+        self.face_objects = np.zeros(0, np.int32)
+        self.material_names = []
+        self.object_names = [os.path.splitext(os.path.basename(path))[0]]
+        self.material_libraries = []
+
+
+class MtlMaterial():
+    def __init__(self, name):
+        self.name = name
+        self.diffuse = (0.8, 0.8, 0.8)
+        self.alpha = 1.0
+        # Texture paths by lower case statement, map_kd, map_bump and so on.
+        self.textures = {}
+
+
+def mtl_texture_path(tokens):
+    """ The texture path of a tokenized MTL texture statement, after its options. """
+    index = 1
+    while index < len(tokens) - 1 and tokens[index].lower() in MTL_TEXTURE_OPTIONS:
+        count = MTL_TEXTURE_OPTIONS[tokens[index].lower()]
+        index += 1
+        # Options with up to three values stop at the first one that isn't a number.
+        for _ in range(count):
+            if index >= len(tokens) - 1:
+                break
+            try:
+                float(tokens[index])
+            except ValueError:
+                if count > 1:
+                    break
+            index += 1
+    return " ".join(tokens[index:])
+
+
+def parse_mtl(path):
+    """ Materials of an MTL file by name. """
+    materials = {}
+    material = None
+    with open(path, "r", encoding="utf-8", errors="replace") as file:
+        for line in file:
+            tokens = line.split()
+            if len(tokens) < 2:
+                continue
+            statement = tokens[0].lower()
+            if statement == "newmtl":
+                material = materials[" ".join(tokens[1:])] = MtlMaterial(" ".join(tokens[1:]))
+            elif material is None:
+                continue
+            elif statement == "kd" and len(tokens) >= 4:
+                material.diffuse = tuple(float(value) for value in tokens[1:4])
+            elif statement == "d":
+                material.alpha = float(tokens[-1])
+            elif statement == "tr":
+                material.alpha = 1.0 - float(tokens[-1])
+            elif statement in MTL_TEXTURE_STATEMENTS:
+                material.textures[statement] = mtl_texture_path(tokens)
+    return materials
+
+
+def _read_chunks(path):
+    """ Yields the file as writable uint8 arrays of whole lines, each ending with a newline. """
+    size = os.path.getsize(path)
+    if size == 0:
+        return
+    with open(path, "rb") as file:
+        data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if size > MMAP_THRESHOLD else file.read()
+        try:
+            start = 0
+            while start < size:
+                end = min(start + CHUNK_SIZE, size)
+                if end < size:
+                    # End on a line break, or after the next one when a line is longer than a chunk.
+                    newline = data.rfind(b"\n", start, end)
+                    if newline < 0:
+                        newline = data.find(b"\n", end)
+                    end = size if newline < 0 else newline + 1
+                chunk = np.frombuffer(data, np.uint8, end - start, start).copy()
+                if chunk[-1] != NEWLINE:
+                    chunk = np.append(chunk, np.uint8(NEWLINE))
+                yield chunk
+                start = end
+        finally:
+            if isinstance(data, mmap.mmap):
+                data.close()
+
+
+def _classify_lines(chunk):
+    """ Start, length including the newline, kind and keyword position of every line of chunk. """
+    ends = np.flatnonzero(chunk == NEWLINE)
+    starts = np.empty_like(ends)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+    # Skip indentation one column at a time for the lines that still have some, every line ends with a newline.
+    keys = starts.copy()
+    indented = np.flatnonzero((chunk[keys] == SPACE) | (chunk[keys] == TAB))
+    while len(indented):
+        keys[indented] += 1
+        indented = indented[(chunk[keys[indented]] == SPACE) | (chunk[keys[indented]] == TAB)]
+    first = chunk[keys]
+    second = chunk[np.minimum(keys + 1, len(chunk) - 1)]
+    second_blank = (second == SPACE) | (second == TAB)
+
+    kinds = np.full(len(starts), OTHER, np.uint8)
+    is_v = first == ord("v")
+    kinds[is_v & second_blank] = VERTEX
+    kinds[is_v & (second == ord("t"))] = UV
+    kinds[is_v & (second == ord("n"))] = NORMAL
+    kinds[(first == ord("f")) & second_blank] = FACE
+    kinds[(first == ord("o")) & second_blank] = OBJECT
+    kinds[(first == ord("u")) & (second == ord("s"))] = USEMTL
+    kinds[(first == ord("m")) & (second == ord("t"))] = MTLLIB
+    return starts, ends - starts + 1, kinds, keys
+
+
+def _line_text(chunk, start, length):
+    return chunk[start:start + length].tobytes().decode("utf-8", errors="replace").strip()
+
+
+def _token_counts(text, lengths):
+    """ Number of whitespace separated tokens in each line of text, the concatenated lines of the given lengths. """
+    blank = text <= SPACE
+    token_start = ~blank
+    token_start[1:] &= blank[:-1]
+    offsets = np.cumsum(lengths) - lengths
+    return np.add.reduceat(token_start.astype(np.int32), offsets)
+
+
+def _fromstring(text, dtype):
+    """ Numbers of the whitespace separated text, or None when some token isn't one. """
+    with warnings.catch_warnings():
+        # Older NumPy warns and stops at the first token it can't read, the caller checks the count.
+        warnings.simplefilter("ignore", DeprecationWarning)
+        try:
+            return np.fromstring(text.tobytes(), dtype=dtype, sep=" ")
+        except ValueError:
+            return None
+
+
+def _select_lines(chunk, lengths, kinds, kind):
+    """ The bytes of all lines of a kind, concatenated, and their lengths. """
+    selected = kinds == kind
+    return chunk[np.repeat(selected, lengths)], lengths[selected]
+
+
+def _parse_rows(chunk, starts, lengths, kinds, keys, kind, prefix, width):
+    """ The first width numbers of every line of a kind, as a float32 (lines, width) array. """
+    selected = kinds == kind
+    if not selected.any():
+        return np.zeros((0, width), np.float32)
+    for offset in range(prefix):
+        chunk[keys[selected] + offset] = SPACE
+    text, line_lengths = _select_lines(chunk, lengths, kinds, kind)
+    counts = _token_counts(text, line_lengths)
+    values = _fromstring(text, np.float32)
+    if values is not None and values.size == counts.sum() and counts.min() >= width:
+        if (counts == counts[0]).all():
+            return values.reshape(len(counts), counts[0])[:, :width]
+        offsets = np.cumsum(counts) - counts
+        return values[offsets[:, None] + np.arange(width)]
+
+    # Comments or broken numbers somewhere, read the lines one by one.
+    rows = np.zeros((len(line_lengths), width), np.float32)
+    for row, (start, length) in enumerate(zip(starts[selected], line_lengths)):
+        for column, token in enumerate(_line_text(chunk, start, length).split()[:width]):
+            try:
+                rows[row, column] = float(token)
+            except ValueError:
+                break
+    return rows
+
+
+def _resolve(indices, counts_before):
+    """ 1 based OBJ indices, negative ones relative to the elements before the line, to 0 based ones. """
+    return np.where(indices < 0, indices + counts_before, indices - 1).astype(np.int32)
+
+
+def _parse_faces(chunk, starts, lengths, kinds, keys, counts_before):
+    """ Corner indices and sizes of the faces of a chunk. counts_before holds the vertex, uv and normal counts
+    before each face line. Returns positions, uvs, normals and sizes, -1 for missing uvs or normals. """
+    selected = kinds == FACE
+    chunk[keys[selected]] = SPACE
+    text, line_lengths = _select_lines(chunk, lengths, kinds, FACE)
+    sizes = _token_counts(text, line_lengths)
+    corner_counts = [np.repeat(counts, sizes) for counts in counts_before]
+
+    # The first corner tells the layout, v, v/vt, v//vn or v/vt/vn.
+    first_line = _line_text(chunk, starts[selected][0], line_lengths[0]).split()
+    first = first_line[0] if first_line else ""
+    slots = (0, None, 1) if "//" in first else (0, 1 if "/" in first else None, 2 if first.count("/") == 2 else None)
+    width = sum(slot is not None for slot in slots)
+    text[text == SLASH] = SPACE
+    values = _fromstring(text, np.int64)
+
+    corners = int(sizes.sum())
+    if values is not None and values.size == corners * width:
+        values = values.reshape(corners, width)
+        return tuple(np.full(corners, -1, np.int32) if slot is None else _resolve(values[:, slot], counts)
+                     for slot, counts in zip(slots, corner_counts)) + (sizes,)
+
+    # Faces mix layouts, read the corners one by one. OBJ indices are never 0, it marks a missing one.
+    raw = np.zeros((3, corners), np.int64)
+    corner = 0
+    for start, length in zip(starts[selected], line_lengths):
+        for token in _line_text(chunk, start, length).split():
+            for slot, value in enumerate(token.split("/")[:3]):
+                if value:
+                    raw[slot, corner] = int(value)
+            corner += 1
+    return tuple(np.where(indices != 0, _resolve(indices, counts), -1).astype(np.int32)
+                 for indices, counts in zip(raw, corner_counts)) + (sizes,)
+
+
+def _fill_forward(kinds, kind, values, initial):
+    """ For every line, the value of the last line of a kind at or before it, or initial. """
+    marked = kinds == kind
+    last = np.maximum.accumulate(np.where(marked, np.arange(len(kinds)), -1))
+    per_line = np.full(len(kinds), initial, np.int32)
+    per_line[marked] = values
+    return np.where(last >= 0, per_line[np.maximum(last, 0)], initial)
+
+
+def parse_obj(path):
+    """ Read an OBJ file into an ObjData. """
+    data = ObjData(path)
+    parts = {name: [] for name in ("positions", "uvs", "normals", "corner_positions", "corner_uvs", "corner_normals",
+                                   "face_sizes", "face_materials", "face_objects")}
+    element_counts = [0, 0, 0]
+    material = -1
+    obj = 0
+    material_indices = {}
+
+    for chunk in _read_chunks(path):
+        starts, lengths, kinds, keys = _classify_lines(chunk)
+
+        # Rare statements, read as text.
+        materials = []
+        objects = []
+        for line in np.flatnonzero((kinds == USEMTL) | (kinds == OBJECT) | (kinds == MTLLIB)):
+            text = _line_text(chunk, starts[line], lengths[line])
+            if kinds[line] == OBJECT:
+                data.object_names.append(text[1:].strip() or data.object_names[0])
+                objects.append(len(data.object_names) - 1)
+            elif text.startswith("usemtl"):
+                name = text[len("usemtl"):].strip()
+                if name not in material_indices:
+                    material_indices[name] = len(data.material_names)
+                    data.material_names.append(name)
+                materials.append(material_indices[name])
+            elif text.startswith("mtllib"):
+                data.material_libraries.append(text[len("mtllib"):].strip())
+                kinds[line] = OTHER
+            else:
+                kinds[line] = OTHER
+
+        parts["positions"].append(_parse_rows(chunk, starts, lengths, kinds, keys, VERTEX, 1, 3))
+        parts["uvs"].append(_parse_rows(chunk, starts, lengths, kinds, keys, UV, 2, 2))
+        parts["normals"].append(_parse_rows(chunk, starts, lengths, kinds, keys, NORMAL, 2, 3))
+
+        is_face = kinds == FACE
+        if is_face.any():
+            counts_before = [count + np.cumsum(kinds == kind)[is_face] for count, kind in zip(element_counts, (VERTEX, UV, NORMAL))]
+            positions, uvs, normals, sizes = _parse_faces(chunk, starts, lengths, kinds, keys, counts_before)
+            parts["corner_positions"].append(positions)
+            parts["corner_uvs"].append(uvs)
+            parts["corner_normals"].append(normals)
+            parts["face_sizes"].append(sizes.astype(np.int32))
+            parts["face_materials"].append(_fill_forward(kinds, USEMTL, materials, material)[is_face])
+            parts["face_objects"].append(_fill_forward(kinds, OBJECT, objects, obj)[is_face])
+
+        element_counts = [count + len(part[-1]) for count, part in zip(element_counts, (parts["positions"], parts["uvs"], parts["normals"]))]
+        material = materials[-1] if materials else material
+        obj = objects[-1] if objects else obj
+
+    for name, arrays in parts.items():
+        if arrays:
+            setattr(data, name, np.concatenate(arrays))
+    return data
+
+
+def _pool_parse_obj():
+    """ parse_obj of this file imported as a top level module. Pool processes unpickle functions by module name,
+    and importing this module through the addon's package would import bpy. """
+    if script_dir not in sys.path:
+        sys.path.append(script_dir)
+    return importlib.import_module("obj_reader").parse_obj
+
+
+def parse_obj_files(paths, max_workers=MAX_PARSE_PROCESSES, min_pool_bytes=POOL_MIN_BYTES):
+    """ Parse OBJ files in a pool of processes, largest first, or one after the other below min_pool_bytes in
+    total. Returns their ObjData in the order of paths. """
+    max_workers = min(max_workers, len(paths))
+    if max_workers < 2 or sum(os.path.getsize(path) for path in paths) < min_pool_bytes:
+        return [parse_obj(path) for path in paths]
+    order = sorted(range(len(paths)), key=lambda index: os.path.getsize(paths[index]), reverse=True)
+    results = [None] * len(paths)
+    context = multiprocessing.get_context("spawn")
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as executor:
+        for index, data in zip(order, executor.map(_pool_parse_obj(), [paths[index] for index in order])):
+            results[index] = data
+    return results
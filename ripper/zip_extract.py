@@ -0,0 +1,239 @@
+import concurrent.futures
+import os
+import re
+import shutil
+import threading
+import zipfile
+import zlib
+
+from .obj_reader import MTL_TEXTURE_STATEMENTS, mtl_texture_path
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".tga", ".bmp", ".tif", ".tiff", ".exr", ".hdr", ".dds", ".psd", ".gif", ".webp")
+COPY_CHUNK_SIZE = 1024 * 1024
+# zlib releases the GIL, so members really do inflate in parallel.
+MAX_EXTRACT_THREADS = min(8, os.cpu_count() or 1)
+
+# Texture and Video nodes keep their file in FileName (or Filename) and RelativeFilename properties.
+FBX_FILENAME_PROPERTIES = (b"FileName", b"Filename", b"RelativeFilename")
+FBX_ASCII_FILENAME_PATTERN = re.compile(rb'(?<![A-Za-z])(?:RelativeFilename|FileName|Filename):\s*"([^"]*)"')
+# In binary FBX a property node's name is preceded by its length and followed by a string value: "S" and its length.
+FBX_BINARY_FILENAME_PATTERN = re.compile(rb"(RelativeFilename|FileName|Filename)S(.{4})", re.DOTALL)
+FBX_BINARY_MAGIC = b"Kaydara FBX Binary"
+
+
+class ExtractionResult():
+    def __init__(self):
+        self.fbx_file = None
+        self.obj_files = []
+        self.extracted = 0
+        self.skipped = 0
+        self.bytes_written = 0
+        self.total_members = 0
+        self.missing_textures = []
+        # Set when no texture reference was found in the archive and every image was extracted instead.
+        self.extracted_all_images = False
+        # (member name, path) of every member extracted now or before.
+        self.members = []
+
+    def summary(self):
+        summary = (f"Extracted {self.extracted} of {self.total_members} archive members ({self.bytes_written / (1024 * 1024):.1f} MB), "
+                   f"{self.skipped} already up to date, {len(self.missing_textures)} referenced textures not in the archive")
+        if self.extracted_all_images:
+            summary += ", none of the references were found so every image was extracted"
+        return summary
+
+
+def _normalize(path):
+    return path.replace("\\", "/").strip().strip('"').lower()
+
+
+def _target_path(dest_dir, info):
+    """ Where a member is extracted to, refusing names that would escape dest_dir. """
+    parts = [part for part in info.filename.replace("\\", "/").split("/") if part not in ("", ".", "..")]
+    target = os.path.join(dest_dir, *parts)
+    if os.path.commonpath([os.path.abspath(dest_dir), os.path.abspath(target)]) != os.path.abspath(dest_dir):
+        raise ValueError(f"Unsafe path in archive: {info.filename}")
+    return target
+
+
+def _file_crc(path):
+    crc = 0
+    with open(path, "rb") as file:
+        while True:
+            chunk = file.read(COPY_CHUNK_SIZE)
+            if not chunk:
+                return crc
+            crc = zlib.crc32(chunk, crc)
+
+
+def is_extracted(target, info):
+    """ True when target already holds this member, same size and CRC. """
+    try:
+        if os.path.getsize(target) != info.file_size:
+            return False
+    except OSError:
+        return False
+    return _file_crc(target) == info.CRC
+
+
+def extract_members(zip_path, members, dest_dir, result, max_workers=MAX_EXTRACT_THREADS):
+    """ Stream members of the archive into dest_dir on a thread pool, skipping those already extracted. Returns their paths. """
+    local = threading.local()
+    lock = threading.Lock()
+    open_archives = []
+
+    def extract(info):
+        target = _target_path(dest_dir, info)
+        if is_extracted(target, info):
+            with lock:
+                result.skipped += 1
+                result.members.append((info.filename, target))
+            return target
+        # Every thread reads through its own handle, a shared one would serialize the reads.
+        if not hasattr(local, "archive"):
+            local.archive = zipfile.ZipFile(zip_path, "r")
+            with lock:
+                open_archives.append(local.archive)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        partial = target + ".partial"
+        try:
+            with local.archive.open(info) as source, open(partial, "wb") as destination:
+                shutil.copyfileobj(source, destination, COPY_CHUNK_SIZE)
+            os.replace(partial, target)
+        except BaseException:
+            if os.path.exists(partial):
+                os.remove(partial)
+            raise
+        with lock:
+            result.extracted += 1
+            result.bytes_written += info.file_size
+            result.members.append((info.filename, target))
+        return target
+
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ripper_extract") as executor:
+            return list(executor.map(extract, members))
+    finally:
+        for archive in open_archives:
+            archive.close()
+
+
+def parse_mtl_textures(path):
+    """ Texture paths referenced by an MTL file. """
+    textures = []
+    with open(path, "r", encoding="utf-8", errors="replace") as file:
+        for line in file:
+            tokens = line.split()
+            if len(tokens) < 2 or tokens[0].lower() not in MTL_TEXTURE_STATEMENTS:
+                continue
+            textures.append(mtl_texture_path(tokens))
+    return textures
+
+
+def parse_obj_material_libraries(path):
+    """ MTL files referenced by mtllib statements of an OBJ file. """
+    libraries = []
+    with open(path, "rb") as file:
+        for line in file:
+            line = line.lstrip()
+            if line.startswith(b"mtllib"):
+                name = line[len(b"mtllib"):].strip().decode("utf-8", errors="replace")
+                if name:
+                    libraries.append(name)
+    return libraries
+
+
+def parse_fbx_textures(path):
+    """ Texture file names of the FileName and RelativeFilename properties of an ASCII or binary FBX file.
+    Other strings, like object names such as Texture::wood.png, aren't file references. """
+    with open(path, "rb") as file:
+        data = file.read()
+    textures = set()
+    if data.startswith(FBX_BINARY_MAGIC):
+        for match in FBX_BINARY_FILENAME_PATTERN.finditer(data):
+            name = match.group(1)
+            if match.start() == 0 or data[match.start() - 1] != len(name):
+                continue
+            length = int.from_bytes(match.group(2), "little")
+            textures.add(data[match.end():match.end() + length].decode("utf-8", errors="replace"))
+    else:
+        for match in FBX_ASCII_FILENAME_PATTERN.finditer(data):
+            textures.add(match.group(1).decode("utf-8", errors="replace"))
+    textures.discard("")
+    return sorted(textures)
+
+
+class MemberIndex():
+    """ Looks archive members up by the paths models use to reference them, which are often absolute paths from
+    the machine the model was made on. Tries the path relative to the model first, then the bare file name. """
+    def __init__(self, infos):
+        self.by_path = {}
+        self.by_name = {}
+        for info in infos:
+            if info.is_dir():
+                continue
+            path = _normalize(info.filename)
+            self.by_path.setdefault(path, info)
+            self.by_name.setdefault(path.rsplit("/", 1)[-1], info)
+
+    def find(self, reference, model_member):
+        reference = _normalize(reference)
+        if not reference:
+            return None
+        model_dir = _normalize(model_member.filename).rsplit("/", 1)[0] if "/" in model_member.filename.replace("\\", "/") else ""
+        relative = os.path.normpath(os.path.join(model_dir, reference)).replace("\\", "/")
+        return self.by_path.get(relative) or self.by_path.get(reference) or self.by_name.get(reference.rsplit("/", 1)[-1])
+
+
+def extract_model(zip_path, dest_dir, max_workers=MAX_EXTRACT_THREADS):
+    """ Extract the model of a ripped archive and only the textures it references.
+
+    Reads the central directory, picks the first FBX, or every OBJ when there is none, and extracts it. Then it
+    parses the model (the MTL libraries of OBJs) for texture references and extracts those members. When none
+    of the references are in the archive, every image is extracted instead, as models whose textures are
+    linked up by hand need them. Members already extracted with the same size and CRC are skipped.
+    """
+    result = ExtractionResult()
+    with zipfile.ZipFile(zip_path, "r") as archive:
+        infos = [info for info in archive.infolist() if not info.is_dir()]
+    result.total_members = len(infos)
+    index = MemberIndex(infos)
+
+    fbx_members = [info for info in infos if info.filename.lower().endswith(".fbx")]
+    obj_members = [info for info in infos if info.filename.lower().endswith(".obj")]
+    references = []
+    if fbx_members:
+        result.fbx_file = extract_members(zip_path, fbx_members[:1], dest_dir, result, max_workers)[0]
+        references = [(texture, fbx_members[0]) for texture in parse_fbx_textures(result.fbx_file)]
+    elif obj_members:
+        result.obj_files = extract_members(zip_path, obj_members, dest_dir, result, max_workers)
+        libraries = []
+        for member, path in zip(obj_members, result.obj_files):
+            for library in parse_obj_material_libraries(path):
+                # One mtllib can list several libraries, but names with spaces are more common.
+                for name in [library] + library.split():
+                    library_member = index.find(name, member)
+                    if library_member is not None:
+                        if library_member not in libraries:
+                            libraries.append(library_member)
+                        break
+        for member, path in zip(libraries, extract_members(zip_path, libraries, dest_dir, result, max_workers)):
+            references.extend((texture, member) for texture in parse_mtl_textures(path))
+
+    textures = []
+    missing_names = set()
+    for reference, model_member in references:
+        member = index.find(reference, model_member)
+        if member is None:
+            # FileName and RelativeFilename usually name the same file, report it once.
+            name = _normalize(reference).rsplit("/", 1)[-1]
+            if name not in missing_names:
+                missing_names.add(name)
+                result.missing_textures.append(reference)
+        elif member not in textures:
+            textures.append(member)
+    if not textures:
+        textures = [info for info in infos if info.filename.lower().endswith(IMAGE_EXTENSIONS)]
+        result.extracted_all_images = bool(textures)
+    extract_members(zip_path, textures, dest_dir, result, max_workers)
+    return result